@@ -1,5 +1,187 @@
 if __name__ == "__main__":
     import sys
+    import os
+    import argparse
+
+    # the packages are imported by bare name, also under `python -m aki`
+    aki_dir = os.path.dirname(os.path.abspath(__file__))
+    if aki_dir not in sys.path:
+        sys.path.insert(0, aki_dir)
+
+    arg_parser = argparse.ArgumentParser(prog="aki")
+    arg_parser.add_argument(
+        "-O",
+        dest="opt_level",
+        type=int,
+        choices=range(4),
+        default=0,
+        help="LLVM optimization level (default 0)",
+    )
+    arg_parser.add_argument(
+        "--cache",
+        dest="cache_dir",
+        nargs="?",
+        const="",
+        default=None,
+        metavar="DIR",
+        help="cache compiled object code on disk (default dir ~/.cache/aki)",
+    )
+    arg_parser.add_argument(
+        "--lazy",
+        action="store_true",
+        help="only compile functions when they are first called",
+    )
+    arg_parser.add_argument(
+        "--keep-results",
+        type=int,
+        default=None,
+        metavar="N",
+        help="keep the compiled code of the last N REPL results (default 100)",
+    )
+    arg_parser.add_argument(
+        "--perf-map",
+        action="store_true",
+        help="write /tmp/perf-<pid>.map, naming JIT code for Linux perf",
+    )
+    arg_parser.add_argument(
+        "--jitdump",
+        action="store_true",
+        help="write /tmp/jit-<pid>.dump for perf inject --jit, with source lines",
+    )
+    arg_parser.add_argument(
+        "source",
+        nargs="?",
+        help="program to run instead of the REPL; '-' or a pipe reads stdin",
+    )
+    arg_parser.add_argument(
+        "--time",
+        action="store_true",
+        help="report how long each stage of compiling and running the program took",
+    )
+    arg_parser.add_argument(
+        "--time-dump",
+        metavar="FILE",
+        help="also write the stage timings to FILE as JSON",
+    )
+    arg_parser.epilog = "aki build -h describes compiling ahead of time"
+
+    build_parser = argparse.ArgumentParser(
+        prog="aki build",
+        description="compile a source file ahead of time, with a C header",
+    )
+    build_parser.add_argument("source", help="Aki source file defining functions")
+    build_parser.add_argument(
+        "-o", dest="output", help="output file (default: the source name, as .so or .o)"
+    )
+    build_parser.add_argument(
+        "-O",
+        dest="opt_level",
+        type=int,
+        choices=range(4),
+        default=2,
+        help="LLVM optimization level (default 2)",
+    )
+    build_parser.add_argument(
+        "-c",
+        dest="object",
+        action="store_true",
+        help="emit a relocatable object instead of a shared library",
+    )
+    build_parser.add_argument(
+        "-j",
+        dest="jobs",
+        type=int,
+        default=1,
+        help="compile functions in parallel across this many processes (default 1)",
+    )
+    build_parser.add_argument(
+        "--header", help="C header to write (default: the output name, as .h)"
+    )
+    build_parser.add_argument(
+        "--bounds-checks",
+        choices=("on", "hoist", "off"),
+        default="hoist",
+        help="array bounds checking (default hoist)",
+    )
+
+    if sys.argv[1:2] == ["build"]:
+        from lark.exceptions import UnexpectedInput
+        from errors import AkiBaseException, AkiSyntaxError
+        from codegen import Codegen
+        from aot import build
+
+        args = build_parser.parse_args(sys.argv[2:])
+        stem = os.path.splitext(args.source)[0]
+        output = args.output or stem + (".o" if args.object else ".so")
+        with open(args.source) as f:
+            source = f.read()
+        try:
+            signatures = build(
+                source,
+                output,
+                shared=not args.object,
+                header=args.header or os.path.splitext(output)[0] + ".h",
+                opt_level=args.opt_level,
+                codegen=Codegen(bounds_checks=args.bounds_checks),
+                jobs=args.jobs,
+            )
+        except UnexpectedInput as e:
+            sys.exit(str(AkiSyntaxError(source, e, "unexpected token")))
+        except (AkiBaseException, RuntimeError) as e:
+            sys.exit(str(e))
+        print(f"{output}: {', '.join(signatures) or 'no functions exported'}")
+        sys.exit()
+
+    args = arg_parser.parse_args()
+
+    profiler = None
+    if args.perf_map or args.jitdump:
+        from perf import Profiler
+
+        profiler = Profiler(perf_map=args.perf_map, jitdump=args.jitdump)
+
+    if args.source or not sys.stdin.isatty():
+        from lark.exceptions import UnexpectedInput
+        from errors import AkiBaseException, AkiSyntaxError, AkiIndexError
+        from jitengine import Jit, default_cache_dir
+        from script import run_program, exit_status
+        from timing import Stats, no_stats
+        from codegen import Codegen
+
+        # the same stages, names and report as the REPL's .time
+        stats = Stats() if args.time or args.time_dump else None
+        if stats:
+            stats.begin(args.source or "<stdin>")
+        source_name = args.source if args.source not in (None, "-") else "<stdin>"
+        timer = stats or no_stats
+        with timer.stage("read"):
+            if args.source in (None, "-"):
+                source = sys.stdin.read()
+            else:
+                with open(args.source) as f:
+                    source = f.read()
+        jit_options = {"opt_level": args.opt_level, "lazy": args.lazy, "stats": stats}
+        if args.cache_dir is not None:
+            jit_options["cache_dir"] = args.cache_dir or default_cache_dir
+        with timer.stage("setup"):
+            jit = Jit(perf=profiler, **jit_options)
+            # source lines only matter to perf with a jitdump
+            codegen = Codegen(debug_info=args.jitdump, filename=source_name)
+        try:
+            result = run_program(source, jit=jit, codegen=codegen)
+        except UnexpectedInput as e:
+            sys.exit(str(AkiSyntaxError(source, e, "unexpected token")))
+        except (AkiBaseException, AkiIndexError) as e:
+            sys.exit(str(e))
+        finally:
+            if args.time:
+                print(stats.report(), file=sys.stderr)
+            if args.time_dump:
+                stats.dump(args.time_dump)
+        status, output = exit_status(result)
+        if output is not None:
+            print(output)
+        sys.exit(status)
 
     init_modules = set(sys.modules.keys())
 
@@ -7,6 +189,21 @@ if __name__ == "__main__":
         from errors import ReloadException, QuitException
         from repl import repl
 
+        if args.opt_level:
+            repl.set_opt_level(args.opt_level)
+        if args.lazy:
+            repl.set_lazy(True)
+        if args.keep_results is not None:
+            repl.jit_options["keep_results"] = args.keep_results
+            repl.reset()
+        if profiler:
+            repl.jit_options["perf"] = profiler
+            repl.reset()
+        if args.cache_dir is not None:
+            from jitengine import default_cache_dir
+
+            repl.set_cache_dir(args.cache_dir or default_cache_dir)
+
         try:
             repl.run()
         except ReloadException:
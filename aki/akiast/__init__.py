@@ -65,91 +65,200 @@ for _op, _Op in (unops, UnOps), (binops, BinOps):
 
 
 class Node:
+    """
+    Base AST node. Nodes compare and hash structurally: two nodes are
+    equal if they are of the same class and their fields are equal.
+    Positions (`line`, `column`) are not part of a node's identity.
+    Fields are the `__slots__` declared below `Node`, in order.
+    """
+
+    __slots__ = ("line", "column", "_hash")
+    _fields = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        fields = []
+        for klass in reversed(cls.__mro__):
+            for field in klass.__dict__.get("__slots__", ()):
+                if klass is not Node and field not in fields:
+                    fields.append(field)
+        cls._fields = tuple(fields)
+
     def __init__(self, pos):
         self.line, self.column = pos
 
     def __eq__(self, other):
-        raise NotImplementedError
+        if self is other:
+            return True
+        if type(self) is not type(other):
+            return False
+        for field in self._fields:
+            if getattr(self, field) != getattr(other, field):
+                return False
+        return True
+
+    def __hash__(self):
+        # nodes aren't modified once built, so the hash is computed once
+        try:
+            return self._hash
+        except AttributeError:
+            pass
+        self._hash = hash(
+            (self.__class__,)
+            + tuple(_hashable(getattr(self, field)) for field in self._fields)
+        )
+        return self._hash
 
     def __repr__(self):
-        raise NotImplementedError
+        fields = " ".join(f"{field}={getattr(self, field)!r}" for field in self._fields)
+        return f"<{self.__class__.__name__} {fields}>"
+
+
+def _hashable(value):
+    if isinstance(value, list):
+        return tuple(_hashable(_) for _ in value)
+    return value
+
+
+class Interner:
+    """
+    Hash-consing for AST nodes: each distinct subtree is kept once, and
+    structurally equal subtrees resolve to that same instance.
+    The first instance seen, and so its position, is the one kept.
+    """
+
+    def __init__(self):
+        self.table = {}
+
+    def make(self, cls, *args):
+        """
+        Construct `cls(*args)`, or return an existing equal node.
+        Arguments should already be interned, as when building bottom-up.
+        """
+        node = cls(*args)
+        return self.table.setdefault(node, node)
+
+    def intern(self, node):
+        """
+        Intern a whole tree bottom-up and return its canonical root.
+        """
+        if isinstance(node, list):
+            return [self.intern(_) for _ in node]
+        if not isinstance(node, Node):
+            return node
+        for field in node._fields:
+            setattr(node, field, self.intern(getattr(node, field)))
+        return self.table.setdefault(node, node)
+
+    def __len__(self):
+        return len(self.table)
 
 
 class Immediate(Node):
+    __slots__ = ("nodes",)
+
+    def __init__(self, pos, nodes):
+        super().__init__(pos)
+        self.nodes = nodes
+
+
+class Module(Node):
+    """
+    A whole program, as parsed from the `start` rule.
+    """
+
+    __slots__ = ("nodes",)
+
     def __init__(self, pos, nodes):
         super().__init__(pos)
         self.nodes = nodes
 
 
 class Number(Node):
+    __slots__ = ("value",)
+
     def __init__(self, pos, value: str):
         super().__init__(pos)
         self.value = value
 
-    def __eq__(self, other):
-        return self.value == other.value
-
     def __repr__(self):
         return f"<Number: {self.value}>"
 
 
 class Float(Number):
-    pass
+    __slots__ = ()
 
 
 class Float16(Float):
+    __slots__ = ()
+
     def __repr__(self):
         return f"<Float16: {self.value}>"
 
 
 class Float32(Float):
+    __slots__ = ()
+
     def __repr__(self):
         return f"<Float32: {self.value}>"
 
 
 class Float64(Float):
+    __slots__ = ()
+
     def __repr__(self):
         return f"<Float64: {self.value}>"
 
 
 class Integer(Number):
+    __slots__ = ()
+
     def __repr__(self):
         return f"<Integer: {self.value}>"
 
 
 class SignedInteger(Integer):
+    __slots__ = ()
+
     def __repr__(self):
         return f"<SignedInteger: {self.value}>"
 
 
 class UnsignedInteger(Integer):
+    __slots__ = ()
+
     def __repr__(self):
         return f"<UnsignedInteger: {self.value}>"
 
 
 class Boolean(Number):
+    __slots__ = ()
+
     def __repr__(self):
         return f"<Boolean: {self.value}>"
 
 
 class Name(Node):
+    __slots__ = ("value",)
+
     def __init__(self, pos, value: str):
         super().__init__(pos)
         self.value = value
 
-    def __eq__(self, other: Node):
-        return self.value == other.value
-
     def __repr__(self):
         return f"<Name {self.value}>"
 
 
 class VarRef(Name):
+    __slots__ = ()
+
     def __repr__(self):
         return f"<VarRef {self.value}>"
 
 
 class Function(Node):
+    __slots__ = ("name", "args", "return_type", "body")
+
     def __init__(self, pos, name: str, args: list, return_type: Node, body: Node):
         super().__init__(pos)
         self.name = name
@@ -157,84 +266,85 @@ class Function(Node):
         self.return_type = return_type
         self.body = body
 
-    def __eq__(self, other: Node):
-        return (
-            self.args == other.args
-            and self.return_type == other.return_type
-            and self.body == other.body
-        )
-
     def __repr__(self):
         return f"<Function {self.name}: {self.return_type}: {self.body}>"
 
 
+class Argument(Node):
+    __slots__ = ("name", "vartype")
+
+    def __init__(self, pos, name: str, vartype: Name = None):
+        super().__init__(pos)
+        self.name = name
+        self.vartype = vartype
+
+    def __repr__(self):
+        return f"<Argument {self.name}: {self.vartype}>"
+
+
 class Args(Node):
+    __slots__ = ("args",)
+
     def __init__(self, pos, args: list):
         super().__init__(pos)
         self.args = args
 
-    def __eq__(self, other: Node):
-        return self.args == other.args
-
     def __repr__(self):
         return f"<Args: {self.args}>"
 
 
 class Call(Node):
+    __slots__ = ("name", "args")
+
     def __init__(self, pos, name: str, args: Args):
         super().__init__(pos)
         self.name = name
         self.args = args
 
-    def __eq__(self, other: Node):
-        return self.args == other.args
-
     def __repr__(self):
         return f"<Call {self.name}: {self.args}>"
 
 
 class IfExpr(Node):
+    __slots__ = ("if_expr", "then_expr", "else_expr")
+
     def __init__(self, pos, if_expr: Node, then_expr: Node, else_expr: Node):
         super().__init__(pos)
         self.if_expr = if_expr
         self.then_expr = then_expr
         self.else_expr = else_expr
 
-    def __eq__(self, other: Node):
-        return (
-            self.if_expr == other.condition_expr
-            and self.then_expr == other.then_expr
-            and self.else_expr == other.else_expr
-        )
-
     def __repr__(self):
         return f"<If {self.if_expr}: {self.then_expr}: {self.else_expr}>"
 
 
 class WhenExpr(IfExpr):
+    __slots__ = ()
+
     def __repr__(self):
         return f"<When {self.if_expr}: {self.then_expr}: {self.else_expr}>"
 
 
 class OpNode(Node):
-    pass
+    __slots__ = ()
 
 
 class BinOp(OpNode):
+    __slots__ = ("lhs", "rhs", "op")
+
     def __init__(self, pos, lhs: Node, rhs: Node, op: str):
         super().__init__(pos)
         self.lhs = lhs
         self.rhs = rhs
         self.op = op
 
-    def __eq__(self, other: Node):
-        return self.lhs == other.lhs and self.rhs == other.rhs and self.op == other.op
-
     def __repr__(self):
         return f"<BinOp: {self.lhs} {self.op} {self.rhs}>"
 
 
 class Assignment(BinOp):
+    __slots__ = ()
+
     def __init__(self, pos, lhs: Node, rhs: Node):
         super().__init__(pos, lhs, rhs, "=")
 
@@ -243,13 +353,91 @@ class Assignment(BinOp):
 
 
 class UnOp(OpNode):
+    __slots__ = ("lhs", "op")
+
     def __init__(self, pos, lhs: Node, op: str):
         super().__init__(pos)
         self.lhs = lhs
         self.op = op
 
-    def __eq__(self, other: Node):
-        return self.lhs == other.lhs and self.op == other.op
-
     def __repr__(self):
         return f"<UnOp: {self.op} {self.lhs}>"
+
+
+class WhileExpr(Node):
+    __slots__ = ("condition", "body")
+
+    def __init__(self, pos, condition: Node, body: Node):
+        super().__init__(pos)
+        self.condition = condition
+        self.body = body
+
+    def __repr__(self):
+        return f"<While {self.condition}: {self.body}>"
+
+
+class ForExpr(Node):
+    __slots__ = ("name", "iterable", "body")
+
+    def __init__(self, pos, name: Name, iterable: Node, body: Node):
+        super().__init__(pos)
+        self.name = name
+        self.iterable = iterable
+        self.body = body
+
+    def __repr__(self):
+        return f"<For {self.name} in {self.iterable}: {self.body}>"
+
+
+class Break(Node):
+    __slots__ = ("label",)
+
+    def __init__(self, pos, label: Name = None):
+        super().__init__(pos)
+        self.label = label
+
+    def __repr__(self):
+        return f"<Break {self.label}>"
+
+
+class Continue(Break):
+    __slots__ = ()
+
+    def __repr__(self):
+        return f"<Continue {self.label}>"
+
+
+class List(Node):
+    __slots__ = ("items",)
+
+    def __init__(self, pos, items: list):
+        super().__init__(pos)
+        self.items = items
+
+    def __repr__(self):
+        return f"<List {self.items}>"
+
+
+class Index(Node):
+    __slots__ = ("target", "index")
+
+    def __init__(self, pos, target: Node, index: Node):
+        super().__init__(pos)
+        self.target = target
+        self.index = index
+
+    def __repr__(self):
+        return f"<Index {self.target}[{self.index}]>"
+
+
+class Slice(Node):
+    __slots__ = ("target", "start", "stop")
+
+    def __init__(self, pos, target: Node, start: Node = None, stop: Node = None):
+        super().__init__(pos)
+        self.target = target
+        self.start = start
+        self.stop = stop
+
+    def __repr__(self):
+        return f"<Slice {self.target}[{self.start}:{self.stop}]>"
@@ -1,8 +1,31 @@
-from llvmlite.ir.types import IntType, DoubleType, FloatType, HalfType
+import re
+from llvmlite.ir.types import (
+    IntType,
+    DoubleType,
+    FloatType,
+    HalfType,
+    FunctionType,
+    VectorType,
+    LiteralStructType,
+)
 from llvmlite.ir import Constant, IRBuilder, Value, Type
 from akiast import UnOps, BinOps, OpNode
-from ctypes import c_bool, c_double, c_float, c_uint16, c_int64, c_uint64
+from ctypes import (
+    c_bool,
+    c_double,
+    c_float,
+    c_int8,
+    c_int16,
+    c_int32,
+    c_int64,
+    c_uint8,
+    c_uint16,
+    c_uint32,
+    c_uint64,
+    CFUNCTYPE,
+)
 from errors import AkiTypeError
+from buffers import array_struct
 
 
 class AkiTypeBase:
@@ -230,9 +253,13 @@ Bool = Boolean(1)
 
 class SignedInteger(IntegerBase):
 
-    ctype = c_int64
+    ctypes = {8: c_int8, 16: c_int16, 32: c_int32, 64: c_int64}
     _cache = {}
 
+    @property
+    def ctype(self):
+        return self.ctypes[self.size]
+
     @property
     def typename(self):
         return f"int{self.size}"
@@ -245,9 +272,13 @@ class SignedInteger(IntegerBase):
 
 class UnsignedInteger(IntegerBase):
 
-    ctype = c_uint64
+    ctypes = {8: c_uint8, 16: c_uint16, 32: c_uint32, 64: c_uint64}
     _cache = {}
 
+    @property
+    def ctype(self):
+        return self.ctypes[self.size]
+
     @property
     def typename(self):
         return f"uint{self.size}"
@@ -430,7 +461,7 @@ class Float32(FloatBase):
 
     @classmethod
     def llvm_value(cls, value: str):
-        val = float(value[:2])
+        val = float(value[:-2] if value.endswith("_F") else value)
         llvm_value = Constant(FloatType(), val)
         llvm_value.type.aki = Float32(32)
         return llvm_value
@@ -451,3 +482,255 @@ class Float16(FloatBase):
 
     def __init__(self, *a):
         self.llvm_type = HalfType()
+
+
+class Vector(AkiTypeBase):
+    """
+    Fixed-width SIMD vector of `lanes` values of the scalar type
+    `element`, named like `f64x4` or `i32x8`. Its ops are the element
+    type's, applied lane-wise; comparisons give vectors of bools
+    (masks). Vectors have no ctype, so can't be passed to or
+    returned from Python.
+    """
+
+    ctype = None
+    _cache = {}
+
+    def __new__(cls, element: AkiTypeBase, lanes: int):
+        try:
+            return cls._cache[(element, lanes)]
+        except KeyError:
+            new = AkiTypeBase.__new__(cls)
+            cls._cache[(element, lanes)] = new
+            return new
+
+    def __init__(self, element: AkiTypeBase, lanes: int):
+        if hasattr(self, "element"):
+            return
+        self.element = element
+        self.lanes = lanes
+        self._llvm_type = VectorType(element.llvm_type(), lanes)
+
+    @property
+    def typename(self):
+        prefix = vector_prefixes[self.element.__class__]
+        return f"{prefix}{self.element.size}x{self.lanes}"
+
+    def __getattr__(self, name):
+        # lane-wise versions of the element type's ops;
+        # bools are only widened for arithmetic as scalars
+        if not name.startswith("op_") or name == "op_BOOL":
+            raise AttributeError(name)
+        if self.element is Bool and name in ("op_ADD", "op_SUB"):
+            raise AttributeError(name)
+        element_op = getattr(self.element, name)
+
+        def op(*args):
+            result = element_op(*args)
+            if result.type == self._llvm_type:
+                result.type.aki = self
+            else:
+                result.type.aki = Vector(Bool, self.lanes)
+            return result
+
+        return op
+
+    def op_MIN(self, lhs: Value, rhs: Value, builder: IRBuilder):
+        return self.select(self.op_LT(lhs, rhs, builder), lhs, rhs, builder)
+
+    def op_MAX(self, lhs: Value, rhs: Value, builder: IRBuilder):
+        return self.select(self.op_GT(lhs, rhs, builder), lhs, rhs, builder)
+
+    def select(self, mask: Value, lhs: Value, rhs: Value, builder: IRBuilder):
+        f = builder.select(mask, lhs, rhs)
+        f.type.aki = self
+        return f
+
+    def build(self, values: list, builder: IRBuilder):
+        """
+        A vector from one scalar per lane, or one scalar for all lanes.
+        """
+        if len(values) == 1:
+            values = values * self.lanes
+        vector = Constant(self._llvm_type, None)
+        for lane, value in enumerate(values):
+            vector = builder.insert_element(vector, value, Constant(IntType(32), lane))
+        vector.type.aki = self
+        return vector
+
+    def extract(self, vector: Value, lane: Value, builder: IRBuilder):
+        f = builder.extract_element(vector, lane)
+        f.type.aki = self.element
+        return f
+
+    def insert(self, vector: Value, lane: Value, value: Value, builder: IRBuilder):
+        f = builder.insert_element(vector, value, lane)
+        f.type.aki = self
+        return f
+
+    def shuffle(self, lhs: Value, rhs: Value, lanes: list, builder: IRBuilder):
+        """
+        A vector of the given lanes picked from `lhs` and `rhs`,
+        numbering the lanes of `rhs` after those of `lhs`.
+        """
+        mask = Constant(VectorType(IntType(32), len(lanes)), lanes)
+        f = builder.shuffle_vector(lhs, rhs, mask)
+        f.type.aki = Vector(self.element, len(lanes))
+        return f
+
+    def reduce(self, op: str, vector: Value, builder: IRBuilder):
+        """
+        Combine all the lanes of `vector` with the binary `op`
+        (e.g. "ADD"), pairwise in log2(lanes) steps.
+        """
+        combine = getattr(self, f"op_{op}")
+        width = self.lanes
+        while width > 1:
+            width //= 2
+            # fold the upper half onto the lower; the other lanes are unused
+            lanes = [(lane + width) % self.lanes for lane in range(self.lanes)]
+            upper = self.shuffle(vector, vector, lanes, builder)
+            vector = combine(vector, upper, builder)
+        return self.extract(vector, Constant(IntType(32), 0), builder)
+
+
+vector_prefixes = {
+    SignedInteger: "i",
+    UnsignedInteger: "u",
+    Float32: "f",
+    Float64: "f",
+    Boolean: "b",
+}
+
+vector_re = re.compile(r"([iufb])(\d+)x(\d+)$")
+
+
+def vector_type(name: str):
+    """
+    The `Vector` type called `name`, or None if it isn't one.
+    Lanes must be a power of two, from 2 to 64.
+    """
+    m = vector_re.match(name)
+    if not m:
+        return None
+    kind, size, lanes = m.group(1), int(m.group(2)), int(m.group(3))
+    if lanes not in (2, 4, 8, 16, 32, 64):
+        return None
+    if kind in "iu" and size in (8, 16, 32, 64):
+        element = (SignedInteger if kind == "i" else UnsignedInteger)(size)
+    elif kind == "f" and size in (32, 64):
+        element = (Float32 if size == 32 else Float64)(size)
+    elif kind == "b" and size == 1:
+        element = Bool
+    else:
+        return None
+    return Vector(element, lanes)
+
+
+class Array(AkiTypeBase):
+    """
+    A view of `length` contiguous `element` values in memory, passed by
+    value as a data pointer and length. Indexing and slicing work on
+    the same memory; nothing is copied.
+    """
+
+    _cache = {}
+
+    def __new__(cls, element: AkiTypeBase):
+        try:
+            return cls._cache[element]
+        except KeyError:
+            new = AkiTypeBase.__new__(cls)
+            cls._cache[element] = new
+            return new
+
+    def __init__(self, element: AkiTypeBase):
+        if hasattr(self, "element"):
+            return
+        self.element = element
+        self.pointer_type = element.llvm_type().as_pointer()
+        self._llvm_type = LiteralStructType([self.pointer_type, IntType(64)])
+        self.ctype = None
+        if element.ctype is not None:
+            self.ctype = array_struct(element.ctype, self.typename)
+
+    @property
+    def typename(self):
+        return f"{self.element.typename}[]"
+
+    def make(self, data: Value, length: Value, builder: IRBuilder):
+        array = builder.insert_value(Constant(self._llvm_type, None), data, 0)
+        array = builder.insert_value(array, length, 1)
+        array.type.aki = self
+        return array
+
+    def data(self, array: Value, builder: IRBuilder):
+        return builder.extract_value(array, 0)
+
+    def length(self, array: Value, builder: IRBuilder):
+        f = builder.extract_value(array, 1)
+        f.type.aki = SignedInteger(64)
+        return f
+
+
+class AkiFunction(AkiTypeBase):
+    """
+    Signature of a compiled function. `ctype` is the matching ctypes
+    prototype, for calling the function from Python, or None if any
+    of its types have no ctypes equivalent.
+    """
+
+    def __init__(self, arg_types: list, return_type: AkiTypeBase):
+        self.arg_types = tuple(arg_types)
+        self.return_type = return_type
+        self._llvm_type = FunctionType(
+            return_type.llvm_type(), [_.llvm_type() for _ in self.arg_types]
+        )
+        ctypes = [_.ctype for _ in (return_type, *self.arg_types)]
+        self.ctype = None if None in ctypes else CFUNCTYPE(*ctypes)
+
+    @property
+    def typename(self):
+        args = ", ".join(_.typename for _ in self.arg_types)
+        return f"func({args}):{self.return_type.typename}"
+
+    def __eq__(self, other):
+        return (
+            isinstance(other, AkiFunction)
+            and self.arg_types == other.arg_types
+            and self.return_type == other.return_type
+        )
+
+    def __hash__(self):
+        return hash((self.arg_types, self.return_type))
+
+
+# aki types by the names used for them in Aki code
+typenames = {
+    "bool": Bool,
+    **{f"int{size}": SignedInteger(size) for size in (8, 16, 32, 64)},
+    **{f"uint{size}": UnsignedInteger(size) for size in (8, 16, 32, 64)},
+    "float32": Float32(32),
+    "float64": Float64(64),
+}
+
+
+def aki_type(name: str):
+    """
+    The aki type called `name` in Aki code, or None.
+    Array types are named for their element, as in `float64[]`.
+    """
+    if name.endswith("[]"):
+        element = aki_type(name[:-2])
+        return Array(element) if element and not isinstance(element, Array) else None
+    return typenames.get(name) or vector_type(name)
+
+
+# aki types for LLVM types found in externally compiled modules;
+# signedness isn't recorded in LLVM types, so integers come back signed
+llvm_types = {
+    "i1": Bool,
+    **{f"i{size}": typenames[f"int{size}"] for size in (8, 16, 32, 64)},
+    "double": Float64(64),
+    "float": Float32(32),
+}
@@ -0,0 +1,217 @@
+"""
+Ahead-of-time compilation of Aki source files to relocatable objects
+or shared libraries, with a C header for the functions they export.
+
+Libraries also export their functions' Aki signatures, as JSON in
+`signatures_symbol`, so the `native` package can load them with
+nothing but ctypes.
+"""
+
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import llvmlite.binding as llvm
+from llvmlite import ir
+from akiast import Function
+from codegen import Codegen
+from parsing import get_parser
+from errors import AkiSyntaxError
+from consts import bounds_error_symbol, signatures_symbol
+from driver import Driver, shared_machine, optimize
+
+# C spellings of the Aki types that can cross into C
+c_types = {
+    "bool": "bool",
+    "int8": "int8_t",
+    "int16": "int16_t",
+    "int32": "int32_t",
+    "int64": "int64_t",
+    "uint8": "uint8_t",
+    "uint16": "uint16_t",
+    "uint32": "uint32_t",
+    "uint64": "uint64_t",
+    # half floats are passed as their raw bits, as with ctypes
+    "float16": "uint16_t",
+    "float32": "float",
+    "float64": "double",
+}
+
+
+def c_type(typename):
+    """
+    The C type for the Aki type `typename`, or None if there isn't one.
+    Arrays are structs named for their element, as in `aki_float64_array`.
+    """
+    if typename.endswith("[]"):
+        if typename[:-2] in c_types:
+            return f"aki_{typename[:-2]}_array"
+        return None
+    return c_types.get(typename)
+
+
+def compile_library(source, codegen=None, parser=None):
+    """
+    Generate the functions defined in `source` into a fresh module,
+    returning the `Codegen` holding it. Sources for libraries
+    can only define functions.
+    """
+    codegen = codegen or Codegen()
+    parser = parser or get_parser()
+    ast = parser.parse(source, start="immediate")
+    for node in ast.nodes:
+        if not isinstance(node, Function):
+            first = node[0] if isinstance(node, list) else node
+            raise AkiSyntaxError(
+                source, first, "only function definitions can be built"
+            )
+    codegen.reset()
+    codegen.gen(ast, source)
+    return codegen
+
+
+def exports(codegen):
+    """
+    Signatures of the functions in `codegen.module` that C can call,
+    by name, as (argument type names, return type name).
+    """
+    result = {}
+    for fn in codegen.module.functions:
+        if fn.is_declaration:
+            continue
+        signature = fn.ftype.aki
+        names = [
+            _.typename for _ in signature.arg_types
+        ], signature.return_type.typename
+        if all(c_type(_) for _ in (*names[0], names[1])):
+            result[fn.name] = names
+    return result
+
+
+def finish_module(codegen, signatures):
+    """
+    Define what the JIT would otherwise supply: the bounds error
+    record, plus the signatures for the loader.
+    """
+    module = codegen.module
+    record = codegen.bounds_global()
+    record.initializer = ir.Constant(record.value_type, None)
+    data = bytearray(json.dumps(signatures).encode("utf-8") + b"\0")
+    text = ir.GlobalVariable(
+        module, ir.ArrayType(ir.IntType(8), len(data)), signatures_symbol
+    )
+    text.initializer = ir.Constant(text.value_type, data)
+    text.global_constant = True
+
+
+def emit_objects(codegen, opt_level=2, jobs=1):
+    """
+    Optimize `codegen.module` and return it as object code, along with
+    the signatures it exports. With more than one of `jobs`, it is
+    split across that many worker processes, giving an object each.
+    """
+    signatures = exports(codegen)
+    finish_module(codegen, signatures)
+    if jobs > 1:
+        with Driver(jobs, opt_level) as driver:
+            return driver.compile(codegen.module), signatures
+    mod = llvm.parse_assembly(str(codegen.module))
+    mod.verify()
+    machine = shared_machine(opt_level)
+    optimize(mod, machine, opt_level)
+    return [machine.emit_object(mod)], signatures
+
+
+def link(object_paths, output, shared=True, cc=None):
+    """
+    Link object files into a shared library with the C compiler, which
+    also brings in the C library for malloc and friends, or if not
+    `shared`, into one relocatable object.
+    """
+    cc = cc or os.environ.get("CC", "cc")
+    if not shutil.which(cc):
+        raise RuntimeError(
+            f"no C compiler '{cc}' to link with; set CC or build an object"
+        )
+    mode = ["-shared"] if shared else ["-r", "-nostdlib"]
+    result = subprocess.run(
+        [cc, *mode, "-o", output, *object_paths], capture_output=True, text=True
+    )
+    if result.returncode:
+        raise RuntimeError(f"linking {output} failed:\n{result.stderr}")
+
+
+def c_header(signatures, guard="AKI_LIBRARY_H"):
+    """
+    C declarations for the exported `signatures`.
+    """
+    lines = [
+        f"#ifndef {guard}",
+        f"#define {guard}",
+        "",
+        "#include <stdbool.h>",
+        "#include <stdint.h>",
+        "",
+        "/* set to {1, index, length} by a failed bounds check;",
+        "   the function that failed returns 0, as do its callers */",
+        f"extern int64_t {bounds_error_symbol}[3];",
+        "",
+    ]
+    arrays = sorted(
+        {
+            _
+            for args, result in signatures.values()
+            for _ in (*args, result)
+            if _.endswith("[]")
+        }
+    )
+    for typename in arrays:
+        element = c_types[typename[:-2]]
+        lines.append(
+            f"typedef struct {{ {element} *data; int64_t length; }} {c_type(typename)};"
+        )
+    if arrays:
+        lines.append("")
+    for name, (args, result) in signatures.items():
+        params = ", ".join(f"{c_type(_)} arg{n}" for n, _ in enumerate(args)) or "void"
+        lines.append(f"{c_type(result)} {name}({params});")
+    lines += ["", f"#endif /* {guard} */", ""]
+    return "\n".join(lines)
+
+
+def build(
+    source,
+    output,
+    shared=True,
+    header=None,
+    opt_level=2,
+    codegen=None,
+    parser=None,
+    jobs=1,
+):
+    """
+    Compile the Aki code in `source` to `output`: a shared library, or
+    a relocatable object if not `shared`. A C header is written to
+    `header`, if given. With more than one of `jobs`, functions are
+    compiled in parallel (see `driver`). Returns the exported signatures.
+    """
+    codegen = compile_library(source, codegen, parser)
+    objects, signatures = emit_objects(codegen, opt_level, jobs)
+    if shared or len(objects) > 1:
+        with tempfile.TemporaryDirectory() as temp:
+            object_paths = []
+            for n, obj in enumerate(objects):
+                object_paths.append(os.path.join(temp, f"aki{n}.o"))
+                with open(object_paths[-1], "wb") as f:
+                    f.write(obj)
+            link(object_paths, output, shared)
+    else:
+        with open(output, "wb") as f:
+            f.write(objects[0])
+    if header:
+        stem = os.path.splitext(os.path.basename(header))[0]
+        guard = "".join(_ if _.isalnum() else "_" for _ in stem).upper() + "_H"
+        with open(header, "w") as f:
+            f.write(c_header(signatures, guard))
+    return signatures
@@ -0,0 +1,70 @@
+"""
+Evaluates many short Aki expressions at once. They are all generated
+into one module, which is compiled and finalized once, so the fixed
+cost of a JIT module is paid per batch rather than per expression.
+Each expression still gets its own entry point, and one that fails to
+parse or compile is reported without affecting the others.
+"""
+
+from collections import namedtuple
+from lark.exceptions import UnexpectedInput
+from parsing import get_parser
+from codegen import Codegen
+from jitengine import Jit
+from constfold import fold
+from errors import AkiBaseException, AkiSyntaxError, AkiIndexError
+
+# `value` is None if the expression failed, and `error` holds why
+BatchResult = namedtuple("BatchResult", "source value error")
+
+
+def evaluate_batch(sources, codegen=None, jit=None, parser=None, keep=False):
+    """
+    Evaluate each of `sources` (strings of Aki code) and return a
+    `BatchResult` for each, in order.
+
+    A fresh `Codegen` and `Jit` are used unless given. Functions the
+    batch defines are unloaded afterwards, unless `keep` is set, in
+    which case they stay callable from later commands.
+    """
+    codegen = codegen or Codegen()
+    jit = jit or Jit()
+    parser = parser or get_parser()
+
+    codegen.new_module()
+    entry_points = []
+    errors = []
+    for source in sources:
+        try:
+            try:
+                ast = parser.parse(source, start="immediate")
+            except UnexpectedInput as e:
+                raise AkiSyntaxError(source, e, "unexpected token")
+            codegen.txt = source
+            if codegen.fold_constants:
+                ast = fold(ast)
+            entry_points.append(codegen.gen_command(ast.nodes))
+            errors.append(None)
+        except AkiBaseException as e:
+            entry_points.append(None)
+            errors.append(e)
+
+    jit.compile_module(codegen)
+    results = []
+    for source, entry_point, error in zip(sources, entry_points, errors):
+        value = None
+        if entry_point:
+            try:
+                value = jit.resolve(entry_point)()
+            except AkiIndexError as e:
+                error = e
+        results.append(BatchResult(source, value, error))
+
+    if not keep:
+        jit.clear()
+        for fn in codegen.module.functions:
+            if not fn.is_declaration:
+                codegen.functions.pop(fn.name, None)
+                codegen.failing.discard(fn.name)
+
+    return results
@@ -0,0 +1,178 @@
+"""
+Benchmarks of the compile pipeline, stage by stage, over generated
+corpora of increasing size. Each corpus is a list of commands, run
+in order through one `Codegen` and `Jit` the way the REPL runs them,
+timing `parse`, `codegen`, `compile` (`Jit.compile_module`, which
+renders, parses, optimizes and finalizes the module, plus resolving
+the entry point) and `run` (the native call) separately.
+
+`run_suite` gives the results as a JSON-ready dict; `compare` finds
+the stages of one set of results that are slower than in another by
+more than a threshold. `bench/suite.py` drives both from the shell.
+"""
+
+import json
+import platform
+from time import perf_counter
+import llvmlite.binding as llvm
+from parsing import get_parser
+from codegen import Codegen
+from jitengine import Jit
+
+stages = ("parse", "codegen", "compile", "run")
+
+
+def nesting(depth):
+    # one expression nested `depth` deep, kept from being
+    # folded away by working on an argument
+    expr = "x"
+    for n in range(depth):
+        expr = f"({expr} {'+-*'[n % 3]} {n % 7 + 1})"
+    return [f"def f(x) {expr} f(2)"]
+
+
+def functions(count):
+    defs = [f"def f{n}(x) x * {n} + {n % 5}" for n in range(count)]
+    calls = " + ".join(f"f{n}({n})" for n in range(0, count, max(1, count // 50)))
+    return [" ".join(defs) + " " + calls]
+
+
+def session(count):
+    # definitions, calls back to them, and plain expressions;
+    # bench/session.py times a long run of these too
+    commands = []
+    for n in range(count):
+        if n % 10 == 0:
+            commands.append(f"def f{n}() {{{n} * 2}} f{n}()")
+        elif n % 10 == 5:
+            commands.append(f"f{n - 5}() + f{(n // 20) * 10}()")
+        else:
+            commands.append(f"when {n} > {n % 3} {n} else 0")
+    return commands
+
+
+def when_chain(length):
+    body = " else ".join(f"when x == {n} {n * 3}" for n in range(length))
+    return [f"def f(x) {body} else 0 f({length - 1})"]
+
+
+# each corpus and the sizes it's run at; the Python recursion
+# limit keeps nesting well under a thousand deep
+corpora = {
+    "nesting": (nesting, (25, 50, 100, 200)),
+    "functions": (functions, (10, 100, 400)),
+    "session": (session, (100, 1000)),
+    "when_chain": (when_chain, (10, 50, 200)),
+}
+
+
+def measure(commands, opt_level=0, parser=None):
+    """
+    Seconds spent in each stage running `commands` through
+    a fresh `Codegen` and `Jit`.
+    """
+    parser = parser or get_parser()
+    codegen = Codegen()
+    jit = Jit(opt_level=opt_level)
+    times = dict.fromkeys(stages, 0.0)
+    for command in commands:
+        start = perf_counter()
+        ast = parser.parse(command, start="immediate")
+        parsed = perf_counter()
+        entry_point = codegen.gen(ast, command)
+        generated = perf_counter()
+        jit.compile_module(codegen)
+        function = jit.resolve(entry_point) if entry_point else None
+        compiled = perf_counter()
+        if function:
+            function()
+        ran = perf_counter()
+        times["parse"] += parsed - start
+        times["codegen"] += generated - parsed
+        times["compile"] += compiled - generated
+        times["run"] += ran - compiled
+    return times
+
+
+def run_suite(names=None, max_size=None, repeat=3, opt_level=0, parser="lark"):
+    """
+    Measure each corpus in `names` (by default, all of them) at each
+    of its sizes up to `max_size`, keeping the best of `repeat` runs
+    for each stage.
+    """
+    # loading the parser and LLVM's first compile aren't
+    # part of any corpus
+    measure(when_chain(2), opt_level, get_parser(parser))
+    results = []
+    for name in names or corpora:
+        generate, sizes = corpora[name]
+        for size in sizes:
+            if max_size and size > max_size:
+                continue
+            commands = generate(size)
+            best = dict.fromkeys(stages, float("inf"))
+            for _ in range(repeat):
+                times = measure(commands, opt_level, get_parser(parser))
+                best = {stage: min(best[stage], times[stage]) for stage in stages}
+            results.append({"corpus": name, "size": size, "stages": best})
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "llvm": ".".join(str(_) for _ in llvm.llvm_version_info),
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "opt_level": opt_level,
+            "parser": parser,
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+def compare(base, new, threshold=0.1, floor=0.0005):
+    """
+    The stages of `new` that took more than `threshold` (a fraction)
+    longer than in `base`, as dicts of corpus, size, stage, both
+    times and their ratio. Differences under `floor` seconds are
+    taken as noise.
+    """
+    baseline = {(_["corpus"], _["size"]): _["stages"] for _ in base["results"]}
+    regressions = []
+    for result in new["results"]:
+        old = baseline.get((result["corpus"], result["size"]))
+        if old is None:
+            continue
+        for stage in stages:
+            before, after = old[stage], result["stages"][stage]
+            if after - before > floor and after > before * (1 + threshold):
+                regressions.append(
+                    {
+                        "corpus": result["corpus"],
+                        "size": result["size"],
+                        "stage": stage,
+                        "base": before,
+                        "new": after,
+                        "ratio": after / before if before else float("inf"),
+                    }
+                )
+    return regressions
+
+
+def report(results, file=None):
+    print(
+        f"{'corpus':>12} {'size':>6} " + " ".join(f"{_ + ' ms':>12}" for _ in stages),
+        file=file,
+    )
+    for result in results["results"]:
+        times = " ".join(f"{result['stages'][_] * 1000:>12.3f}" for _ in stages)
+        print(f"{result['corpus']:>12} {result['size']:>6} {times}", file=file)
+
+
+def save(results, path):
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
@@ -0,0 +1,159 @@
+"""
+Zero-copy access to the memory of Python objects that support the
+buffer protocol (NumPy arrays, `array.array`, memoryviews, bytearrays
+and so on), through the C API's `PyObject_GetBuffer`.
+"""
+
+import ctypes
+import struct
+from ctypes import POINTER, c_void_p, c_char_p, c_int, c_int64, c_ssize_t
+
+
+class Py_buffer(ctypes.Structure):
+    _fields_ = [
+        ("buf", c_void_p),
+        ("obj", ctypes.py_object),
+        ("len", c_ssize_t),
+        ("itemsize", c_ssize_t),
+        ("readonly", c_int),
+        ("ndim", c_int),
+        ("format", c_char_p),
+        ("shape", POINTER(c_ssize_t)),
+        ("strides", POINTER(c_ssize_t)),
+        ("suboffsets", POINTER(c_ssize_t)),
+        ("internal", c_void_p),
+    ]
+
+
+PyBUF_WRITABLE = 0x1
+PyBUF_RECORDS_RO = 0x1C
+
+_get_buffer = ctypes.pythonapi.PyObject_GetBuffer
+_get_buffer.argtypes = (ctypes.py_object, POINTER(Py_buffer), c_int)
+_release_buffer = ctypes.pythonapi.PyBuffer_Release
+_release_buffer.argtypes = (POINTER(Py_buffer),)
+
+# the allocator compiled code uses for arrays
+_free = ctypes.CDLL(None).free
+_free.argtypes = (c_void_p,)
+
+# 'l' and 'q' name the same type where longs are 64 bits
+_aliases = {"l": "q", "L": "Q"} if struct.calcsize("l") == 8 else {}
+
+
+def same_format(a, b):
+    # native byte order and alignment are the default
+    a = a.lstrip("@=")
+    return _aliases.get(a, a) == _aliases.get(b, b)
+
+
+class Buffer:
+    """
+    A one-dimensional view of a buffer-protocol object, held open
+    while in use as a context manager, or until released or freed.
+    """
+
+    def __init__(self, obj, writable=False):
+        self.view = Py_buffer()
+        self.released = True
+        flags = PyBUF_RECORDS_RO | (PyBUF_WRITABLE if writable else 0)
+        _get_buffer(obj, ctypes.byref(self.view), flags)
+        self.released = False
+        view = self.view
+        if view.ndim != 1:
+            self.release()
+            raise ValueError(
+                f"expected a 1-dimensional buffer, got {view.ndim} dimensions"
+            )
+        self.address = view.buf
+        self.format = view.format.decode("ascii")
+        self.length = view.shape[0]
+        self.stride = view.strides[0]
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            _release_buffer(ctypes.byref(self.view))
+
+    def __del__(self):
+        self.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class ArrayStruct(ctypes.Structure):
+    """
+    Base for the ctypes equivalent of an Aki array type (see
+    `array_struct`). Arguments of an array type also accept any
+    writable, contiguous, one-dimensional buffer-protocol object
+    of the right element type, without copying.
+
+    Arrays that Aki code built (with a list literal or `array`) and
+    returned are owned by the caller: nothing frees them, not even
+    evicting the module that built them, until `free` is called.
+    """
+
+    @classmethod
+    def from_param(cls, obj):
+        if isinstance(obj, cls):
+            return obj
+        buffer = Buffer(obj, writable=True)
+        element = cls.element
+        if not same_format(buffer.format, element._type_):
+            buffer.release()
+            raise TypeError(
+                f"expected a buffer for {cls.typename}, got one of '{buffer.format}'"
+            )
+        if buffer.stride != ctypes.sizeof(element):
+            buffer.release()
+            raise ValueError("buffer is not contiguous")
+        array = cls(ctypes.cast(buffer.address, POINTER(element)), buffer.length)
+        # held until the array is, so the memory stays put
+        array.buffer = buffer
+        return array
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, index):
+        if not 0 <= index < self.length:
+            raise IndexError(index)
+        return self.data[index]
+
+    def free(self):
+        """
+        Free the memory of an array built by Aki code; the array, and
+        any views of it, are empty afterwards. Arrays over buffers
+        and views into another array must not be freed.
+        """
+        if hasattr(self, "buffer"):
+            raise ValueError("array is a view of a Python buffer")
+        _free(ctypes.cast(self.data, c_void_p))
+        self.data = None
+        self.length = 0
+
+    def tolist(self):
+        return self.data[: self.length]
+
+    def __repr__(self):
+        return f"<{self.typename} {self.tolist()}>"
+
+
+def array_struct(element, typename):
+    """
+    A new `ArrayStruct` for arrays of the ctype `element`,
+    laid out as Aki passes them: a data pointer and a 64-bit length.
+    """
+    return type(
+        f"{typename[:-2]}_array",
+        (ArrayStruct,),
+        {
+            "_fields_": [("data", POINTER(element)), ("length", c_int64)],
+            "element": element,
+            "typename": typename,
+        },
+    )
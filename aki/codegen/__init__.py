@@ -1,40 +1,216 @@
+import os
+from itertools import islice
 from lark import Token
-from akiast import Function, Immediate, Call, Name
+from akiast import (
+    Node,
+    Function,
+    Immediate,
+    Call,
+    Name,
+    VarRef,
+    Assignment,
+    BinOp,
+    BinOps,
+    IfExpr,
+    WhileExpr,
+    ForExpr,
+    Break,
+    Index,
+    SignedInteger as SignedIntegerNode,
+)
 from akitypes import (
     AkiTypeBase,
+    IntegerBase,
+    FloatBase,
     Boolean,
     SignedInteger,
     UnsignedInteger,
     Float64,
     Float32,
     Float16,
+    AkiFunction,
+    Vector,
+    Array,
+    aki_type,
+    vector_type,
+    llvm_types,
 )
 from llvmlite import ir
-from errors import AkiBaseException, AkiNameError, AkiTypeError
+from errors import AkiBaseException, AkiNameError, AkiTypeError, AkiSyntaxError
+from constfold import fold
+from consts import bounds_error_symbol
+
+# the C library functions arrays are built on, all taking and returning
+# 64-bit integers; they are declared in every module, but Aki code
+# can't call them directly
+runtime = {"malloc": 1, "calloc": 2, "free": 1}
+
+
+def assigned_names(node):
+    """
+    Names assigned to anywhere in `node`,
+    not counting the bodies of nested functions.
+    """
+    names = set()
+    if isinstance(node, list):
+        for _ in node:
+            names |= assigned_names(_)
+    elif isinstance(node, Node) and not isinstance(node, Function):
+        if isinstance(node, Assignment) and node.lhs.__class__ is VarRef:
+            names.add(node.lhs.value)
+        for field in node._fields:
+            names |= assigned_names(getattr(node, field))
+    return names
+
+
+def index_nodes(node, unconditional=False):
+    """
+    `Index` nodes anywhere in `node`, not counting nested functions.
+    If `unconditional`, only those evaluated every time `node` is,
+    so nothing in a branch or loop body.
+    """
+    if isinstance(node, list):
+        for _ in node:
+            yield from index_nodes(_, unconditional)
+    elif isinstance(node, Node) and not isinstance(node, Function):
+        if isinstance(node, Index):
+            yield node
+        for field in node._fields:
+            if unconditional and (
+                (isinstance(node, IfExpr) and field != "if_expr")
+                or (isinstance(node, (WhileExpr, ForExpr)) and field == "body")
+            ):
+                continue
+            yield from index_nodes(getattr(node, field), unconditional)
+
+
+def has_jumps(node):
+    """
+    True if `node` has a `break` or `continue` anywhere,
+    not counting nested functions.
+    """
+    if isinstance(node, list):
+        return any(has_jumps(_) for _ in node)
+    if isinstance(node, Break):
+        return True
+    if isinstance(node, Node) and not isinstance(node, Function):
+        return any(has_jumps(getattr(node, field)) for field in node._fields)
+    return False
+
+
+def safe_key(node):
+    """
+    For an access like `a[i]` or `a[i + 2]`, the tuple
+    (array name, index name, offset), or None for anything else.
+    """
+    target, index = node.target, node.index
+    if target.__class__ is not VarRef:
+        return None
+    offset = 0
+    if (
+        index.__class__ is BinOp
+        and index.op is BinOps.ADD
+        and index.rhs.__class__ is SignedIntegerNode
+    ):
+        offset = int(index.rhs.value)
+        index = index.lhs
+    if index.__class__ is not VarRef or offset < 0:
+        return None
+    return (target.value, index.value, offset)
+
+
+class Loop:
+    """
+    Where `break` and `continue` jump to from inside a loop body,
+    and the loop's counter, which is also its result.
+    """
+
+    __slots__ = ("label", "counter", "latch", "exit", "breaks")
+
+    def __init__(self, label, counter, latch, exit):
+        self.label = label
+        self.counter = counter
+        self.latch = latch
+        self.exit = exit
+        # (counter value, block) for each break, for the exit phi
+        self.breaks = []
 
 
 class Codegen:
-    def __init__(self):
+    def __init__(
+        self,
+        fold_constants=True,
+        bounds_checks="hoist",
+        debug_info=False,
+        filename="<aki>",
+    ):
+        # run the constant folding pass on each AST before codegen
+        self.fold_constants = fold_constants
+        # "on" checks every array access, "hoist" does the same except
+        # in `for` loops, where the checks for a[i] and a[i + k] are
+        # made once before the loop, or dropped when the loop runs
+        # over len(a); "off" checks nothing
+        if bounds_checks not in ("on", "hoist", "off"):
+            raise ValueError(
+                f"bounds checks must be on, hoist or off, got {bounds_checks}"
+            )
+        self.bounds_checks = bounds_checks
+        # emit DWARF line info, tying instructions to the source
+        # lines and columns of `filename` they came from
+        self.debug_info = debug_info
+        self.filename = filename
         self.reset()
 
     def reset(self):
+        # signatures (`AkiFunction`) of functions compiled in earlier
+        # modules, by name; only these are kept so old modules can be freed
+        self.functions = {}
+        # names of those functions that can fail a bounds check
+        self.failing = set()
+        # anonymous entry points generated since the last `gen_immediate`
+        self.entry_points = []
+        self._anon_counter = 0
+        self.new_module()
+
+    def new_module(self):
+        """
+        Start a fresh module for the next command.
+        Functions from earlier modules are not copied in; they are
+        declared on demand (see `declare`) and resolved by the JIT.
+        """
         self.module = ir.Module()
         self.func_context = None
-        self._anon_counter = 0
-
-        # placeholder for start of stidlib generator
-        # right now we just malloc/free, but later we'll use
-        # platform-specific calls and wrap them
-
-        u64 = UnsignedInteger(64).llvm_type()
-
-        fns = (("malloc", u64, (u64,)), ("free", u64, (u64,)))
-
-        for fn_name, fn_ret, fn_args in fns:
-
-            fx = ir.Function(self.module, ir.FunctionType(fn_ret, fn_args), fn_name)
+        self.recursive = False
+        self.builder = None
+        # local variables of the current function, by name:
+        # (value or stack slot, aki type, is stack slot)
+        self.scope = {}
+        # loops enclosing the current point, innermost last
+        self.loops = []
+        self.new_bounds()
+        # debug info: the module's file and compile unit, made when
+        # first needed, and the current function's subprogram
+        self.debug_unit = None
+        self.subprogram = None
+
+        u64 = UnsignedInteger(64)
+
+        for fn_name, arg_count in runtime.items():
+
+            fx = ir.Function(
+                self.module, AkiFunction((u64,) * arg_count, u64).llvm_type(), fn_name
+            )
             fx.storage_class = "extern"
 
+    def new_bounds(self):
+        # bounds check state of the current function: whether it can
+        # fail, its lazily created failure blocks, and the keys
+        # (see `safe_key`) of accesses already known to be in bounds
+        self.fails = False
+        self.error_block = None
+        self.bail_block = None
+        self.safe_indexes = frozenset()
+
     def err(self, exception, node, message):
         raise exception(self.txt, node, message)
 
@@ -43,35 +219,90 @@ class Codegen:
 
     def gen(self, ast, txt):
         self.txt = txt
+        if self.fold_constants:
+            ast = fold(ast)
         if isinstance(ast, Immediate):
             return self.gen_immediate(ast.nodes)
         return self.gen_module(ast)
 
     def gen_module(self, ast):
+        """
+        Generate a whole program (a `Module`) into a fresh module,
+        returning the name of its entry point, `main`. Code outside
+        of functions becomes the body of `main`, unless the program
+        defines `main` itself.
+        """
         self.reset()
-        pass
+        functions = [_ for _ in ast.nodes if isinstance(_, Function)]
+        body = [_ for _ in ast.nodes if not isinstance(_, Function)]
+        main = next((_ for _ in functions if _.name.value == "main"), None)
+        if body:
+            first = body[0][0] if isinstance(body[0], list) else body[0]
+            if main:
+                self.err(
+                    AkiSyntaxError,
+                    first,
+                    "a program with a main function can't have top-level code",
+                )
+            pos = (first.line, first.column)
+            main = Function(pos, Name(pos, "main"), [], None, body)
+            functions.append(main)
+        elif not main:
+            self.err(AkiNameError, ast, "program has no main function")
+        if main.args:
+            self.err(AkiTypeError, main, "main can't take arguments")
+        self.gen_command(functions)
+        result_type = self.functions["main"].return_type
+        if result_type.ctype is None:
+            self.err(
+                AkiTypeError,
+                main,
+                f"main can't return {result_type.typename} to Python",
+            )
+        return "main"
 
     def gen_immediate(self, ast):
+        # later commands never call earlier entry points, so
+        # their signatures aren't kept past the next command
+        for name in self.entry_points:
+            self.functions.pop(name, None)
+            self.failing.discard(name)
+        self.entry_points = []
+        self.new_module()
+        return self.gen_command(ast)
+
+    def gen_command(self, ast):
+        """
+        Generate one command's nodes into the current module.
+        Function definitions become functions of their own, and
+        everything else goes into a new anonymous entry point, whose
+        name is returned (None if there was nothing to run).
+        If anything fails, whatever the command added to the module
+        is removed again, leaving it as it was.
+        """
         self.last_statement = None
+        start = len(self.module.globals)
+        entry_point = None
 
         main_func_body = []
 
-        for node in ast:
-            if not isinstance(node, Function):
-                main_func_body.append(node)
-                continue
-            self.codegen(node)
-
         try:
 
+            for node in ast:
+                if not isinstance(node, Function):
+                    main_func_body.append(node)
+                    continue
+                self.codegen(node)
+
             if main_func_body:
                 self._anon_counter += 1
+                entry_point = self.anon_counter()
                 pos = (main_func_body[0].line, main_func_body[0].column)
                 main_func = Function(
                     pos,
-                    Name(pos, self.anon_counter()),
+                    Name(pos, entry_point),
                     [],
-                    SignedInteger(64),
+                    None,
                     main_func_body,
                 )
 
@@ -79,15 +310,198 @@ class Codegen:
 
                 self.codegen(main_func)
 
+                result_type = self.module.globals[entry_point].ftype.aki.return_type
+                if result_type.ctype is None:
+                    self.err(
+                        AkiTypeError,
+                        main_func,
+                        f"can't return {result_type.typename} to Python; "
+                        "use extract or a reduce_ builtin",
+                    )
+
         except Exception as e:
-            del self.module.globals[self.anon_counter()]
+            for name in self.added_since(start):
+                self.discard(name)
             raise e
 
+        # only register functions once the whole command has succeeded,
+        # so later modules never declare something that was not compiled
+
+        for name in self.added_since(start):
+            fn = self.module.globals[name]
+            if isinstance(fn, ir.Function) and not fn.is_declaration:
+                self.functions[name] = fn.ftype.aki
+        if entry_point:
+            self.entry_points.append(entry_point)
+
+        return entry_point
+
+    def added_since(self, start):
+        """
+        Names of the globals added to the current module since it had
+        `start` of them, newest first. Globals keep insertion order,
+        so this only looks at the new ones.
+        """
+        return list(
+            islice(reversed(self.module.globals), len(self.module.globals) - start)
+        )
+
+    def discard(self, name):
+        """
+        Remove the global `name` from the current module,
+        freeing the name for reuse.
+        """
+        self.module.globals.pop(name, None)
+        self.failing.discard(name)
+        # llvmlite has no public API to release a name
+        self.module.scope._useset.discard(name)
+
+    def declare(self, name):
+        """
+        Return the function `name` for use in the current module,
+        adding an extern declaration if it was defined in an earlier one.
+        """
+        if name in runtime:
+            return None
+        function = self.module.globals.get(name)
+        if function:
+            return function if isinstance(function, ir.Function) else None
+        signature = self.functions.get(name)
+        if not signature:
+            return None
+        function = ir.Function(self.module, signature.llvm_type(), name)
+        function.storage_class = "extern"
+        return function
+
+    def register_library(self, mod):
+        """
+        Make the functions defined in `mod`, an already compiled LLVM
+        module (e.g. from `Jit.load_bc`), callable from later commands.
+        Anonymous entry points and functions with types
+        Aki can't express are skipped. If the module has bounds
+        checks, calls to its functions are checked as for `failing`.
+        """
+        checked = any(_.name == bounds_error_symbol for _ in mod.global_variables)
+        for fn in mod.functions:
+            if fn.is_declaration or fn.name.startswith("ANONYMOUS_"):
+                continue
+            return_type = str(fn.type.element_type).split(" (", 1)[0]
+            try:
+                self.functions[fn.name] = AkiFunction(
+                    [llvm_types[str(arg.type)] for arg in fn.arguments],
+                    llvm_types[return_type],
+                )
+            except KeyError:
+                continue
+            if checked:
+                self.failing.add(fn.name)
+
     def return_value(self, entry_point="main"):
-        return self.module.globals[entry_point].ftype.return_type
+        return self.module.globals[entry_point].ftype.aki.return_type.llvm_type()
+
+    def signature(self, name):
+        """
+        The `AkiFunction` signature of the compiled function `name`.
+        """
+        try:
+            return self.functions[name]
+        except KeyError:
+            raise AkiNameError(
+                self.txt, Name((1, 1), name), f"function {name} not found"
+            )
 
     def codegen(self, node):
-        return getattr(self, f"codegen_{node.__class__.__name__}")(node)
+        method = getattr(self, f"codegen_{node.__class__.__name__}")
+        line = getattr(node, "line", None)
+        if self.subprogram is None or line is None:
+            return method(node)
+        # instructions get the location of the innermost node
+        # they were generated for
+        builder = self.builder
+        saved = builder.debug_metadata
+        builder.debug_metadata = self.debug_location(line, node.column)
+        try:
+            return method(node)
+        finally:
+            builder.debug_metadata = saved
+
+    # Debug info
+
+    def debug_file(self):
+        if self.debug_unit:
+            return self.debug_unit
+        module = self.module
+        # absolute, so the line table alone locates the file,
+        # unless it's a stand-in like <stdin>
+        path = self.filename
+        if not path.startswith("<"):
+            path = os.path.abspath(path)
+        di_file = module.add_debug_info(
+            "DIFile", {"filename": path, "directory": os.path.dirname(path)}
+        )
+        unit = module.add_debug_info(
+            "DICompileUnit",
+            {
+                "language": ir.DIToken("DW_LANG_C"),
+                "file": di_file,
+                "producer": "aki",
+                "runtimeVersion": 0,
+                "isOptimized": False,
+                "emissionKind": 1,
+            },
+            is_distinct=True,
+        )
+        module.add_named_metadata("llvm.dbg.cu", unit)
+        i32 = ir.IntType(32)
+        for flag, value in (("Dwarf Version", 4), ("Debug Info Version", 3)):
+            module.add_named_metadata("llvm.module.flags", [i32(2), flag, i32(value)])
+        self.debug_unit = (di_file, unit)
+        return self.debug_unit
+
+    def debug_subprogram(self, func, node):
+        di_file, unit = self.debug_file()
+        signature = self.module.add_debug_info(
+            "DISubroutineType", {"types": self.module.add_metadata([])}
+        )
+        subprogram = self.module.add_debug_info(
+            "DISubprogram",
+            {
+                "name": func.name,
+                "file": di_file,
+                "line": node.line,
+                "type": signature,
+                "isLocal": False,
+                "isDefinition": True,
+                "scopeLine": node.line,
+                "unit": unit,
+            },
+            is_distinct=True,
+        )
+        func.set_metadata("dbg", subprogram)
+        return subprogram
+
+    def debug_location(self, line, column):
+        return self.module.add_debug_info(
+            "DILocation", {"line": line, "column": column, "scope": self.subprogram}
+        )
+
+    def codegen_list(self, node):
+        # a block yields the value of its last expression
+        result = None
+        for _ in node:
+            result = self.codegen(_)
+        return result
+
+    def truth(self, value, node):
+        """
+        Coerce `value` (from `node`) to a boolean for branching.
+        """
+        aki = value.type.aki
+        if isinstance(aki, Boolean):
+            return value
+        if not hasattr(aki, "op_BOOL"):
+            self.err(AkiTypeError, node, f"{aki.typename} can't be used as a condition")
+        return aki.op_BOOL(value, self.builder)
 
     # Codegen for primitive values
 
@@ -115,135 +529,716 @@ class Codegen:
         lhs = self.codegen(node.lhs)
         rhs = self.codegen(node.rhs)
         if lhs.type.aki != rhs.type.aki:
-            raise AkiTypeError(node, "incompatible types for op")
-        return lhs.type.aki.op(node.op)(lhs, rhs, self.builder)
+            self.err(AkiTypeError, node, "incompatible types for op")
+        return self.op(node, lhs.type.aki)(lhs, rhs, self.builder)
 
     def codegen_UnOp(self, node):
         lhs = self.codegen(node.lhs)
-        return lhs.type.aki.op(node.op)(lhs, self.builder)
+        return self.op(node, lhs.type.aki)(lhs, self.builder)
+
+    def op(self, node, aki):
+        try:
+            return aki.op(node.op)
+        except AttributeError:
+            self.err(
+                AkiTypeError, node, f"{aki.typename} doesn't support {node.op.__name__}"
+            )
+
+    # Variables
+
+    def codegen_VarRef(self, node):
+        try:
+            value, aki, is_slot = self.scope[node.value]
+        except KeyError:
+            self.err(AkiNameError, node, f"name {node.value} not found")
+        if is_slot:
+            value = self.builder.load(value)
+        value.type.aki = aki
+        return value
+
+    def codegen_Assignment(self, node):
+        if node.lhs.__class__ is Index:
+            return self.assign_index(node)
+        if node.lhs.__class__ is not VarRef:
+            self.err(AkiSyntaxError, node.lhs, "can only assign to a name")
+        name = node.lhs.value
+        value = self.codegen(node.rhs)
+        aki = value.type.aki
+        if name in self.scope:
+            slot, slot_aki, is_slot = self.scope[name]
+            if not is_slot:
+                self.err(
+                    AkiSyntaxError, node.lhs, f"can't assign to loop variable {name}"
+                )
+            if slot_aki != aki:
+                self.err(
+                    AkiTypeError,
+                    node.rhs,
+                    f"can't assign {aki.typename} to {name}, "
+                    f"which is {slot_aki.typename}",
+                )
+        else:
+            # stack slots all go at the top of the entry block,
+            # where mem2reg can promote them
+            block = self.builder.block
+            self.builder.position_at_start(self.func_context.entry_basic_block)
+            slot = self.builder.alloca(value.type, name=name)
+            self.builder.position_at_end(block)
+            self.scope[name] = (slot, aki, True)
+        self.builder.store(value, slot)
+        value.type.aki = aki
+        return value
 
     # Control flow
 
     def codegen_Call(self, node: Call):
 
-        function = self.module.globals.get(node.name.value)
+        function = self.declare(node.name.value)
         if not function:
+            # functions take precedence over builtins of the same name
+            builtin = self.builtin(node.name.value)
+            if builtin:
+                return builtin(node)
             self.err(AkiNameError, node, f"function {node.name.value} not found")
 
+        signature = function.ftype.aki
+        if function is self.func_context:
+            self.recursive = True
+
         args = [self.codegen(arg) for arg in node.args.args]
 
-        if len(args) != len(function.args):
+        if len(args) != len(signature.arg_types):
             self.err(
                 AkiBaseException,
                 node.args,
-                f"function {function.name} expected at least {len(function.args)} args, got {len(args)}",
+                f"function {function.name} expected "
+                f"{len(signature.arg_types)} args, got {len(args)}",
             )
 
+        args = [
+            self.expect_type(node, arg, value, aki)
+            for arg, value, aki in zip(node.args.args, args, signature.arg_types)
+        ]
+
         result = self.builder.call(function, args)
-        result.type.aki = function.return_value.type.aki
+
+        # a callee that failed a bounds check returned early,
+        # and so does its caller
+        if self.bounds_checks != "off" and (
+            function.name in self.failing
+            or (function is self.func_context and self.fails)
+        ):
+            failed = self.builder.load(self.bounds_record(0))
+            ok = self.builder.icmp_unsigned("==", failed, ir.Constant(failed.type, 0))
+            self.branch_unless(ok, self.bail())
+
+        result.type.aki = signature.return_type
         return result
 
-    def codegen_Function(self, node: Function):
+    # Builtins
+    # each takes the call node, and generates its arguments itself
 
-        # set up a default return type
-        func_return_type: AkiTypeBase = SignedInteger(64)
-        func_return_type_llvm = func_return_type.llvm_type()
+    def builtin(self, name):
+        vector = vector_type(name)
+        if vector:
+            return lambda node: self.vector_constructor(node, vector)
+        return getattr(self, f"builtin_{name}", None)
 
-        # set up basic function information
-        function_name = node.name.value
-        func_type = ir.FunctionType(func_return_type.llvm_type(), [])
-        func = ir.Function(self.module, func_type, function_name)
+    def call_args(self, node):
+        return [self.codegen(arg) for arg in node.args.args]
 
-        # set this function as the current one in context
-        self.func_context = func
+    def expect_args(self, node, args, *counts):
+        if len(args) not in counts:
+            expected = " or ".join(str(_) for _ in counts)
+            self.err(
+                AkiBaseException,
+                node.args,
+                f"{node.name.value} expected {expected} args, got {len(args)}",
+            )
 
-        # create our function blocks
-        entry_block = func.append_basic_block("entry")
-        start_block = func.append_basic_block("start")
-        exit_block = func.append_basic_block("exit")
+    def expect_vector(self, node, arg, value):
+        if not isinstance(value.type.aki, Vector):
+            self.err(
+                AkiTypeError,
+                arg,
+                f"{node.name.value} expected a vector, got {value.type.aki.typename}",
+            )
+        return value.type.aki
+
+    def expect_type(self, node, arg, value, aki):
+        # integer and float literals adapt to the width required
+        if isinstance(value, ir.Constant) and value.type.aki != aki:
+            same_kind = (
+                isinstance(value.type.aki, IntegerBase),
+                isinstance(value.type.aki, FloatBase),
+            ) == (
+                isinstance(aki, IntegerBase),
+                isinstance(aki, FloatBase),
+            )
+            if same_kind and not isinstance(aki, Boolean):
+                value = ir.Constant(aki.llvm_type(), value.constant)
+        if value.type.aki != aki:
+            self.err(
+                AkiTypeError,
+                arg,
+                f"{node.name.value} expected {aki.typename}, "
+                f"got {value.type.aki.typename}",
+            )
+        value.type.aki = aki
+        return value
 
-        # create our builder and generate the body
-        self.builder = ir.IRBuilder(entry_block)
-        self.builder.position_at_start(start_block)
+    def expect_lane(self, node, arg, value, lanes):
+        if not isinstance(value, ir.Constant) or not isinstance(
+            value.type.aki, IntegerBase
+        ):
+            self.err(
+                AkiTypeError, arg, f"{node.name.value} expected a constant lane number"
+            )
+        if not 0 <= value.constant < lanes:
+            self.err(
+                AkiTypeError,
+                arg,
+                f"lane {value.constant} out of range for {lanes} lanes",
+            )
+        return value.constant
+
+    def vector_constructor(self, node, vector):
+        # `f64x4(x)` fills every lane with x, `f64x4(a, b, c, d)` one each
+        args = self.call_args(node)
+        self.expect_args(node, args, 1, vector.lanes)
+        values = [
+            self.expect_type(node, arg, value, vector.element)
+            for arg, value in zip(node.args.args, args)
+        ]
+        return vector.build(values, self.builder)
+
+    def builtin_extract(self, node):
+        args = self.call_args(node)
+        self.expect_args(node, args, 2)
+        vector = self.expect_vector(node, node.args.args[0], args[0])
+        lane = self.expect_lane(node, node.args.args[1], args[1], vector.lanes)
+        return vector.extract(args[0], ir.Constant(ir.IntType(32), lane), self.builder)
+
+    def builtin_insert(self, node):
+        args = self.call_args(node)
+        self.expect_args(node, args, 3)
+        vector = self.expect_vector(node, node.args.args[0], args[0])
+        lane = self.expect_lane(node, node.args.args[1], args[1], vector.lanes)
+        value = self.expect_type(node, node.args.args[2], args[2], vector.element)
+        return vector.insert(
+            args[0], ir.Constant(ir.IntType(32), lane), value, self.builder
+        )
+
+    def builtin_shuffle(self, node):
+        args = self.call_args(node)
+        # shuffle(a, lanes...) or shuffle(a, b, lanes...),
+        # where the lanes of b are numbered after those of a
+        arg_nodes = node.args.args
+        if len(args) < 3:
+            self.err(AkiBaseException, node.args, "shuffle expected a vector and lanes")
+        vector = self.expect_vector(node, arg_nodes[0], args[0])
+        lhs = rhs = args[0]
+        first_lane = 1
+        if isinstance(args[1].type.aki, Vector):
+            if args[1].type.aki != vector:
+                self.err(
+                    AkiTypeError, arg_nodes[1], "shuffled vectors must be the same type"
+                )
+            rhs = args[1]
+            first_lane = 2
+        available = vector.lanes * first_lane
+        lanes = [
+            self.expect_lane(node, arg, value, available)
+            for arg, value in zip(arg_nodes[first_lane:], args[first_lane:])
+        ]
+        if len(lanes) not in (2, 4, 8, 16, 32, 64):
+            self.err(
+                AkiTypeError,
+                node.args,
+                "shuffles must pick a power of two lanes, from 2 to 64",
+            )
+        return vector.shuffle(lhs, rhs, lanes, self.builder)
+
+    def builtin_select(self, node):
+        args = self.call_args(node)
+        # lane-wise `when`: lanes of a where mask is set, else of b
+        self.expect_args(node, args, 3)
+        mask, lhs, rhs = args
+        vector = self.expect_vector(node, node.args.args[1], lhs)
+        self.expect_type(
+            node, node.args.args[0], mask, Vector(Boolean(1), vector.lanes)
+        )
+        self.expect_type(node, node.args.args[2], rhs, vector)
+        return vector.select(mask, lhs, rhs, self.builder)
+
+    def reduction(op):
+        def builtin(self, node):
+            args = self.call_args(node)
+            self.expect_args(node, args, 1)
+            vector = self.expect_vector(node, node.args.args[0], args[0])
+            if not hasattr(vector, f"op_{op}"):
+                self.err(
+                    AkiTypeError,
+                    node.args.args[0],
+                    f"{vector.typename} doesn't support {op}",
+                )
+            return vector.reduce(op, args[0], self.builder)
+
+        builtin.__doc__ = f"Lane-wise {op} of all the lanes of a vector."
+        return builtin
+
+    builtin_reduce_add = reduction("ADD")
+    builtin_reduce_mul = reduction("MUL")
+    builtin_reduce_min = reduction("MIN")
+    builtin_reduce_max = reduction("MAX")
+    builtin_reduce_and = reduction("BITAND")
+    builtin_reduce_or = reduction("BITOR")
+    builtin_reduce_xor = reduction("BITXOR")
+    del reduction
+
+    def builtin_array(self, node):
+        # array(float64, n) allocates n zeroed elements
+        arg_nodes = node.args.args
+        self.expect_args(node, arg_nodes, 2)
+        type_node = arg_nodes[0]
+        element = aki_type(type_node.value) if type_node.__class__ is VarRef else None
+        if element is None or isinstance(element, Array):
+            self.err(AkiTypeError, type_node, "array expected an element type")
+        count = self.index_value(arg_nodes[1])
+        # negative lengths give empty arrays, as `[0] * -1` does in Python
+        zero = ir.Constant(count.type, 0)
+        count = self.builder.select(
+            self.builder.icmp_signed("<", count, zero), zero, count
+        )
+        aki = Array(element)
+        return aki.make(self.allocate(aki, count, zero=True), count, self.builder)
+
+    def builtin_len(self, node):
+        args = self.call_args(node)
+        self.expect_args(node, args, 1)
+        aki = args[0].type.aki
+        if isinstance(aki, Vector):
+            return SignedInteger.llvm_value(aki.lanes, 64)
+        if not isinstance(aki, Array):
+            self.err(AkiTypeError, node.args.args[0], f"{aki.typename} has no length")
+        return aki.length(args[0], self.builder)
+
+    def builtin_free(self, node):
+        # the array, and any views of it, must not be used afterwards
+        args = self.call_args(node)
+        self.expect_args(node, args, 1)
+        aki = args[0].type.aki
+        if not isinstance(aki, Array):
+            self.err(
+                AkiTypeError,
+                node.args.args[0],
+                f"free expected an array, got {aki.typename}",
+            )
+        data = self.builder.ptrtoint(aki.data(args[0], self.builder), ir.IntType(64))
+        self.builder.call(self.module.globals["free"], [data])
+        return SignedInteger.llvm_value(0, 64)
+
+    # Arrays
+    # list literals and `array` allocate on the heap, and the memory
+    # lives until Aki code calls `free` on it, or Python calls `free`
+    # on an array returned to it. Nothing is freed when a command
+    # finishes or its module is evicted, since the array or views of
+    # it may have been returned.
+
+    def allocate(self, aki, count, zero=False):
+        """
+        Heap memory for `count` (an i64) elements of the array type `aki`,
+        as a pointer to the first.
+        """
+        i64 = ir.IntType(64)
+        # the element size is the address of element 1 past a null pointer
+        size = (
+            ir.Constant(aki.pointer_type, None).gep([ir.Constant(i64, 1)]).ptrtoint(i64)
+        )
+        if zero:
+            memory = self.builder.call(self.module.globals["calloc"], [count, size])
+        else:
+            memory = self.builder.call(
+                self.module.globals["malloc"], [self.builder.mul(count, size)]
+            )
+        return self.builder.inttoptr(memory, aki.pointer_type)
+
+    def array_value(self, node):
+        value = self.codegen(node)
+        aki = value.type.aki
+        if not isinstance(aki, Array):
+            self.err(AkiTypeError, node, f"{aki.typename} can't be indexed")
+        return value, aki
+
+    def index_value(self, node):
+        # indexes of any integer type are widened to 64 bits
+        value = self.codegen(node)
+        aki = value.type.aki
+        if not isinstance(aki, IntegerBase) or isinstance(aki, Boolean):
+            self.err(
+                AkiTypeError, node, f"index must be an integer, got {aki.typename}"
+            )
+        i64 = ir.IntType(64)
+        if value.type.width < 64:
+            if isinstance(aki, SignedInteger):
+                value = self.builder.sext(value, i64)
+            else:
+                value = self.builder.zext(value, i64)
+        return value
+
+    def element_pointer(self, node, array, aki, index):
+        builder = self.builder
+        if self.bounds_checks != "off" and safe_key(node) not in self.safe_indexes:
+            # negative indexes are out of range as unsigned
+            length = aki.length(array, builder)
+            self.check(builder.icmp_unsigned("<", index, length), index, length)
+        return builder.gep(aki.data(array, builder), [index], inbounds=True)
+
+    def codegen_List(self, node):
+        values = []
+        for item in node.items:
+            value = self.codegen(item)
+            values.append((value, value.type.aki))
+        element = values[0][1]
+        for item, (value, aki) in zip(node.items, values):
+            if aki != element:
+                self.err(AkiTypeError, item, "array items must all be the same type")
+        if isinstance(element, Array):
+            self.err(AkiTypeError, node, "arrays of arrays are not supported")
+        aki = Array(element)
+        count = ir.Constant(ir.IntType(64), len(values))
+        data = self.allocate(aki, count)
+        for n, (value, _) in enumerate(values):
+            self.builder.store(
+                value, self.builder.gep(data, [ir.Constant(count.type, n)])
+            )
+        return aki.make(data, count, self.builder)
 
-        body_result = None
+    def codegen_Index(self, node):
+        array, aki = self.array_value(node.target)
+        index = self.index_value(node.index)
+        result = self.builder.load(self.element_pointer(node, array, aki, index))
+        result.type.aki = aki.element
+        return result
 
-        for _ in node.body:
-            body_result = self.codegen(_)
+    def codegen_Slice(self, node):
+        # a view of part of the array; the memory is shared
+        builder = self.builder
+        array, aki = self.array_value(node.target)
+        length = aki.length(array, builder)
+        start = (
+            self.index_value(node.start) if node.start else ir.Constant(length.type, 0)
+        )
+        stop = self.index_value(node.stop) if node.stop else length
+        if self.bounds_checks != "off":
+            # 0 <= start <= stop <= length
+            if node.stop:
+                self.check(builder.icmp_unsigned("<=", stop, length), stop, length)
+                self.check(builder.icmp_unsigned("<=", start, stop), start, stop, 2)
+            else:
+                self.check(builder.icmp_unsigned("<=", start, length), start, length)
+        data = builder.gep(aki.data(array, builder), [start], inbounds=True)
+        return aki.make(data, builder.sub(stop, start), builder)
+
+    def assign_index(self, node):
+        array, aki = self.array_value(node.lhs.target)
+        index = self.index_value(node.lhs.index)
+        value = self.codegen(node.rhs)
+        value_aki = value.type.aki
+        if value_aki != aki.element:
+            self.err(
+                AkiTypeError,
+                node.rhs,
+                f"can't assign {value_aki.typename} to an element of {aki.typename}",
+            )
+        self.builder.store(value, self.element_pointer(node.lhs, array, aki, index))
+        value.type.aki = value_aki
+        return value
+
+    # Bounds checks
+    # a failed check stores (1, index, length), or (2, start, stop)
+    # for a slice that ends before it starts, in the external
+    # `bounds_error_symbol`, which the JIT turns into an AkiIndexError,
+    # and returns zero from the function. callers of a function that
+    # can fail check for this after each call, and return early too.
+
+    def bounds_global(self):
+        # declared as external; the JIT or `aki build` defines it
+        record = self.module.globals.get(bounds_error_symbol)
+        if record is None:
+            record = ir.GlobalVariable(
+                self.module, ir.ArrayType(ir.IntType(64), 3), bounds_error_symbol
+            )
+        return record
+
+    def bounds_record(self, field):
+        i32 = ir.IntType(32)
+        return self.builder.gep(
+            self.bounds_global(), [ir.Constant(i32, 0), ir.Constant(i32, field)]
+        )
+
+    def check(self, ok, index, length, kind=1):
+        """
+        Carry on if `ok`, otherwise fail with `index` and `length`
+        (for `kind` 2, a slice's start and stop).
+        """
+        if self.error_block is None:
+            block = self.func_context.append_basic_block("bounds_error")
+            builder = self.builder
+            current = builder.block
+            builder.position_at_end(block)
+            i64 = ir.IntType(64)
+            phis = tuple(builder.phi(i64, _) for _ in ("kind", "index", "length"))
+            for field, value in enumerate(phis):
+                builder.store(value, self.bounds_record(field))
+            builder.branch(self.bail())
+            builder.position_at_end(current)
+            self.error_block = (block,) + phis
+        block, *phis = self.error_block
+        for phi, value in zip(phis, (ir.Constant(ir.IntType(64), kind), index, length)):
+            phi.add_incoming(value, self.builder.block)
+        self.branch_unless(ok, block)
+
+    def branch_unless(self, ok, target):
+        # failure is the unlikely case
+        in_bounds = self.builder.append_basic_block("ok")
+        self.builder.cbranch(ok, in_bounds, target).set_weights([1 << 20, 1])
+        self.builder.position_at_end(in_bounds)
+
+    def bail(self):
+        # filled in once the function's return type is known
+        if self.bail_block is None:
+            self.bail_block = self.func_context.append_basic_block("bail")
+            self.fails = True
+        return self.bail_block
+
+    def hoist_checks(self, node, bound):
+        """
+        For `for i in n`, the keys of accesses a[i] and a[i + k] in the
+        body that need no check of their own: those checked here once,
+        before the loop, and those a loop over len(a) can't overrun.
+        """
+        if self.bounds_checks != "hoist" or bound.type.aki != SignedInteger(64):
+            return frozenset()
+        name = node.name.value
+        reassigned = assigned_names(node.body)
+
+        def candidates(unconditional):
+            keys = set()
+            for index in index_nodes(node.body, unconditional):
+                key = safe_key(index)
+                if key and key[1] == name and key[0] not in reassigned:
+                    entry = self.scope.get(key[0])
+                    if entry and isinstance(entry[1], Array):
+                        keys.add(key)
+            return keys
+
+        safe = set()
+        iterable = node.iterable
+        if (
+            iterable.__class__ is Call
+            and iterable.name.value == "len"
+            and len(iterable.args.args) == 1
+            and iterable.args.args[0].__class__ is VarRef
+            and not self.declare("len")
+        ):
+            over = iterable.args.args[0].value
+            safe = {key for key in candidates(False) if key[0] == over and key[2] == 0}
+
+        # a check can only be hoisted if its access happens on every
+        # iteration, or it could fail where the loop itself wouldn't
+        if has_jumps(node.body):
+            return frozenset(safe)
+        hoisted = candidates(True) - safe
+        builder = self.builder
+        zero = ir.Constant(bound.type, 0)
+        for key in sorted(hoisted):
+            array, aki, is_slot = self.scope[key[0]]
+            if is_slot:
+                array = builder.load(array)
+            length = aki.length(array, builder)
+            offset = ir.Constant(bound.type, key[2])
+            # n <= 0 or n + k <= length
+            ok = builder.or_(
+                builder.icmp_signed("<=", bound, zero),
+                builder.icmp_signed("<=", bound, builder.sub(length, offset)),
+            )
+            # the first access out of range would have been at max(length, k)
+            first = builder.select(
+                builder.icmp_signed(">", length, offset), length, offset
+            )
+            self.check(ok, first, length)
+        return frozenset(safe | hoisted)
 
-        # compare body result type to default return type
-        # correct if needed
+    def resolve_type(self, vartype):
+        aki = aki_type(vartype.value)
+        if aki is None:
+            self.err(AkiNameError, vartype, f"unknown type {vartype.value}")
+        return aki
 
-        if func_return_type_llvm.aki != body_result.type.aki:
-            func.type = ir.FunctionType(body_result.type, [])
-            func.return_value.type = body_result.type
-            func.ftype.return_type = body_result.type
-            func_return_type_llvm = body_result.type
+    def codegen_Function(self, node: Function):
 
-        # save current position
-        last_body_block = self.builder.block
+        # untyped arguments and results default to int64
+        default_type: AkiTypeBase = SignedInteger(64)
 
-        # allocate space for return value in entry
-        self.builder.position_at_start(entry_block)
-        return_value = func_return_type_llvm.aki.alloca(self.builder)
-        self.builder.branch(start_block)
+        # set up basic function information
+        function_name = node.name.value
+        if function_name in self.module.globals or function_name in self.functions:
+            self.err(AkiNameError, node, f"function {function_name} already defined")
+
+        arg_types = []
+        for arg in node.args:
+            if any(_.name == arg.name for _ in node.args[: len(arg_types)]):
+                self.err(AkiNameError, arg, f"duplicate argument {arg.name}")
+            arg_types.append(
+                self.resolve_type(arg.vartype) if arg.vartype else default_type
+            )
+        return_type = self.resolve_type(node.return_type) if node.return_type else None
+
+        signature = AkiFunction(arg_types, return_type or default_type)
+        func = ir.Function(self.module, signature.llvm_type(), function_name)
+
+        # set this function as the current one in context,
+        # keeping the enclosing one's state for nested definitions
+        saved = (
+            self.func_context,
+            self.builder,
+            self.scope,
+            self.loops,
+            self.recursive,
+            self.fails,
+            self.error_block,
+            self.bail_block,
+            self.safe_indexes,
+            self.subprogram,
+        )
+        self.func_context = func
+        self.scope = {}
+        self.loops = []
+        self.recursive = False
+        self.new_bounds()
 
-        # save result into return value from end of body
-        self.builder.position_at_end(last_body_block)
-        self.builder.store(body_result, return_value)
-        self.builder.branch(exit_block)
+        # create our function blocks; entry is also where
+        # stack slots for mutable variables will go
+        entry_block = func.append_basic_block("entry")
 
-        # return the return value in the exit block
-        self.builder.position_at_start(exit_block)
-        self.builder.ret(self.builder.load(return_value))
+        # create our builder and generate the body
+        self.builder = ir.IRBuilder(entry_block)
+        self.subprogram = None
+        if self.debug_info:
+            self.subprogram = self.debug_subprogram(func, node)
+            self.builder.debug_metadata = self.debug_location(node.line, node.column)
 
-        # clear function context
-        self.func_context = None
+        try:
+            # arguments are used as SSA values unless the body assigns
+            # to them, in which case they're copied to a stack slot
+            reassigned = assigned_names(node.body)
+            for arg, aki, value in zip(node.args, arg_types, func.args):
+                value.name = arg.name
+                if arg.name in reassigned:
+                    slot = self.builder.alloca(value.type, name=arg.name)
+                    self.builder.store(value, slot)
+                    self.scope[arg.name] = (slot, aki, True)
+                else:
+                    self.scope[arg.name] = (value, aki, False)
+
+            body_result = None
+
+            for _ in node.body:
+                body_result = self.codegen(_)
+
+            # without a declared return type, the function returns
+            # whatever type its body yields
+
+            result_type = body_result.type.aki
+            if return_type is None and result_type != default_type:
+                if self.recursive:
+                    self.err(
+                        AkiTypeError,
+                        node,
+                        f"recursive function {function_name} returning "
+                        f"{result_type.typename} needs a declared return type",
+                    )
+                signature = AkiFunction(arg_types, result_type)
+                func.ftype = signature.llvm_type()
+                func.type = func.ftype.as_pointer()
+                func.return_value = ir.values.ReturnValue(func, func.ftype.return_type)
+            elif signature.return_type != result_type:
+                self.err(
+                    AkiTypeError,
+                    node,
+                    f"function {function_name} returns {result_type.typename}, "
+                    f"declared {signature.return_type.typename}",
+                )
+
+            # return the body's value directly, no stack round-trip
+            self.builder.ret(body_result)
+
+            if self.bail_block:
+                self.builder.position_at_end(self.bail_block)
+                self.builder.ret(ir.Constant(func.ftype.return_type, None))
+                self.failing.add(function_name)
+
+        finally:
+            # restore the enclosing function context, if any
+            (
+                self.func_context,
+                self.builder,
+                self.scope,
+                self.loops,
+                self.recursive,
+                self.fails,
+                self.error_block,
+                self.bail_block,
+                self.safe_indexes,
+                self.subprogram,
+            ) = saved
 
     def codegen_WhenExpr(self, node):
         return self.codegen_IfExpr(node, True)
 
     def codegen_IfExpr(self, node, when_expr=False):
 
-        # if expr returns the results of the if
-        # when results the rsults of the branches
-
-        if_block = self.builder.append_basic_block("if_block")
-        then_block = self.builder.append_basic_block("then_block")
-        else_block = self.builder.append_basic_block("else_block")
-        end_block = self.builder.append_basic_block("end_block")
-
-        return_value = None
+        # if expr returns the value of the condition
+        # when returns the value of the branch taken
 
-        # Generate if block
+        if when_expr and node.else_expr is None:
+            self.err(AkiSyntaxError, node, "when expressions need an else branch")
 
-        self.builder.branch(if_block)
-        self.builder.position_at_start(if_block)
         if_expr = self.codegen(node.if_expr)
 
-        if not when_expr:
-            return_value = if_expr.type.aki.alloca(self.builder)
-            self.builder.store(if_expr, return_value)
-
         # coerce to boolean if not already so
-        if not isinstance(if_expr.type.aki, Boolean):
-            if_expr = if_expr.type.aki.op_BOOL(if_expr, self.builder)
+        condition = self.truth(if_expr, node.if_expr)
 
-        self.builder.cbranch(if_expr, then_block, else_block)
+        then_block = self.builder.append_basic_block("then_block")
+        else_block = (
+            self.builder.append_basic_block("else_block")
+            if node.else_expr is not None
+            else None
+        )
+        end_block = self.builder.append_basic_block("end_block")
+
+        self.builder.cbranch(condition, then_block, else_block or end_block)
 
         # Generate then block
+        # nested expressions may leave us in a different block,
+        # so note where each branch ends for the phi
 
-        self.builder.position_at_start(then_block)
+        self.builder.position_at_end(then_block)
         then_expr = self.codegen(node.then_expr)
+        then_end = self.builder.block
+        self.builder.branch(end_block)
 
-        then_branch = self.builder.branch(end_block)
+        if else_block is None:
+            self.builder.position_at_end(end_block)
+            return if_expr
 
         # Generate else block
 
-        self.builder.position_at_start(else_block)
+        self.builder.position_at_end(else_block)
         else_expr = self.codegen(node.else_expr)
-
-        else_branch = self.builder.branch(end_block)
+        else_end = self.builder.block
+        self.builder.branch(end_block)
 
         if then_expr.type.aki != else_expr.type.aki:
             self.err(
@@ -252,26 +1247,138 @@ class Codegen:
                 "then/else expressions must yield same type",
             )
 
-        # Store possible return values if we are in a when expression
-
-        if when_expr:
+        self.builder.position_at_end(end_block)
 
-            self.builder.position_at_start(if_block)
-            return_value = then_expr.type.aki.alloca(self.builder)
-
-            self.builder.position_before(then_branch)
-            self.builder.store(then_expr, return_value)
-
-            self.builder.position_before(else_branch)
-            self.builder.store(else_expr, return_value)
+        if not when_expr:
+            return if_expr
 
-        self.builder.position_at_start(end_block)
+        # merge the branch results
 
-        # Return return value
+        result = self.builder.phi(then_expr.type)
+        result.add_incoming(then_expr, then_end)
+        result.add_incoming(else_expr, else_end)
+        return result
 
-        result = return_value.type.aki.load(return_value, self.builder)
+    # Loops
+    # each loop is laid out in canonical form: the preheader (the block
+    # we come from) falls into a header that tests the condition, the
+    # body branches to a single latch that steps the counter and jumps
+    # back to the header, and every exit goes through one exit block.
+    # a loop yields its counter: the number of completed iterations.
+
+    def codegen_WhileExpr(self, node):
+        counter_type = SignedInteger(64)
+        counter_llvm = counter_type.llvm_type()
+        return self.loop(
+            node,
+            None,
+            ir.Constant(counter_llvm, 0),
+            lambda counter: self.truth(self.codegen(node.condition), node.condition),
+            counter_type,
+            frozenset(),
+        )
+
+    def codegen_ForExpr(self, node):
+        # `for i in n` counts i from 0 up to n - 1
+        bound = self.codegen(node.iterable)
+        bound_type = bound.type.aki
+        if not isinstance(bound_type, IntegerBase) or isinstance(bound_type, Boolean):
+            self.err(AkiTypeError, node.iterable, "for loops need an integer range")
+
+        def condition(counter):
+            counter.type.aki = bound_type
+            return bound_type.op_LT(counter, bound, self.builder)
+
+        safe = self.hoist_checks(node, bound)
+        return self.loop(
+            node,
+            node.name.value,
+            ir.Constant(bound.type, 0),
+            condition,
+            bound_type,
+            safe,
+        )
+
+    def loop(self, node, label, start, condition, counter_type, safe):
+        builder = self.builder
+        preheader = builder.block
+        header = builder.append_basic_block("loop_header")
+        body = builder.append_basic_block("loop_body")
+        latch = builder.append_basic_block("loop_latch")
+        exit = builder.append_basic_block("loop_exit")
+
+        builder.branch(header)
+        builder.position_at_end(header)
+        counter = builder.phi(start.type, name=label or "count")
+        counter.add_incoming(start, preheader)
+        test = condition(counter)
+        builder.cbranch(test, body, exit)
+        header_end = builder.block
+
+        # the loop variable, if any, is read-only and only
+        # visible inside the body; it shadows any outer one
+        builder.position_at_end(body)
+        shadowed = self.scope.get(label)
+        safe_indexes = self.safe_indexes
+        if label:
+            self.scope[label] = (counter, counter_type, False)
+            # accesses indexed by a shadowed loop variable aren't safe here
+            self.safe_indexes = (
+                frozenset(_ for _ in safe_indexes if _[1] != label) | safe
+            )
+        loop = Loop(label, counter, latch, exit)
+        self.loops.append(loop)
+        try:
+            self.codegen(node.body)
+        finally:
+            self.safe_indexes = safe_indexes
+            self.loops.pop()
+            if label:
+                if shadowed:
+                    self.scope[label] = shadowed
+                else:
+                    del self.scope[label]
+        builder.branch(latch)
+
+        builder.position_at_end(latch)
+        counter.type.aki = counter_type
+        step = counter_type.op_ADD(counter, ir.Constant(start.type, 1), builder)
+        counter.add_incoming(step, latch)
+        builder.branch(header)
+
+        builder.position_at_end(exit)
+        result = builder.phi(start.type)
+        result.add_incoming(counter, header_end)
+        for value, block in loop.breaks:
+            result.add_incoming(value, block)
+        result.type.aki = counter_type
         return result
 
+    def find_loop(self, node):
+        if not self.loops:
+            self.err(AkiSyntaxError, node, "not inside a loop")
+        if node.label is None:
+            return self.loops[-1]
+        for loop in reversed(self.loops):
+            if loop.label == node.label.value:
+                return loop
+        self.err(AkiNameError, node.label, f"no enclosing loop over {node.label.value}")
+
+    def jump(self, target):
+        # anything after a break or continue is unreachable,
+        # but still needs a block to be generated into
+        self.builder.branch(target)
+        self.builder.position_at_end(self.builder.append_basic_block("unreachable"))
+        return SignedInteger.llvm_value(0, 64)
+
+    def codegen_Break(self, node):
+        loop = self.find_loop(node)
+        loop.breaks.append((loop.counter, self.builder.block))
+        return self.jump(loop.exit)
+
+    def codegen_Continue(self, node):
+        return self.jump(self.find_loop(node).latch)
+
 
 codegen = Codegen()
 
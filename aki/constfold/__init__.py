@@ -0,0 +1,332 @@
+"""
+Constant folding and dead-branch elimination on the AST,
+run between the parser and `Codegen`.
+
+Folding follows the semantics of the `akitypes` ops exactly,
+including wraparound, signed/unsigned comparisons and ordered float
+comparisons. Anything that would be undefined or an error at runtime,
+such as division by zero, overlong shifts or mismatched operand types,
+is left for codegen to handle (and to report).
+"""
+
+from akiast import (
+    Node,
+    BinOp,
+    UnOp,
+    IfExpr,
+    WhenExpr,
+    Boolean,
+    SignedInteger,
+    UnsignedInteger,
+    Float64,
+    Name,
+    BinOps,
+    UnOps,
+)
+import akitypes
+
+INT = akitypes.SignedInteger(64)
+UINT = akitypes.UnsignedInteger(64)
+BOOL = akitypes.Bool
+FLOAT = akitypes.Float64(64)
+
+# (aki type, bit width) of the integer types handled here
+widths = {INT: 64, UINT: 64, BOOL: 1}
+
+
+class Constant:
+    """
+    A folded value: its aki type and Python value.
+    Integers are kept as unsigned bit patterns of the type's width.
+    """
+
+    __slots__ = ("aki", "value")
+
+    def __init__(self, aki, value):
+        self.aki = aki
+        self.value = value
+
+    def signed(self):
+        width = widths[self.aki]
+        if self.value >= 1 << (width - 1):
+            return self.value - (1 << width)
+        return self.value
+
+    def truth(self):
+        # mirrors op_BOOL for each type; NaN is truthy,
+        # since the ordered compare against 0.0 fails
+        if self.aki is FLOAT:
+            return not (self.value == 0.0)
+        return self.value != 0
+
+
+def constant(node):
+    """
+    Return the `Constant` for a literal node, or None if it isn't one
+    (or is one we don't fold, like half- and single-precision floats).
+    """
+    cls = node.__class__
+    if cls is SignedInteger:
+        value = int(node.value)
+        if -(1 << 63) <= value < 1 << 63:
+            return Constant(INT, value & ((1 << 64) - 1))
+    elif cls is UnsignedInteger:
+        value = int(node.value[:-2])
+        if 0 <= value < 1 << 64:
+            return Constant(UINT, value)
+    elif cls is Boolean:
+        return Constant(BOOL, 1 if node.value == "True" else 0)
+    elif cls is Float64:
+        return Constant(FLOAT, float(node.value))
+    return None
+
+
+def literal(pos, const):
+    aki = const.aki
+    if aki is INT:
+        return SignedInteger(pos, str(const.signed()))
+    if aki is UINT:
+        return UnsignedInteger(pos, f"{const.value}_U")
+    if aki is BOOL:
+        return Boolean(pos, "True" if const.value else "False")
+    return Float64(pos, repr(const.value))
+
+
+def _int(aki, value):
+    return Constant(aki, value & ((1 << widths[aki]) - 1))
+
+
+def _bool(value):
+    return Constant(BOOL, 1 if value else 0)
+
+
+def fold_unop(op, a):
+    if op is UnOps.NEG:
+        if a.aki is INT:
+            return _int(INT, -a.value)
+        if a.aki is BOOL:
+            return Constant(BOOL, a.value ^ 1)
+        if a.aki is FLOAT:
+            return Constant(FLOAT, 0.0 - a.value)
+    return None
+
+
+def fold_binop(op, a, b):
+    aki = a.aki
+    if aki is not b.aki:
+        return None
+    if aki is FLOAT:
+        return fold_float(op, a.value, b.value)
+    if aki is BOOL and op in (BinOps.ADD, BinOps.SUB):
+        # bools are widened to int64 for arithmetic
+        a, b = Constant(INT, a.value), Constant(INT, b.value)
+        aki = INT
+    return fold_int(op, aki, a, b)
+
+
+def fold_int(op, aki, a, b):
+    width = widths[aki]
+    x, y = a.value, b.value
+    if op is BinOps.ADD:
+        return _int(aki, x + y)
+    if op is BinOps.SUB:
+        return _int(aki, x - y)
+    if op is BinOps.MUL:
+        return _int(aki, x * y)
+    if op is BinOps.BITAND:
+        return Constant(aki, x & y)
+    if op is BinOps.BITOR:
+        return Constant(aki, x | y)
+    if op is BinOps.BITXOR:
+        return Constant(aki, x ^ y)
+    if op is BinOps.DIV:
+        if y == 0:
+            return None
+        if aki is INT:
+            sx, sy = a.signed(), b.signed()
+            if sx == -(1 << 63) and sy == -1:
+                return None
+            q = abs(sx) // abs(sy)
+            return _int(aki, q if (sx < 0) == (sy < 0) else -q)
+        return Constant(aki, x // y)
+    if op in (BinOps.LSHIFT, BinOps.RSHIFT):
+        # shifting by the width or more is poison in LLVM
+        if y >= width:
+            return None
+        if op is BinOps.LSHIFT:
+            return _int(aki, x << y)
+        if aki is UINT:
+            return Constant(aki, x >> y)
+        return _int(aki, a.signed() >> y)
+    # comparisons; bools use unsigned compares for ==/!= only,
+    # the others come from IntegerBase and are signed
+    if op is BinOps.EQ:
+        return _bool(x == y)
+    if op is BinOps.NEQ:
+        return _bool(x != y)
+    if aki is not UINT:
+        x, y = a.signed(), b.signed()
+    if op is BinOps.GT:
+        return _bool(x > y)
+    if op is BinOps.LT:
+        return _bool(x < y)
+    if op is BinOps.GTEQ:
+        return _bool(x >= y)
+    if op is BinOps.LTEQ:
+        return _bool(x <= y)
+    return None
+
+
+def fold_float(op, x, y):
+    if op is BinOps.ADD:
+        return Constant(FLOAT, x + y)
+    if op is BinOps.SUB:
+        return Constant(FLOAT, x - y)
+    if op is BinOps.MUL:
+        return Constant(FLOAT, x * y)
+    if op is BinOps.DIV:
+        if y == 0.0:
+            return None
+        return Constant(FLOAT, x / y)
+    # ordered comparisons are all false if either side is NaN
+    if op in comparisons:
+        if x != x or y != y:
+            return _bool(False)
+        return _bool(comparisons[op](x, y))
+    return None
+
+
+comparisons = {
+    BinOps.EQ: lambda x, y: x == y,
+    BinOps.NEQ: lambda x, y: x != y,
+    BinOps.GT: lambda x, y: x > y,
+    BinOps.LT: lambda x, y: x < y,
+    BinOps.GTEQ: lambda x, y: x >= y,
+    BinOps.LTEQ: lambda x, y: x <= y,
+}
+
+
+def static_type(node):
+    """
+    The aki type `node` will have after codegen, if it can be known
+    without generating it, or None.
+    """
+    if not isinstance(node, Node):
+        return None
+    const = constant(node)
+    if const:
+        return const.aki
+    if isinstance(node, BinOp) and node.__class__ is BinOp:
+        lhs, rhs = static_type(node.lhs), static_type(node.rhs)
+        if lhs is None or lhs is not rhs:
+            return None
+        if not hasattr(lhs, f"op_{node.op.__name__}"):
+            return None
+        if node.op in comparisons:
+            return BOOL
+        if lhs is BOOL and node.op in (BinOps.ADD, BinOps.SUB):
+            return INT
+        return lhs
+    if isinstance(node, UnOp):
+        lhs = static_type(node.lhs)
+        if lhs is UINT or not hasattr(lhs, f"op_{node.op.__name__}"):
+            return None
+        return lhs
+    if isinstance(node, IfExpr) and node.else_expr is not None:
+        then_type = static_type(node.then_expr)
+        if then_type is None or then_type is not static_type(node.else_expr):
+            return None
+        if isinstance(node, WhenExpr):
+            return then_type
+        return static_type(node.if_expr)
+    return None
+
+
+def pure(node):
+    """
+    True if evaluating `node` can have no side effects.
+    """
+    if isinstance(node, list):
+        return all(pure(_) for _ in node)
+    if constant(node) or isinstance(node, Name):
+        return True
+    if isinstance(node, (UnOp, IfExpr)) or node.__class__ is BinOp:
+        return all(
+            pure(getattr(node, field)) for field in node._fields if field != "op"
+        )
+    return node is None
+
+
+class ConstantFolder:
+    def fold(self, node):
+        if isinstance(node, list):
+            return [self.fold(_) for _ in node]
+        if not isinstance(node, Node):
+            return node
+        folder = getattr(self, f"fold_{node.__class__.__name__}", None)
+        if folder:
+            return folder(node)
+        return self.fold_fields(node)
+
+    def fold_fields(self, node):
+        """
+        Fold all of a node's children, returning a copy if any changed.
+        """
+        changes = {}
+        for field in node._fields:
+            value = getattr(node, field)
+            folded = self.fold(value)
+            if folded is not value:
+                changes[field] = folded
+        if not changes:
+            return node
+        new = object.__new__(node.__class__)
+        new.line, new.column = node.line, node.column
+        for field in node._fields:
+            setattr(new, field, changes.get(field, getattr(node, field)))
+        return new
+
+    def fold_BinOp(self, node):
+        node = self.fold_fields(node)
+        lhs, rhs = constant(node.lhs), constant(node.rhs)
+        if lhs and rhs:
+            result = fold_binop(node.op, lhs, rhs)
+            if result:
+                return literal((node.line, node.column), result)
+        return node
+
+    def fold_UnOp(self, node):
+        node = self.fold_fields(node)
+        lhs = constant(node.lhs)
+        if lhs:
+            result = fold_unop(node.op, lhs)
+            if result:
+                return literal((node.line, node.column), result)
+        return node
+
+    def fold_IfExpr(self, node):
+        node = self.fold_fields(node)
+        condition = constant(node.if_expr)
+        # branches must still pass codegen's type check,
+        # so only prune when their types are known to match
+        if not condition or static_type(node) is None:
+            return node
+        taken = node.then_expr if condition.truth() else node.else_expr
+        if isinstance(node, WhenExpr):
+            # a `when` yields the branch taken
+            if isinstance(taken, Node):
+                return taken
+            return node
+        # an `if` yields its condition
+        if pure(taken):
+            return node.if_expr
+        return node
+
+    fold_WhenExpr = fold_IfExpr
+
+
+folder = ConstantFolder()
+
+
+def fold(ast):
+    return folder.fold(ast)
@@ -0,0 +1,16 @@
+# symbols shared by compiled code and the Python side that loads it
+
+# external global where a failed bounds check records
+# (failed, index, length)
+bounds_error_symbol = "aki_bounds_error"
+
+# exported by libraries from `aki build`: JSON of each exported
+# function's name, argument type names and return type name
+signatures_symbol = "aki_signatures"
+
+# name of the function lazily compiled stubs call on their first call,
+# with the stub's id, to get the address of the real function
+materialize_symbol = "aki_materialize"
+
+# inlining thresholds LLVM itself uses for -O1 through -O3
+default_inline_thresholds = {1: 225, 2: 225, 3: 275}
@@ -0,0 +1,194 @@
+"""
+Parallel compilation. A module is split by function into partitions,
+each holding some of the functions' definitions and declarations of
+everything else, so calls across partitions are resolved when the
+objects are linked. Worker processes optimize each partition and emit
+its object code. The objects can then be loaded into a `Jit`
+(see `Jit.compile_parallel`) or linked into an `aot` artifact.
+
+Functions in different partitions can't be inlined into each other,
+so this pays off for large modules of many functions, not small ones.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+import llvmlite.binding as llvm
+from llvmlite import ir
+import host
+
+# target machines built by this worker process, by their settings
+_machines = {}
+
+
+def target_machine(opt_level, cpu="", features="", reloc="pic"):
+    """
+    A target machine for the host, for emitting object code.
+    """
+    host.initialize()
+    target = llvm.Target.from_default_triple()
+    # position independent by default, so it can go into a shared library
+    return target.create_target_machine(
+        cpu=cpu, features=features, opt=opt_level, reloc=reloc, codemodel="default"
+    )
+
+
+def shared_machine(opt_level, cpu="", features="", reloc="pic"):
+    """
+    As `target_machine`, but built once per process for each set
+    of settings, so its pass managers can be shared (see `host`).
+    """
+    key = (opt_level, cpu, features, reloc)
+    machine = _machines.get(key)
+    if machine is None:
+        machine = _machines[key] = target_machine(opt_level, cpu, features, reloc)
+    return machine
+
+
+def optimize(mod, machine, opt_level, *options):
+    """
+    Run the pass pipeline `Jit` uses for `opt_level` and `options`
+    (inline threshold, loop and SLP vectorizing) over `mod`, for
+    `machine`, which should come from `shared_machine`.
+    """
+    mod.triple = machine.triple
+    mod.data_layout = str(machine.target_data)
+    return host.run_passes(mod, opt_level, *options, target_machine=machine)
+
+
+def compile_partition(text, opt_level, cpu, features, reloc, *options):
+    """
+    Optimize the IR in `text` and return its object code.
+    Runs in a worker process.
+    """
+    machine = shared_machine(opt_level, cpu, features, reloc)
+    mod = llvm.parse_assembly(text)
+    mod.verify()
+    optimize(mod, machine, opt_level, *options)
+    return machine.emit_object(mod)
+
+
+def function_size(fn):
+    return sum(len(block.instructions) for block in fn.blocks)
+
+
+def partition(module, parts):
+    """
+    Split the functions defined in `module` into at most `parts` lists
+    of names, balanced by instruction count: largest first, each onto
+    the partition with the least so far.
+    """
+    functions = sorted(
+        (fn for fn in module.functions if not fn.is_declaration),
+        key=function_size,
+        reverse=True,
+    )
+    partitions = [[] for _ in range(min(parts, len(functions)))]
+    sizes = [0] * len(partitions)
+    for fn in functions:
+        lightest = sizes.index(min(sizes))
+        partitions[lightest].append(fn.name)
+        sizes[lightest] += function_size(fn) + 1
+    return partitions
+
+
+@contextmanager
+def only_defining(module, names, globals_too):
+    """
+    Temporarily turn every function defined in `module` but not in
+    `names` into a declaration, and, unless `globals_too`, every
+    initialized global variable into an external one.
+    """
+    saved = []
+    for value in module.global_values:
+        if isinstance(value, ir.Function):
+            if value.blocks and value.name not in names:
+                saved.append((value, "blocks", value.blocks))
+                value.blocks = []
+                # a declaration can't have the definition's debug info
+                saved.append((value, "metadata", value.metadata))
+                value.metadata = {}
+        elif value.initializer is not None and not globals_too:
+            saved.append((value, "initializer", value.initializer))
+            saved.append((value, "linkage", value.linkage))
+            # without external linkage, llvmlite defines it as undef
+            value.initializer = None
+            value.linkage = "external"
+    # llvmlite caches each global's text, so it has to be dropped
+    # both here and on the way out
+    for value, _, _ in saved:
+        value._clear_string_cache()
+    try:
+        yield module
+    finally:
+        for value, field, original in saved:
+            setattr(value, field, original)
+            value._clear_string_cache()
+
+
+def partition_ir(module, partitions):
+    """
+    The IR text of each partition. Initialized globals are defined
+    in the first one and declared in the rest.
+    """
+    texts = []
+    for n, names in enumerate(partitions):
+        with only_defining(module, set(names), n == 0):
+            texts.append(str(module))
+    return texts
+
+
+class Driver:
+    """
+    Compiles modules across a pool of `jobs` worker processes
+    (by default, one per CPU), which is kept between calls. The
+    pipeline options default as they do for `Jit`.
+    """
+
+    def __init__(
+        self,
+        jobs=None,
+        opt_level=2,
+        cpu="",
+        features="",
+        reloc="pic",
+        inline_threshold=None,
+        loop_vectorize=None,
+        slp_vectorize=None,
+    ):
+        self.jobs = jobs or os.cpu_count() or 1
+        self.opt_level = opt_level
+        self.options = host.settings(
+            opt_level, inline_threshold, loop_vectorize, slp_vectorize
+        )[1:]
+        self.cpu = cpu
+        self.features = features
+        self.reloc = reloc
+        self.pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self.pool:
+            self.pool.shutdown()
+            self.pool = None
+
+    def compile(self, module):
+        """
+        Return the object code of each partition of `module`,
+        an `llvmlite.ir.Module`.
+        """
+        texts = partition_ir(module, partition(module, self.jobs))
+        settings = (self.opt_level, self.cpu, self.features, self.reloc, *self.options)
+        if len(texts) < 2:
+            return [compile_partition(text, *settings) for text in texts]
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(self.jobs)
+        futures = [
+            self.pool.submit(compile_partition, text, *settings) for text in texts
+        ]
+        return [_.result() for _ in futures]
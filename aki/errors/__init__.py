@@ -17,7 +17,7 @@ class AkiBaseException(Exception):
         return self.__class__.__name__[3:]
 
     def __str__(self):
-        lines = self.txt.split()
+        lines = self.txt.split("\n")
         line = self.node.line - 1
         return f"{self.err_type}: (line {self.node.line}, col {self.node.column}) {self.err}\n{lines[line]}\n{'-'*(self.node.column-1)}^"
 
@@ -32,3 +32,28 @@ class AkiTypeError(AkiBaseException):
 
 class AkiNameError(AkiBaseException):
     pass
+
+
+class AkiIndexError(IndexError):
+    """
+    Raised in Python when compiled code fails a bounds check: an
+    index past `length`, or a slice whose start `index` is past `stop`.
+    """
+
+    def __init__(self, index, length=None, stop=None):
+        self.index = index
+        self.length = length
+        self.stop = stop
+        if stop is None:
+            message = f"index {index} out of range for array of length {length}"
+        else:
+            message = f"slice start {index} is past its stop {stop}"
+        super().__init__(f"IndexError: {message}")
+
+    @classmethod
+    def from_record(cls, record):
+        # the bounds error record compiled code fills in:
+        # (1, index, length), or (2, start, stop) for a reversed slice
+        if record[0] == 2:
+            return cls(record[1], stop=record[2])
+        return cls(record[1], record[2])
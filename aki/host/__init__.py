@@ -0,0 +1,150 @@
+"""
+LLVM state shared by every `Jit` in the process: LLVM itself, set up
+once; the host's triple, CPU and features; a target machine tuned for
+the host at each optimization level, which pass managers cost things
+against; the pass managers themselves, by their settings, which `Jit`, the
+`driver` workers and `aot` all optimize with through `run_passes`;
+and a pool of spare MCJIT engines, so a new or reset `Jit` doesn't
+wait on one.
+
+An engine takes ownership of the target machine it's built with, so
+each engine still gets its own, made to the same host description.
+"""
+
+from functools import lru_cache
+import llvmlite.binding as llvm
+from consts import default_inline_thresholds
+
+_initialized = False
+
+
+def initialize():
+    global _initialized
+    if _initialized:
+        return
+    llvm.initialize()
+    llvm.initialize_native_target()
+    llvm.initialize_native_asmprinter()
+    _initialized = True
+
+
+@lru_cache(maxsize=None)
+def host():
+    """
+    The host's (triple, CPU name, CPU features).
+    """
+    initialize()
+    try:
+        features = llvm.get_host_cpu_features().flatten()
+    except RuntimeError:
+        # not every platform can report them
+        features = ""
+    return llvm.get_default_triple(), llvm.get_host_cpu_name(), features
+
+
+def new_machine(opt_level):
+    triple, cpu, features = host()
+    target = llvm.Target.from_triple(triple)
+    return target.create_target_machine(cpu=cpu, features=features, opt=opt_level)
+
+
+@lru_cache(maxsize=None)
+def machine(opt_level):
+    """
+    The shared host target machine for `opt_level`. It belongs to no
+    engine, so it lives as long as the process.
+    """
+    return new_machine(opt_level)
+
+
+def settings(opt_level, inline_threshold=None, loop_vectorize=None, slp_vectorize=None):
+    """
+    The pipeline settings for `opt_level`, with LLVM's defaults for
+    that level in place of the ones given as None.
+    """
+    if inline_threshold is None:
+        inline_threshold = default_inline_thresholds.get(opt_level)
+    if loop_vectorize is None:
+        loop_vectorize = opt_level >= 2
+    if slp_vectorize is None:
+        slp_vectorize = opt_level >= 2
+    return opt_level, inline_threshold, loop_vectorize, slp_vectorize
+
+
+@lru_cache(maxsize=None)
+def pass_managers(
+    opt_level, inline_threshold, loop_vectorize, slp_vectorize, target_machine
+):
+    """
+    A pass manager builder and a module pass manager populated by it,
+    for these settings, costing things against `target_machine`, which
+    has to live as long as the process. Function pass managers are
+    tied to a module, so `run_passes` builds those per module.
+    """
+    pmb = llvm.create_pass_manager_builder()
+    pmb.opt_level = opt_level
+    if inline_threshold:
+        pmb.inlining_threshold = inline_threshold
+    pmb.loop_vectorize = loop_vectorize
+    pmb.slp_vectorize = slp_vectorize
+    module_pm = llvm.create_module_pass_manager()
+    target_machine.add_analysis_passes(module_pm)
+    pmb.populate(module_pm)
+    return pmb, module_pm
+
+
+def run_passes(mod, opt_level, *options, target_machine=None):
+    """
+    Optimize `mod` in place with the pipeline for `opt_level` and
+    `options` (as for `settings`), costing things against
+    `target_machine` (by default, the shared one for `opt_level`).
+    Level 0 runs no passes.
+    """
+    if not opt_level:
+        return mod
+    target_machine = target_machine or machine(opt_level)
+    pmb, module_pm = pass_managers(*settings(opt_level, *options), target_machine)
+    function_pm = llvm.create_function_pass_manager(mod)
+    target_machine.add_analysis_passes(function_pm)
+    pmb.populate(function_pm)
+    function_pm.initialize()
+    for func in mod.functions:
+        function_pm.run(func)
+    function_pm.finalize()
+    module_pm.run(mod)
+    return mod
+
+
+class EnginePool:
+    """
+    Spare MCJIT engines, each with an empty backing module, by the
+    optimization level of their target machine. `take` builds one if
+    there's none spare; `fill` tops up the levels asked for so far
+    to `size` spares, for calling while there's nothing else to do.
+    Engines are never given back, as MCJIT only frees the code of
+    removed modules along with the engine.
+    """
+
+    def __init__(self, size=2):
+        self.size = size
+        self.spares = {}
+        self.built = 0
+
+    def build(self, opt_level):
+        initialize()
+        self.built += 1
+        return llvm.create_mcjit_compiler(
+            llvm.parse_assembly(""), new_machine(opt_level)
+        )
+
+    def take(self, opt_level):
+        spares = self.spares.setdefault(opt_level, [])
+        return spares.pop() if spares else self.build(opt_level)
+
+    def fill(self):
+        for opt_level, spares in self.spares.items():
+            while len(spares) < self.size:
+                spares.append(self.build(opt_level))
+
+
+engines = EnginePool()
@@ -1,63 +1,675 @@
 import llvmlite.binding as llvm
-from ctypes import c_int64, CFUNCTYPE
+from ctypes import c_int64, addressof
+from itertools import repeat
+from collections import deque
+import hashlib
+import weakref
+import os
+import resource
+from errors import AkiIndexError
+from consts import bounds_error_symbol
+from driver import only_defining
+from lazy import register, unregister, body_name, stub_module, check_failed
+from timing import no_stats
+import host
+
+default_cache_dir = os.path.join(os.path.expanduser("~"), ".cache", "aki")
+
+# where compiled code records a failed bounds check: (failed, index, length)
+bounds_error = (c_int64 * 3)()
+llvm.add_symbol(bounds_error_symbol, addressof(bounds_error))
+
+
+def check_bounds(result=None, func=None, arguments=None):
+    """
+    Raise `AkiIndexError` if compiled code failed a bounds check since
+    the last call, else return `result`. Used as a ctypes `errcheck`.
+    """
+    if bounds_error[0]:
+        error = AkiIndexError.from_record(bounds_error)
+        bounds_error[0] = 0
+        raise error
+    return result
+
+
+def check_lazy(result=None, func=None, arguments=None):
+    # for a lazy JIT, where any call may compile, and fail to
+    return check_bounds(check_failed(result))
+
+
+def resident_bytes():
+    # the current resident set size where /proc has it,
+    # else the peak one
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * resource.getpagesize()
+    except OSError:
+        scale = 1 if os.uname().sysname == "Darwin" else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+class ObjectCache:
+    """
+    Compiled object code stored on disk, one file per module.
+    Entries are keyed by the optimized IR plus everything else that
+    affects codegen; least recently used entries are evicted once the
+    cache grows past `max_size` bytes.
+    """
+
+    def __init__(self, path=default_cache_dir, max_size=64 * 1024 * 1024):
+        self.path = path
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(path, exist_ok=True)
+
+    def key(self, llvm_ir, *target_info):
+        h = hashlib.sha256(llvm_ir.encode("utf-8"))
+        for item in target_info:
+            h.update(b"\0" + str(item).encode("utf-8"))
+        return h.hexdigest()
+
+    def filename(self, key):
+        return os.path.join(self.path, f"{key}.o")
+
+    def load(self, key):
+        filename = self.filename(key)
+        try:
+            with open(filename, "rb") as f:
+                data = f.read()
+        except OSError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        # mark as recently used
+        os.utime(filename)
+        return data
+
+    def store(self, key, data):
+        filename = self.filename(key)
+        temp = f"{filename}.{os.getpid()}.tmp"
+        with open(temp, "wb") as f:
+            f.write(data)
+        os.replace(temp, filename)
+        self.evict()
+
+    def evict(self):
+        entries = []
+        total = 0
+        for entry in os.scandir(self.path):
+            if not entry.name.endswith(".o"):
+                continue
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total += stat.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
 
 
 class Jit:
-    def __init__(self):
-        llvm.initialize()
-        llvm.initialize_native_target()
-        llvm.initialize_native_asmprinter()
+    def __init__(
+        self,
+        opt_level=0,
+        inline_threshold=None,
+        loop_vectorize=None,
+        slp_vectorize=None,
+        cache_dir=None,
+        cache_size=64 * 1024 * 1024,
+        lazy=False,
+        stats=None,
+        perf=None,
+        keep_results=None,
+        recycle_after=1000,
+    ):
+        """
+        `opt_level` (0-3) selects both the IR pass pipeline and the
+        codegen level of the target machine. 0 skips IR passes entirely,
+        for fast compiles at the REPL. The remaining options default to
+        what LLVM picks for the given level.
+
+        If `cache_dir` is set, compiled object code is kept there
+        (up to `cache_size` bytes) and reused by later runs.
+
+        If `lazy`, named functions are only optimized and compiled
+        when first called (see the `lazy` package).
+
+        `stats`, a `timing.Stats`, records how long each stage of
+        compiling and running takes; it can also be set later.
+
+        `perf`, a `perf.Profiler`, is told about the functions in each
+        object this JIT finalizes, so Linux perf can name them.
+
+        If `keep_results` is set, only the anonymous entry points of
+        that many earlier modules stay callable; modules holding nothing
+        else are removed from the engine once theirs go (see `trim`).
+        MCJIT only frees machine code along with its engine, so after
+        `recycle_after` removals the engine is rebuilt (see `recycle`).
+
+        LLVM setup, the target machine and the pass managers are shared
+        with every other `Jit` (see the `host` package), and the engine
+        comes from a pool, so making one costs very little.
+        """
+        host.initialize()
+        if opt_level not in range(4):
+            raise ValueError(f"opt level must be 0-3, got {opt_level}")
+        (
+            self.opt_level,
+            self.inline_threshold,
+            self.loop_vectorize,
+            self.slp_vectorize,
+        ) = host.settings(opt_level, inline_threshold, loop_vectorize, slp_vectorize)
+        self.object_cache = ObjectCache(cache_dir, cache_size) if cache_dir else None
+        self.perf = perf
+        # object code of the module last finalized, if the hooks are on
+        self.last_object = None
+        self.create_pass_managers()
+        self.lazy = lazy
+        self.stats = stats or no_stats
+        self.keep_results = keep_results
+        self.recycle_after = recycle_after
+        # ids of this JIT's lazy stubs, by function name; they leave
+        # the `lazy` registry with their module, or with this JIT
+        self.stub_ids = {}
+        weakref.finalize(self, unregister, self.stub_ids.values())
+        self.reset()
+
+    def reset(self):
+        """
+        Drop everything compiled so far, carrying on with a fresh
+        engine. Callables resolved before keep the old one alive.
+        """
+        unregister(self.stub_ids.values())
+        self.stub_ids.clear()
         self.create_execution_engine()
         self.mod = None
+        # every module added to the engine, oldest first;
+        # symbols are resolved across all of them
+        self.modules = []
+        # `AkiFunction` signatures of functions compiled by `execute`,
+        # and the ctypes wrappers resolved for them, by name
+        self.signatures = {}
+        self.symbols = {}
+        # names of those functions whose modules have bounds checks
+        self.checked = set()
+        # Codegen modules of lazy functions not compiled yet, by name,
+        # how many functions were deferred, and those since compiled
+        self.pending = {}
+        self.deferred = 0
+        self.materialized = []
+        # names of the anonymous entry points of each module compiled,
+        # oldest first, with the module if it holds nothing else (else
+        # None); only kept while `keep_results` is set
+        self.results = deque()
+        # object code from `compile_parallel`, reloaded by `recycle`
+        self.objects = []
+        # modules removed by `trim`, in all and since the engine was
+        # made (their code is still in it), and engines rebuilt
+        self.evicted = 0
+        self.dead = 0
+        self.recycled = 0
 
     def create_execution_engine(self):
-        # Create a target machine representing the host
-        target = llvm.Target.from_default_triple()
-        target_machine = target.create_target_machine()
-        # And an execution engine with an empty backing module
-        backing_mod = llvm.parse_assembly("")
-        self.engine = llvm.create_mcjit_compiler(backing_mod, target_machine)
+        # the shared host target machine, and an engine made to match
+        _, self.cpu, self.features = host.host()
+        self.target_machine = host.machine(self.opt_level)
+        self.engine = host.engines.take(self.opt_level)
+        if self.object_cache or self.perf:
+            self.engine.set_object_cache(self.cache_notify, self.cache_getbuffer)
+
+    # Object cache hooks, called by MCJIT around codegen for each module
+
+    def cache_key(self, mod):
+        return self.object_cache.key(
+            str(mod),
+            self.target_machine.triple,
+            self.cpu,
+            self.features,
+            self.opt_level,
+        )
+
+    def cache_notify(self, mod, data):
+        self.last_object = data
+        if self.object_cache:
+            self.object_cache.store(self.cache_key(mod), data)
+
+    def cache_getbuffer(self, mod):
+        self.last_object = (
+            self.object_cache.load(self.cache_key(mod)) if self.object_cache else None
+        )
+        return self.last_object
+
+    @property
+    def cache_hits(self):
+        return self.object_cache.hits if self.object_cache else 0
+
+    @property
+    def cache_misses(self):
+        return self.object_cache.misses if self.object_cache else 0
+
+    def create_pass_managers(self):
+        self.pm_builder = None
+        self.module_pm = None
+        if not self.opt_level:
+            return
+        self.pm_builder, self.module_pm = host.pass_managers(
+            self.opt_level,
+            self.inline_threshold,
+            self.loop_vectorize,
+            self.slp_vectorize,
+            host.machine(self.opt_level),
+        )
+
+    def optimize(self, mod):
+        if not self.pm_builder:
+            return mod
+        with self.stats.stage("optimize"):
+            return self.run_passes(mod)
+
+    def run_passes(self, mod):
+        return host.run_passes(
+            mod,
+            self.opt_level,
+            self.inline_threshold,
+            self.loop_vectorize,
+            self.slp_vectorize,
+            target_machine=self.target_machine,
+        )
 
     def compile_ir(self, llvm_ir):
         # Create a LLVM module object from the IR
         try:
-            mod = llvm.parse_assembly(llvm_ir)
+            with self.stats.stage("parse_ir"):
+                mod = llvm.parse_assembly(llvm_ir)
         except RuntimeError:
             print(llvm_ir)
             raise Exception
-        mod.verify()
+        with self.stats.stage("verify"):
+            mod.verify()
+        self.prepare(mod)
+        self.optimize(mod)
         # Now add the module and make sure it is ready for execution
-        self.engine.add_module(mod)
-        self.engine.finalize_object()
-        self.engine.run_static_constructors()
+        return self.add_module(mod)
+
+    def prepare(self, mod):
+        # passes like the vectorizers need the real target to cost things
+        mod.triple = self.target_machine.triple
+        mod.data_layout = str(self.target_machine.target_data)
+
+    def add_module(self, mod):
+        with self.stats.stage("finalize"):
+            self.engine.add_module(mod)
+            self.engine.finalize_object()
+            # this walks every module in the engine, so skip it
+            # unless the new module actually has constructors
+            if self.has_constructors(mod):
+                self.engine.run_static_constructors()
+        if self.perf and self.last_object:
+            self.perf.record(self.last_object, self.engine.get_function_address)
+            self.last_object = None
         return mod
 
+    def has_constructors(self, mod):
+        try:
+            mod.get_global_variable("llvm.global_ctors")
+        except NameError:
+            return False
+        return True
+
     def execute(self, codegen, entry_point="main"):
-        self.mod = self.compile_ir(str(codegen.module))
-        func_ptr = self.engine.get_function_address(entry_point)
-        cfunc = CFUNCTYPE(codegen.return_value(codegen.anon_counter()).aki.ctype)(
-            func_ptr
+        # `codegen.module` only holds what the last command generated,
+        # so only that delta is parsed and compiled here
+        self.compile_module(codegen)
+        with self.stats.stage("resolve"):
+            cfunc = self.resolve(entry_point)
+        with self.stats.stage("run"):
+            return cfunc()
+
+    def execute_batch(self, codegen, entry_points):
+        """
+        Compile `codegen.module` once and call each of `entry_points`
+        in turn, returning their results.
+        """
+        self.compile_module(codegen)
+        return [self.resolve(entry_point)() for entry_point in entry_points]
+
+    def compile_module(self, codegen):
+        if self.keep_results is not None:
+            self.trim(self.keep_results)
+        if self.lazy:
+            self.mod = self.compile_lazy(codegen.module)
+        else:
+            with self.stats.stage("emit_ir"):
+                llvm_ir = str(codegen.module)
+            self.mod = self.compile_ir(llvm_ir)
+        self.modules.append(self.mod)
+        checked = bounds_error_symbol in codegen.module.globals
+        for fn in codegen.module.functions:
+            # helpers generated outside of Aki code (like ufunc
+            # drivers) have no Aki signature
+            if not fn.is_declaration and hasattr(fn.ftype, "aki"):
+                self.signatures[fn.name] = fn.ftype.aki
+                if checked:
+                    self.checked.add(fn.name)
+        if self.keep_results is not None:
+            self.track(codegen.module, self.mod)
+        return self.mod
+
+    def track(self, module, mod):
+        # note the entry points of `module`, compiled as `mod`
+        defined = [fn.name for fn in module.functions if not fn.is_declaration]
+        anonymous = [_ for _ in defined if _.startswith("ANONYMOUS_")]
+        if anonymous:
+            disposable = len(anonymous) == len(defined)
+            self.results.append((anonymous, mod if disposable else None))
+
+    def trim(self, keep):
+        """
+        Forget all but the entry points of the last `keep` modules
+        that had any, removing modules that defined nothing else from
+        the engine. Named functions can be declared by any later
+        module, so the modules defining them are always kept.
+        """
+        while len(self.results) > keep:
+            names, mod = self.results.popleft()
+            for name in names:
+                self.signatures.pop(name, None)
+                self.symbols.pop(name, None)
+                self.checked.discard(name)
+            if mod is not None:
+                self.engine.remove_module(mod)
+                self.modules.remove(mod)
+                if self.mod is mod:
+                    self.mod = None
+                self.evicted += 1
+                self.dead += 1
+        if self.dead >= self.recycle_after:
+            self.recycle()
+
+    def recycle(self):
+        """
+        Move every module still kept into a new engine and let the
+        old one go, freeing the machine code of those removed from it.
+        Callables resolved before keep the old engine alive for as
+        long as they exist.
+        """
+        with self.stats.stage("recycle"):
+            for mod in self.modules:
+                self.engine.remove_module(mod)
+            self.create_execution_engine()
+            self.symbols.clear()
+            for mod in self.modules:
+                self.add_module(mod)
+            for obj in self.objects:
+                self.engine.add_object_file(llvm.ObjectFileRef.from_data(obj))
+            if self.objects:
+                self.engine.finalize_object()
+        self.dead = 0
+        self.recycled += 1
+
+    @property
+    def memory_stats(self):
+        """
+        Modules and functions held by the engine, entry points still
+        callable, the modules `trim` removed (`evicted`, of which
+        `dead` still take up code memory), engines rebuilt so far,
+        lazy functions not yet compiled, and the process's resident
+        set size in bytes.
+        """
+        return {
+            "modules": len(self.modules),
+            "functions": sum(
+                1
+                for mod in self.modules
+                for fn in mod.functions
+                if not fn.is_declaration
+            ),
+            "results": sum(len(names) for names, _ in self.results),
+            "evicted": self.evicted,
+            "dead": self.dead,
+            "recycled": self.recycled,
+            "pending": len(self.pending),
+            "resident": resident_bytes(),
+        }
+
+    def compile_lazy(self, module):
+        """
+        Compile the Codegen module `module` with a stub in place of
+        each named function, leaving their bodies for `materialize`.
+        Anonymous entry points are run right away, so they are
+        compiled as usual.
+        """
+        lazy = [
+            fn
+            for fn in module.functions
+            if not fn.is_declaration
+            and hasattr(fn.ftype, "aki")
+            and not fn.name.startswith("ANONYMOUS_")
+        ]
+        if not lazy:
+            with self.stats.stage("emit_ir"):
+                llvm_ir = str(module)
+            return self.compile_ir(llvm_ir)
+        eager = {fn.name for fn in module.functions if not fn.is_declaration} - {
+            fn.name for fn in lazy
+        }
+        with only_defining(module, eager, True):
+            with self.stats.stage("emit_ir"):
+                llvm_ir = str(module)
+        with self.stats.stage("parse_ir"):
+            mod = llvm.parse_assembly(llvm_ir)
+        with self.stats.stage("verify"):
+            mod.verify()
+        self.prepare(mod)
+        self.optimize(mod)
+        # the stubs are as small as they get, so they skip the passes
+        for fn in lazy:
+            self.stub_ids[fn.name] = register(self, fn.name)
+        stubs = stub_module(
+            [(fn.name, fn.ftype, self.stub_ids[fn.name]) for fn in lazy]
         )
-        res = cfunc()
-        return res
+        mod.link_in(llvm.parse_assembly(str(stubs)))
+        for fn in lazy:
+            self.pending[fn.name] = module
+        self.deferred += len(lazy)
+        return self.add_module(mod)
+
+    def materialize(self, name):
+        """
+        Optimize and compile the body of the lazy function `name`,
+        returning its address. Called by its stub on the first call.
+        """
+        if name not in self.pending:
+            # called again from a stub whose slot was lost to `recycle`
+            return self.engine.get_function_address(body_name(name))
+        with self.stats.stage("materialize"):
+            with only_defining(self.pending.pop(name), {name}, False) as module:
+                mod = llvm.parse_assembly(str(module))
+            mod.get_function(name).name = body_name(name)
+            mod.verify()
+            self.prepare(mod)
+            self.optimize(mod)
+            self.add_module(mod)
+        self.modules.append(mod)
+        self.materialized.append(name)
+        return self.engine.get_function_address(body_name(name))
+
+    @property
+    def lazy_stats(self):
+        """
+        How many functions were compiled lazily (`deferred`), how many
+        of those have been called and so compiled (`materialized`),
+        and how many are still waiting (`pending`).
+        """
+        return {
+            "deferred": self.deferred,
+            "materialized": len(self.materialized),
+            "pending": len(self.pending),
+        }
+
+    def compile_parallel(self, codegen, driver):
+        """
+        As `compile_module`, but with the module's functions optimized
+        and compiled across the processes of `driver` (a `driver.Driver`),
+        then loaded as object code. Object code can't be removed from
+        the engine again, so `clear` doesn't apply to it.
+        """
+        objects = driver.compile(codegen.module)
+        self.objects.extend(objects)
+        for obj in objects:
+            self.engine.add_object_file(llvm.ObjectFileRef.from_data(obj))
+        self.engine.finalize_object()
+        if self.perf:
+            for obj in objects:
+                self.perf.record(obj, self.engine.get_function_address)
+        self.mod = None
+        checked = bounds_error_symbol in codegen.module.globals
+        for fn in codegen.module.functions:
+            if not fn.is_declaration and hasattr(fn.ftype, "aki"):
+                self.signatures[fn.name] = fn.ftype.aki
+                if checked:
+                    self.checked.add(fn.name)
+        if self.keep_results is not None:
+            self.track(codegen.module, None)
+
+    def resolve(self, name, signature=None):
+        """
+        Return the ctypes wrapper for the compiled function `name`.
+        Addresses and prototypes are resolved once per name and
+        signature, and cached until the function's module is removed.
+        `signature` is only needed for functions `execute` didn't
+        compile, such as those from a loaded library.
+        """
+        if signature is None:
+            try:
+                signature = self.signatures[name]
+            except KeyError:
+                raise KeyError(f"function {name} is not compiled in this JIT")
+        try:
+            cached_signature, cfunc = self.symbols[name]
+            if cached_signature == signature:
+                return cfunc
+        except KeyError:
+            pass
+        func_ptr = self.engine.get_function_address(name)
+        if not func_ptr:
+            raise KeyError(f"function {name} is not compiled in this JIT")
+        cfunc = signature.ctype(func_ptr)
+        cfunc.jit = self
+        cfunc.engine = self.engine
+        if self.lazy:
+            cfunc.errcheck = check_lazy
+        elif name in self.checked:
+            cfunc.errcheck = check_bounds
+        self.signatures[name] = signature
+        self.symbols[name] = (signature, cfunc)
+        return cfunc
+
+    def get_callable(self, codegen, name):
+        """
+        Return a Python callable for the compiled function `name`,
+        with ctypes argument and return types from its Aki signature.
+        It can be called any number of times, and keeps this JIT
+        (and so the compiled code) alive for as long as it exists.
+        """
+        return self.resolve(name, codegen.signature(name))
+
+    def invoke(self, name, *args):
+        """
+        Call the compiled function `name` with `args`.
+        """
+        return self.resolve(name)(*args)
+
+    def call_many(self, name, n, *args):
+        """
+        Call the compiled function `name` with `args` `n` times,
+        returning the list of results.
+        """
+        cfunc = self.resolve(name)
+        return [cfunc(*args) for _ in repeat(None, n)]
+
+    def forget(self, mod):
+        # drop cached symbols for functions defined in `mod`
+        for fn in mod.functions:
+            if not fn.is_declaration:
+                self.signatures.pop(fn.name, None)
+                self.symbols.pop(fn.name, None)
+                self.checked.discard(fn.name)
+                self.pending.pop(fn.name, None)
+                if fn.name in self.stub_ids:
+                    unregister([self.stub_ids.pop(fn.name)])
 
     def clear(self):
         self.engine.remove_module(self.mod)
+        self.modules.remove(self.mod)
+        self.forget(self.mod)
+        if self.results and self.results[-1][1] is self.mod:
+            self.results.pop()
         self.mod = None
 
-    def load_bc(self, external, module):
+    def load_bc(self, external, module=None):
         """
-        Placeholder for loading `external` bitcode into jit
-        and optionally merging with `module` (e.g., stdlib loading)
+        Load bitcode from `external` (a path or bytes) into the JIT.
+        If `module` is given, the bitcode is linked into it instead and
+        the merged module is returned uncompiled (e.g., stdlib loading).
+        Bitcode from `save_bc` is already optimized, so it is not
+        run through the pass pipeline again.
         """
+        if isinstance(external, str):
+            with open(external, "rb") as f:
+                external = f.read()
+        return self.load_library(llvm.parse_bitcode(external), module)
 
-    def save_bc(self, module):
+    def load_asm(self, external, module=None):
         """
-        Placeholder to write bitcode out
+        As `load_bc`, but for textual IR in a .ll file.
         """
+        with open(external) as f:
+            return self.load_library(llvm.parse_assembly(f.read()), module)
+
+    def load_library(self, mod, module=None):
+        mod.verify()
+        if module is not None:
+            if not isinstance(module, llvm.ModuleRef):
+                module = llvm.parse_assembly(str(module))
+            module.link_in(mod)
+            return module
+        self.prepare(mod)
+        self.add_module(mod)
+        self.modules.append(mod)
+        if any(_.name == bounds_error_symbol for _ in mod.global_variables):
+            for fn in mod.functions:
+                if not fn.is_declaration:
+                    self.checked.add(fn.name)
+        return mod
 
-    def load_asm(self):
-        pass
+    def save_bc(self, module, path=None):
+        """
+        Optimize `module` (a Codegen module or a parsed LLVM module)
+        at this JIT's level and return it as bitcode,
+        also writing it to `path` if given.
+        Anonymous entry points are made internal, so they can't clash
+        with the ones generated after the library is loaded.
+        """
+        if not isinstance(module, llvm.ModuleRef):
+            module = llvm.parse_assembly(str(module))
+        module.verify()
+        for fn in module.functions:
+            if fn.name.startswith("ANONYMOUS_") and not fn.is_declaration:
+                fn.linkage = llvm.Linkage.internal
+        self.prepare(module)
+        self.optimize(module)
+        bitcode = module.as_bitcode()
+        if path:
+            with open(path, "wb") as f:
+                f.write(bitcode)
+        return bitcode
 
 
 jit = Jit()
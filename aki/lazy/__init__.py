@@ -0,0 +1,124 @@
+"""
+Compile-on-first-call. Instead of its definition, each function of a
+lazily compiled module gets a stub of the same name, so callers and
+`Jit.resolve` don't know the difference. The stub calls through a
+slot holding the real function's address. While the slot is empty,
+the stub first calls back into Python with its id. That optimizes
+and compiles the function's body as a module of its own, then fills
+the slot, so later calls go straight through.
+
+If compiling fails, or the `Jit` is gone, the callback returns null
+and the stub returns zero without filling the slot; `check_failed`,
+the errcheck of callables from a lazy `Jit`, then raises the failure.
+
+Codegen still runs eagerly: a function's return type and whether it
+can fail a bounds check come from its body, and callers need both.
+Calls between lazy functions go through their stubs, so they are
+never inlined into each other.
+"""
+
+import weakref
+from ctypes import CFUNCTYPE, c_int64, c_void_p, cast
+from itertools import count
+import llvmlite.binding as llvm
+from llvmlite import ir
+from consts import materialize_symbol
+
+# stubs by id: (the `Jit` that compiled them, function name)
+stubs = {}
+stub_ids = count(1)
+# why stubs failed to compile their function since the last check
+failures = []
+
+
+@CFUNCTYPE(c_void_p, c_int64)
+def materialize(stub_id):
+    # an exception can't cross back into compiled code
+    try:
+        jit, name = stubs[stub_id]
+        jit = jit()
+        if jit is None:
+            raise ReferenceError(f"the JIT that compiled {name} is gone")
+        return jit.materialize(name) or None
+    except Exception as e:
+        failures.append(e)
+        return None
+
+
+def check_failed(result=None, func=None, arguments=None):
+    """
+    Raise a `RuntimeError` if a stub failed to compile its function
+    since the last call, else return `result`. Used as a ctypes `errcheck`.
+    """
+    if failures:
+        cause = failures[0]
+        failures.clear()
+        raise RuntimeError(f"lazy compilation failed: {cause!r}") from cause
+    return result
+
+
+llvm.add_symbol(materialize_symbol, cast(materialize, c_void_p).value)
+
+
+def register(jit, name):
+    """
+    Return a new stub id for function `name`, compiled by `jit`.
+    """
+    stub_id = next(stub_ids)
+    stubs[stub_id] = (weakref.ref(jit), name)
+    return stub_id
+
+
+def unregister(ids):
+    # stubs left in memory with these ids fail rather than compile
+    for stub_id in list(ids):
+        stubs.pop(stub_id, None)
+
+
+def body_name(name):
+    # Aki names can't have dots, so this can't clash
+    return f"{name}.body"
+
+
+def stub_module(functions):
+    """
+    A module of stubs for `functions`, a list of
+    (name, function type, stub id).
+    """
+    module = ir.Module()
+    i8_ptr = ir.IntType(8).as_pointer()
+    resolver = ir.Function(
+        module, ir.FunctionType(i8_ptr, [ir.IntType(64)]), materialize_symbol
+    )
+    for name, ftype, stub_id in functions:
+        slot = ir.GlobalVariable(module, i8_ptr, f"{name}.addr")
+        slot.initializer = ir.Constant(i8_ptr, None)
+        stub = ir.Function(module, ftype, name)
+        entry = stub.append_basic_block("entry")
+        compile_block = stub.append_basic_block("compile")
+        store_block = stub.append_basic_block("store")
+        fail_block = stub.append_basic_block("fail")
+        call_block = stub.append_basic_block("call")
+        builder = ir.IRBuilder(entry)
+        address = builder.load(slot)
+        empty = builder.icmp_unsigned("==", address, ir.Constant(i8_ptr, None))
+        branch = builder.cbranch(empty, compile_block, call_block)
+        # the slot is only empty on the first call
+        branch.set_weights([1, 1000])
+        builder.position_at_end(compile_block)
+        compiled = builder.call(resolver, [ir.Constant(ir.IntType(64), stub_id)])
+        failed = builder.icmp_unsigned("==", compiled, ir.Constant(i8_ptr, None))
+        builder.cbranch(failed, fail_block, store_block).set_weights([1, 1000])
+        builder.position_at_end(fail_block)
+        # as for a failed bounds check, the caller gets zero
+        builder.ret(ir.Constant(ftype.return_type, None))
+        builder.position_at_end(store_block)
+        builder.store(compiled, slot)
+        builder.branch(call_block)
+        builder.position_at_end(call_block)
+        target = builder.phi(i8_ptr)
+        target.add_incoming(address, entry)
+        target.add_incoming(compiled, store_block)
+        function = builder.bitcast(target, ftype.as_pointer())
+        builder.ret(builder.call(function, stub.args, tail=True))
+    return module
@@ -0,0 +1,97 @@
+"""
+Loads shared libraries built by `aki build` using only ctypes, so
+neither LLVM nor llvmlite is needed where they run.
+"""
+
+import ctypes
+import json
+from ctypes import (
+    c_bool,
+    c_char,
+    c_int8,
+    c_int16,
+    c_int32,
+    c_int64,
+    c_uint8,
+    c_uint16,
+    c_uint32,
+    c_uint64,
+    c_float,
+    c_double,
+)
+from buffers import array_struct
+from errors import AkiIndexError
+from consts import bounds_error_symbol, signatures_symbol
+
+# the same ctypes `akitypes` uses
+scalars = {
+    "bool": c_bool,
+    "int8": c_int8,
+    "int16": c_int16,
+    "int32": c_int32,
+    "int64": c_int64,
+    "uint8": c_uint8,
+    "uint16": c_uint16,
+    "uint32": c_uint32,
+    "uint64": c_uint64,
+    "float16": c_uint16,
+    "float32": c_float,
+    "float64": c_double,
+}
+
+_arrays = {}
+
+
+def ctype(typename):
+    if typename.endswith("[]"):
+        try:
+            return _arrays[typename]
+        except KeyError:
+            array = _arrays[typename] = array_struct(scalars[typename[:-2]], typename)
+            return array
+    return scalars[typename]
+
+
+class Library:
+    """
+    A shared library from `aki build`. Its functions are attributes,
+    with ctypes argument and return types from their Aki signatures,
+    and raise `AkiIndexError` when they fail a bounds check.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.dll = ctypes.CDLL(path)
+        self.bounds_error = (c_int64 * 3).in_dll(self.dll, bounds_error_symbol)
+        text = ctypes.string_at(
+            ctypes.addressof(c_char.in_dll(self.dll, signatures_symbol))
+        )
+        self.signatures = json.loads(text)
+        self.functions = {}
+        for name, (args, result) in self.signatures.items():
+            function = getattr(self.dll, name)
+            function.argtypes = [ctype(_) for _ in args]
+            function.restype = ctype(result)
+            function.errcheck = self.check
+            self.functions[name] = function
+
+    def __repr__(self):
+        return f"<Library {self.path}: {', '.join(self.functions)}>"
+
+    def __getattr__(self, name):
+        try:
+            return self.__dict__["functions"][name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def check(self, result, func, arguments):
+        error = self.bounds_error
+        if error[0]:
+            exception = AkiIndexError.from_record(error)
+            error[0] = 0
+            raise exception
+        return result
+
+
+def load(path):
+    return Library(path)
@@ -1,12 +1,19 @@
+import glob
+import hashlib
 import logging
-from lark import Lark, Transformer, logger
+import os
+import pickle
+import lark
+from lark import Lark, Transformer, Token, logger
 
-logger.setLevel(logging.DEBUG)
+logger.setLevel(logging.WARNING)
 from akiast import (
     Args,
+    Argument,
     Call,
     VarRef,
     Immediate,
+    Module,
     Boolean,
     Assignment,
     BinOp,
@@ -17,6 +24,13 @@ from akiast import (
     Function,
     IfExpr,
     WhenExpr,
+    WhileExpr,
+    ForExpr,
+    Break,
+    Continue,
+    List,
+    Index,
+    Slice,
     SignedInteger,
     UnsignedInteger,
     Float16,
@@ -26,6 +40,9 @@ from akiast import (
 
 
 def pos(n):
+    # a block is positioned at its first statement
+    if isinstance(n, list):
+        n = n[0]
     return (n.line, n.column)
 
 
@@ -81,10 +98,48 @@ class T(Transformer):
     def funcdef(self, node):
         p = _p(node)
         name = Name(*p)
+        args, return_type = node[1]
         body = node[2]
         if not isinstance(body, list):
             body = [body]
-        return Function(p[0], name, [], None, body)
+        return Function(p[0], name, args, return_type, body)
+
+    def optsignature(self, node):
+        return node[0] if node else ([], None)
+
+    def signature(self, node):
+        # (arguments, return type or None)
+        if node and isinstance(node[-1], Name):
+            return node[:-1], node[-1]
+        return node, None
+
+    def vardec(self, node):
+        vartype = node[1] if len(node) > 1 else None
+        return Argument(pos(node[0]), node[0].value, vartype)
+
+    def varsig(self, node):
+        vartype = node[0]
+        if isinstance(vartype, Token):
+            return Name(pos(vartype), vartype.value)
+        return vartype
+
+    def arraytype(self, node):
+        return Name(pos(node[0]), f"{node[0].value}[]")
+
+    def list(self, node):
+        # the brackets are kept for the position
+        return List(pos(node[0]), node[1:-1])
+
+    def index(self, node):
+        return Index(pos(node[0]), node[0], node[1])
+
+    def slice(self, node):
+        colon = next(
+            n for n, _ in enumerate(node) if isinstance(_, Token) and _.type == "COLON"
+        )
+        start = node[1] if colon == 2 else None
+        stop = node[colon + 1] if len(node) > colon + 1 else None
+        return Slice(pos(node[0]), node[0], start, stop)
 
     def call(self, node):
         return Call(pos(node[0]), node[0], node[1])
@@ -96,32 +151,119 @@ class T(Transformer):
         return node
 
     def ifexpr(self, node):
-        return IfExpr(pos(node[0]), node[0], node[1], node[2])
+        return IfExpr(
+            pos(node[0]), node[0], node[1], node[2] if len(node) > 2 else None
+        )
 
     def whenexpr(self, node):
-        return WhenExpr(pos(node[0]), node[0], node[1], node[2])
+        return WhenExpr(
+            pos(node[0]), node[0], node[1], node[2] if len(node) > 2 else None
+        )
+
+    def whileexpr(self, node):
+        return WhileExpr(pos(node[0]), node[0], node[1])
+
+    def forexpr(self, node):
+        return ForExpr(pos(node[0]), Name(*_p(node)), node[1], node[2])
+
+    def breakexpr(self, node):
+        label = Name(*_p(node[1:])) if len(node) > 1 else None
+        return Break(pos(node[0]), label)
+
+    def continueexpr(self, node):
+        label = Name(*_p(node[1:])) if len(node) > 1 else None
+        return Continue(pos(node[0]), label)
 
     def immediate(self, node):
-        return Immediate(pos(node[0]), node)
+        if not node:
+            return Immediate((1, 1), node)
+        first = node[0][0] if isinstance(node[0], list) else node[0]
+        return Immediate(pos(first), node)
+
+    def start(self, node):
+        # a program is positioned like an immediate command
+        program = self.immediate(node)
+        return Module((program.line, program.column), program.nodes)
 
     def assignment(self, node):
         return Assignment(pos(node[0]), node[0], node[1])
 
     def arglist(self, node):
-        return Args(pos(node[0]), node[1])
+        # a single argument isn't wrapped in a list by the grammar
+        args = node[1] if isinstance(node[1], list) else [node[1]]
+        return Args(pos(node[0]), args)
 
     args = statements
 
 
-with open(".\\aki\\parsing\\grammar.lark") as f:
-    grammar = f.read()
+grammar_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "grammar.lark")
+cache_dir = os.path.join(os.path.dirname(grammar_path), "__pycache__")
 
-parser = Lark(
-    grammar,
+parser_options = dict(
     parser="lalr",
     regex=True,
-    # cache=".\\aki\\grammar.cache",
     start=["start", "immediate"],
     debug=False,
-    transformer=T(),
 )
+
+
+def load_parser(cache_dir=cache_dir):
+    """
+    Build the LALR parser, reusing the analyzed tables from an earlier run
+    when possible. The cache file is named for a hash of the grammar and
+    lark version, so editing the grammar invalidates it automatically.
+    It's written to a temporary file and renamed into place, so other
+    processes starting at the same time never see half of it.
+    """
+    with open(grammar_path) as f:
+        grammar = f.read()
+
+    key = hashlib.md5(
+        (grammar + repr(sorted(parser_options.items())) + lark.__version__).encode()
+    ).hexdigest()
+    cache_file = os.path.join(cache_dir, f"grammar.{key}.lark-cache")
+
+    if os.path.exists(cache_file):
+        try:
+            return Lark(grammar, cache=cache_file, transformer=T(), **parser_options)
+        except (EOFError, pickle.UnpicklingError, AssertionError, KeyError, ValueError):
+            # left unfinished by an older version; build it again
+            pass
+    else:
+        for stale in glob.glob(os.path.join(cache_dir, "grammar.*.lark-cache")):
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+
+    lark_parser = Lark(grammar, transformer=T(), **parser_options)
+    temp = f"{cache_file}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(temp, "wb") as f:
+            lark_parser.save(f)
+        os.replace(temp, cache_file)
+    except OSError:
+        # read-only install; just build the tables every time
+        pass
+    return lark_parser
+
+
+parser = load_parser()
+
+backends = ("lark", "pratt")
+
+
+def get_parser(backend="lark"):
+    """
+    Return the parser for `backend`: "lark" (the default) or "pratt",
+    the hand-written parser in `parsing.pratt`. Both have the same
+    `parse(text, start)` interface and build the same AST.
+    """
+    if backend == "lark":
+        return parser
+    if backend == "pratt":
+        from .pratt import parser as pratt_parser
+
+        return pratt_parser
+    raise ValueError(f"unknown parser backend '{backend}'")
@@ -0,0 +1,424 @@
+"""
+Hand-written tokenizer and precedence-climbing parser for the grammar
+in grammar.lark. It builds `akiast` nodes directly, with the same
+shapes and positions as the Lark parser plus the `T` transformer,
+and skips the intermediate parse tree.
+"""
+
+import re
+from collections import namedtuple
+from akiast import (
+    Args,
+    Argument,
+    Call,
+    VarRef,
+    Immediate,
+    Module,
+    Boolean,
+    Assignment,
+    BinOp,
+    UnOp,
+    unops,
+    binops,
+    Name,
+    Function,
+    IfExpr,
+    WhenExpr,
+    WhileExpr,
+    ForExpr,
+    Break,
+    Continue,
+    List,
+    Index,
+    Slice,
+    SignedInteger,
+    UnsignedInteger,
+    Float16,
+    Float32,
+    Float64,
+)
+from errors import AkiSyntaxError
+
+Token = namedtuple("Token", "type value line column")
+
+# order matters: the first alternative that matches wins,
+# mirroring the priorities of the terminals in grammar.lark
+token_patterns = (
+    ("WS", r"[ \t\f\r]+"),
+    ("NEWLINE", r"\n"),
+    ("FLOAT16", r"\d+\.\d*_H"),
+    ("FLOAT32", r"\d+\.\d*_F"),
+    ("FLOAT64", r"\d+\.\d*(?:_D)?"),
+    ("UINT64", r"\d+_U"),
+    ("INT64", r"\d+"),
+    ("INF", r"\.INF"),
+    ("NAN", r"\.NAN"),
+    ("STRING", r'".*"'),
+    ("NAME", r"[_a-zA-Z]\w*"),
+    ("OP", r"==|!=|>=|<=|>>|<<|[-+*/&|^<>=(){}\[\],;:.@]"),
+)
+
+token_re = re.compile(
+    "|".join(f"(?P<{name}>{regex})" for name, regex in token_patterns)
+)
+
+keywords = {
+    "def",
+    "return",
+    "break",
+    "continue",
+    "if",
+    "else",
+    "when",
+    "while",
+    "for",
+    "in",
+    "with",
+    "as",
+}
+
+numbers = {
+    "FLOAT16": Float16,
+    "FLOAT32": Float32,
+    "FLOAT64": Float64,
+    "INT64": SignedInteger,
+    "UINT64": UnsignedInteger,
+}
+
+# binary operator precedence, loosest first; all are left-associative
+levels = {}
+for _level, _ops in enumerate(
+    (
+        ("==", "!=", ">=", "<=", ">", "<"),
+        (">>", "<<", "+", "-", "&", "|", "^"),
+        ("*", "/"),
+    ),
+    1,
+):
+    for _op in _ops:
+        levels[_op] = _level
+
+EOF_TYPE = "EOF"
+
+
+def tokenize(text):
+    tokens = []
+    append = tokens.append
+    line = 1
+    line_start = 0
+    position = 0
+    end = len(text)
+    match = token_re.match
+    while position < end:
+        m = match(text, position)
+        if not m:
+            raise AkiSyntaxError(
+                text,
+                Token(None, None, line, position - line_start + 1),
+                "unexpected character",
+            )
+        kind = m.lastgroup
+        value = m.group()
+        if kind == "NEWLINE":
+            line += 1
+            line_start = m.end()
+        elif kind != "WS":
+            if kind == "NAME" and value in keywords:
+                kind = "KEYWORD"
+            append(Token(kind, value, line, position - line_start + 1))
+        position = m.end()
+    append(Token(EOF_TYPE, "", line, position - line_start + 1))
+    return tokens
+
+
+def pos(n):
+    # a block is positioned at its first statement
+    if isinstance(n, list):
+        n = n[0]
+    return (n.line, n.column)
+
+
+class Parser:
+    """
+    Drop-in alternative to the Lark parser: `parse(text, start)`
+    returns the same AST the Lark backend does.
+    """
+
+    def parse(self, text, start="immediate"):
+        if start not in ("immediate", "start"):
+            raise ValueError(f"unsupported start rule '{start}'")
+        self.text = text
+        self.tokens = tokenize(text)
+        self.index = 0
+        program = self.immediate()
+        if start == "start":
+            return Module((program.line, program.column), program.nodes)
+        return program
+
+    # Token helpers
+
+    def peek(self):
+        return self.tokens[self.index]
+
+    def advance(self):
+        token = self.tokens[self.index]
+        self.index += 1
+        return token
+
+    def at(self, value):
+        token = self.tokens[self.index]
+        return token.value == value and token.type in ("OP", "KEYWORD")
+
+    def expect(self, value):
+        token = self.tokens[self.index]
+        if token.value != value or token.type not in ("OP", "KEYWORD"):
+            self.error(token, f"expected '{value}'")
+        self.index += 1
+        return token
+
+    def error(self, token, message="unexpected token"):
+        raise AkiSyntaxError(self.text, token, message)
+
+    # Top level
+
+    def immediate(self):
+        nodes = []
+        while self.peek().type != EOF_TYPE:
+            if self.at("def"):
+                nodes.append(self.function())
+            else:
+                nodes.append(self.exprblock())
+        if not nodes:
+            return Immediate((1, 1), nodes)
+        first = nodes[0][0] if isinstance(nodes[0], list) else nodes[0]
+        return Immediate(pos(first), nodes)
+
+    def function(self):
+        self.expect("def")
+        name = self.advance()
+        if name.type != "NAME":
+            self.error(name, "expected function name")
+        args, return_type = [], None
+        if self.at("("):
+            args, return_type = self.signature()
+        body = self.exprblock()
+        if not isinstance(body, list):
+            body = [body]
+        p = pos(name)
+        return Function(p, Name(p, name.value), args, return_type, body)
+
+    def signature(self):
+        self.expect("(")
+        args = []
+        if not self.at(")"):
+            args.append(self.vardec())
+            while self.at(","):
+                self.advance()
+                args.append(self.vardec())
+        self.expect(")")
+        return_type = None
+        if self.at(":"):
+            return_type = self.varsig()
+        return args, return_type
+
+    def vardec(self):
+        name = self.advance()
+        if name.type != "NAME":
+            self.error(name, "expected argument name")
+        vartype = None
+        if self.at(":"):
+            vartype = self.varsig()
+        return Argument(pos(name), name.value, vartype)
+
+    def varsig(self):
+        self.expect(":")
+        vartype = self.advance()
+        if vartype.type != "NAME":
+            self.error(vartype, "expected type name")
+        if self.at("["):
+            self.advance()
+            self.expect("]")
+            return Name(pos(vartype), f"{vartype.value}[]")
+        return Name(pos(vartype), vartype.value)
+
+    # Blocks and statements
+
+    def exprblock(self):
+        if not self.at("{"):
+            return self.expression()
+        self.advance()
+        statements = [self.statement()]
+        while not self.at("}"):
+            if self.at(";"):
+                self.advance()
+            statements.append(self.statement())
+        self.advance()
+        return statements[0] if len(statements) == 1 else statements
+
+    def statement(self):
+        if self.at("def"):
+            return self.function()
+        return self.expression()
+
+    # Expressions
+
+    def expression(self):
+        token = self.peek()
+        if token.type == "KEYWORD":
+            if token.value == "if":
+                return self.ifexpr(IfExpr)
+            if token.value == "when":
+                return self.ifexpr(WhenExpr)
+            if token.value == "while":
+                return self.whileexpr()
+            if token.value == "for":
+                return self.forexpr()
+            if token.value == "break":
+                return self.jump(Break)
+            if token.value == "continue":
+                return self.jump(Continue)
+            self.error(token)
+        lhs, is_atom_expr = self.unary()
+        if is_atom_expr and self.at("="):
+            self.advance()
+            return Assignment(pos(lhs), lhs, self.exprblock())
+        return self.binary(lhs, 1)
+
+    def ifexpr(self, node_type):
+        self.advance()
+        if_expr = self.exprblock()
+        then_expr = self.exprblock()
+        else_expr = None
+        if self.at("else"):
+            self.advance()
+            else_expr = self.exprblock()
+        return node_type(pos(if_expr), if_expr, then_expr, else_expr)
+
+    def whileexpr(self):
+        self.advance()
+        condition = self.exprblock()
+        body = self.exprblock()
+        return WhileExpr(pos(condition), condition, body)
+
+    def forexpr(self):
+        self.advance()
+        name = self.advance()
+        if name.type != "NAME":
+            self.error(name, "expected loop variable name")
+        self.expect("in")
+        iterable = self.exprblock()
+        body = self.exprblock()
+        return ForExpr(pos(name), Name(pos(name), name.value), iterable, body)
+
+    def jump(self, node_type):
+        token = self.advance()
+        label = None
+        # the label is optional, and taken greedily
+        if self.peek().type == "NAME":
+            name = self.advance()
+            label = Name(pos(name), name.value)
+        return node_type(pos(token), label)
+
+    def binary(self, lhs, min_level):
+        tokens = self.tokens
+        while True:
+            token = tokens[self.index]
+            level = levels.get(token.value) if token.type == "OP" else None
+            if level is None or level < min_level:
+                return lhs
+            op = token.value
+            self.index += 1
+            rhs = self.unary()[0]
+            while True:
+                token = tokens[self.index]
+                next_level = levels.get(token.value) if token.type == "OP" else None
+                if next_level is None or next_level <= level:
+                    break
+                rhs = self.binary(rhs, level + 1)
+            lhs = BinOp(pos(lhs), lhs, rhs, binops[op])
+
+    def unary(self):
+        """
+        Returns the node and whether it is a bare atom_expr,
+        which is what decides if it can be assigned to.
+        """
+        if self.at("-"):
+            op = self.advance()
+            operand = self.atom_expr()
+            return UnOp(pos(operand), operand, unops[op.value]), False
+        return self.atom_expr(), True
+
+    def atom_expr(self):
+        node = self.atom()
+        while True:
+            token = self.peek()
+            if token.type != "OP":
+                return node
+            if token.value == "(":
+                node = Call(pos(node), node, self.arglist())
+            elif token.value == "[":
+                node = self.accessor(node)
+            elif token.value == ".":
+                self.error(token, "not supported yet")
+            else:
+                return node
+
+    def accessor(self, target):
+        self.advance()
+        start = None
+        if not self.at(":"):
+            start = self.expression()
+            if not self.at(":"):
+                self.expect("]")
+                return Index(pos(target), target, start)
+        self.advance()
+        stop = None
+        if not self.at("]"):
+            stop = self.expression()
+        self.expect("]")
+        return Slice(pos(target), target, start, stop)
+
+    def arglist(self):
+        start = self.expect("(")
+        args = []
+        while not self.at(")"):
+            args.append(self.expression())
+            if self.at(","):
+                self.advance()
+                if self.at(")"):
+                    self.error(self.peek())
+        self.advance()
+        return Args(pos(start), args)
+
+    def atom(self):
+        token = self.advance()
+        kind = token.type
+        p = pos(token)
+        number = numbers.get(kind)
+        if number:
+            return number(p, token.value)
+        if kind == "NAME":
+            if token.value in ("True", "False"):
+                return Boolean(p, token.value)
+            return VarRef(p, token.value)
+        if kind == "INF":
+            return Float64(p, "inf")
+        if kind == "NAN":
+            return Float64(p, "NaN")
+        if kind == "OP" and token.value == "[":
+            items = [self.expression()]
+            while self.at(","):
+                self.advance()
+                items.append(self.expression())
+            self.expect("]")
+            return List(p, items)
+        if kind == "OP" and token.value == "(":
+            node = self.expression()
+            if self.at(","):
+                self.error(self.peek(), "tuples not supported yet")
+            self.expect(")")
+            return node
+        self.error(token)
+
+
+parser = Parser()
@@ -0,0 +1,378 @@
+"""
+Tells Linux `perf` about JIT compiled code. For each object MCJIT
+finalizes, `Profiler` writes its functions' addresses, sizes and names
+to a perf map, `/tmp/perf-<pid>.map`, which `perf report` reads to
+name samples in JIT memory. Optionally it also writes a jitdump,
+`/tmp/jit-<pid>.dump`, with the machine code and, for modules built
+with `Codegen(debug_info=True)`, the Aki source line of each
+instruction. Running `perf record -k 1`, then `perf inject --jit`,
+lets `perf annotate` show hot spots against Aki source lines.
+
+Objects are read as 64-bit little-endian ELF, which is what MCJIT
+produces on Linux; anything else is skipped.
+"""
+
+import mmap
+import os
+import platform
+import struct
+import threading
+import time
+from ctypes import string_at
+
+# ELF section and symbol types used here
+SHT_SYMTAB = 2
+SHT_RELA = 4
+STT_FUNC = 2
+STT_SECTION = 3
+
+# jitdump record ids, and ELF machine numbers for its header
+JIT_CODE_LOAD = 0
+JIT_CODE_DEBUG_INFO = 2
+elf_machines = {"x86_64": 62, "AMD64": 62, "aarch64": 183, "arm64": 183}
+
+
+class Elf:
+    """
+    The sections, symbols and relocations of an ELF object, as far
+    as `Profiler` needs them.
+    """
+
+    def __init__(self, data):
+        self.data = data
+        self.sections = []
+        self.symbols = []
+        # relocations of each section, by section index:
+        # {offset: (symbol index, addend)}
+        self.relocations = {}
+        if data[:4] != b"\x7fELF" or data[4] != 2 or data[5] != 1:
+            return
+        (shoff,) = struct.unpack_from("<Q", data, 0x28)
+        shentsize, shnum, shstrndx = struct.unpack_from("<HHH", data, 0x3A)
+        headers = [
+            struct.unpack_from("<IIQQQQIIQQ", data, shoff + n * shentsize)
+            for n in range(shnum)
+        ]
+        names = headers[shstrndx][4]
+        for name, kind, _, _, offset, size, link, info, _, _ in headers:
+            self.sections.append(
+                (self.string(names + name), kind, offset, size, link, info)
+            )
+        for kind, offset, size, link, info in (_[1:] for _ in self.sections):
+            if kind == SHT_SYMTAB:
+                strings = self.sections[link][2]
+                for at in range(offset, offset + size, 24):
+                    name, st_info, _, shndx, value, size_ = struct.unpack_from(
+                        "<IBBHQQ", data, at
+                    )
+                    self.symbols.append(
+                        (
+                            self.string(strings + name),
+                            st_info & 0xF,
+                            shndx,
+                            value,
+                            size_,
+                        )
+                    )
+            elif kind == SHT_RELA:
+                relocations = self.relocations.setdefault(info, {})
+                for at in range(offset, offset + size, 24):
+                    r_offset, r_info, addend = struct.unpack_from("<QQq", data, at)
+                    relocations[r_offset] = (r_info >> 32, addend)
+
+    def string(self, at):
+        return self.data[at : self.data.index(b"\0", at)].decode("utf-8")
+
+    def section(self, name):
+        for n, section in enumerate(self.sections):
+            if section[0] == name:
+                return n, section
+        return None, None
+
+
+def functions(elf, address_of):
+    """
+    (name, address, size) of each function defined in `elf`, where
+    `address_of` gives the address a global function was loaded at.
+    Local functions are placed from their section; any in a section
+    with no global function to place it by are left out.
+    """
+    bases = section_bases(elf, address_of)
+    return [
+        (name, bases[shndx] + value, size)
+        for name, kind, shndx, value, size in elf.symbols
+        if kind == STT_FUNC and shndx in bases and size
+    ]
+
+
+def section_bases(elf, address_of):
+    # where each section with global functions in it was loaded;
+    # engines give no address (0) for local ones
+    bases = {}
+    for name, kind, shndx, value, size in elf.symbols:
+        if kind == STT_FUNC and shndx and shndx not in bases:
+            address = address_of(name)
+            if address:
+                bases[shndx] = address - value
+    return bases
+
+
+def uleb(data, at):
+    result = shift = 0
+    while True:
+        byte = data[at]
+        at += 1
+        result |= (byte & 0x7F) << shift
+        shift += 7
+        if byte < 0x80:
+            return result, at
+
+
+def sleb(data, at):
+    result = shift = 0
+    while True:
+        byte = data[at]
+        at += 1
+        result |= (byte & 0x7F) << shift
+        shift += 7
+        if byte < 0x80:
+            if byte & 0x40:
+                result -= 1 << shift
+            return result, at
+
+
+def line_table(elf, address_of):
+    """
+    Rows of the DWARF 2-4 line tables in `elf`, as
+    (address, file name, line, column), in the order they appear.
+    """
+    index, section = elf.section(".debug_line")
+    if section is None:
+        return []
+    data, start, end = elf.data, section[2], section[2] + section[3]
+    relocations = elf.relocations.get(index, {})
+    bases = section_bases(elf, address_of)
+
+    def relocated(at):
+        symbol, addend = relocations[at - start]
+        name, kind, shndx, value, _ = elf.symbols[symbol]
+        if kind != STT_SECTION:
+            address = address_of(name)
+            if address:
+                return address + addend
+        # unplaced sections give rows at no function's address
+        return bases.get(shndx, 0) + value + addend
+
+    rows = []
+    at = start
+    while at < end:
+        length, version = struct.unpack_from("<IH", data, at)
+        unit_end = at + 4 + length
+        if version not in (2, 3, 4):
+            at = unit_end
+            continue
+        (header_length,) = struct.unpack_from("<I", data, at + 6)
+        program = at + 10 + header_length
+        at += 10
+        (min_length,) = struct.unpack_from("<B", data, at)
+        at += 2 if version >= 4 else 1
+        _, line_base, line_range, opcode_base = struct.unpack_from("<BbBB", data, at)
+        lengths = data[at + 4 : at + 3 + opcode_base]
+        at += 3 + opcode_base
+        # directory 0 is the compilation directory, which isn't here
+        directories = [""]
+        while data[at]:
+            end_of_name = data.index(b"\0", at)
+            directories.append(data[at:end_of_name].decode("utf-8"))
+            at = end_of_name + 1
+        at += 1
+        files = [None]
+        while data[at]:
+            end_of_name = data.index(b"\0", at)
+            name = data[at:end_of_name].decode("utf-8")
+            directory, at = uleb(data, end_of_name + 1)
+            files.append(os.path.join(directories[directory], name))
+            # modification time and length
+            for _ in range(2):
+                _, at = uleb(data, at)
+
+        at = program
+        address, file, line, column = 0, 1, 1, 0
+        while at < unit_end:
+            opcode = data[at]
+            at += 1
+            if opcode >= opcode_base:
+                adjusted = opcode - opcode_base
+                address += adjusted // line_range * min_length
+                line += line_base + adjusted % line_range
+                rows.append((address, files[file], line, column))
+            elif opcode == 0:
+                length, at = uleb(data, at)
+                sub, operands = data[at], at + 1
+                if sub == 1:
+                    # the end of a sequence is past its last instruction
+                    address, file, line, column = 0, 1, 1, 0
+                elif sub == 2:
+                    if operands - start in relocations:
+                        address = relocated(operands)
+                    else:
+                        (address,) = struct.unpack_from("<Q", data, operands)
+                at += length
+            elif opcode == 1:
+                rows.append((address, files[file], line, column))
+            elif opcode == 2:
+                advance, at = uleb(data, at)
+                address += advance * min_length
+            elif opcode == 3:
+                advance, at = sleb(data, at)
+                line += advance
+            elif opcode == 4:
+                file, at = uleb(data, at)
+            elif opcode == 5:
+                column, at = uleb(data, at)
+            elif opcode == 8:
+                address += (255 - opcode_base) // line_range * min_length
+            elif opcode == 9:
+                (advance,) = struct.unpack_from("<H", data, at)
+                address += advance
+                at += 2
+            else:
+                for _ in range(lengths[opcode - 1]):
+                    _, at = uleb(data, at)
+        at = unit_end
+    return rows
+
+
+class PerfMap:
+    def __init__(self, path=None):
+        self.path = path or f"/tmp/perf-{os.getpid()}.map"
+        self.file = open(self.path, "a")
+
+    def add(self, name, address, size):
+        self.file.write(f"{address:x} {size:x} {name}\n")
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class JitDump:
+    """
+    A jitdump file, which perf finds through the executable
+    mapping of it made here.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or f"/tmp/jit-{os.getpid()}.dump"
+        self.file = open(self.path, "wb+")
+        self.file.write(
+            struct.pack(
+                "<IIIIIIQQ",
+                0x4A695444,
+                1,
+                40,
+                elf_machines.get(platform.machine(), 0),
+                0,
+                os.getpid(),
+                self.timestamp(),
+                0,
+            )
+        )
+        self.file.flush()
+        # just the header, as the file may not be a page long yet
+        self.marker = mmap.mmap(
+            self.file.fileno(),
+            40,
+            flags=mmap.MAP_PRIVATE,
+            prot=mmap.PROT_READ | mmap.PROT_EXEC,
+        )
+        self.index = 0
+
+    def timestamp(self):
+        # perf record -k 1 uses the monotonic clock
+        return time.clock_gettime_ns(time.CLOCK_MONOTONIC)
+
+    def record(self, kind, body):
+        self.file.write(
+            struct.pack("<IIQ", kind, 16 + len(body), self.timestamp()) + body
+        )
+
+    def add(self, name, address, size, lines=()):
+        if lines:
+            entries = b"".join(
+                struct.pack("<Qii", line_address, line, 0)
+                + filename.encode("utf-8")
+                + b"\0"
+                for line_address, filename, line, _ in lines
+            )
+            self.record(
+                JIT_CODE_DEBUG_INFO, struct.pack("<QQ", address, len(lines)) + entries
+            )
+        self.record(
+            JIT_CODE_LOAD,
+            struct.pack(
+                "<IIQQQQ",
+                os.getpid(),
+                threading.get_native_id(),
+                address,
+                address,
+                size,
+                self.index,
+            )
+            + name.encode("utf-8")
+            + b"\0"
+            + string_at(address, size),
+        )
+        self.index += 1
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.marker.close()
+        self.file.close()
+
+
+class Profiler:
+    """
+    Writes each object a `Jit` finalizes to a perf map, if `perf_map`,
+    and a jitdump, if `jitdump`. Either can be True, for the default
+    path, or a path.
+    """
+
+    def __init__(self, perf_map=True, jitdump=False):
+        self.perf_map = (
+            PerfMap(None if perf_map is True else perf_map) if perf_map else None
+        )
+        self.jitdump = (
+            JitDump(None if jitdump is True else jitdump) if jitdump else None
+        )
+
+    def record(self, obj, address_of):
+        """
+        Record the functions of `obj`, object code already loaded by
+        an engine, which gives their addresses by name through `address_of`.
+        """
+        elf = Elf(obj)
+        loaded = functions(elf, address_of)
+        if self.perf_map:
+            for name, address, size in loaded:
+                self.perf_map.add(name, address, size)
+            self.perf_map.flush()
+        if self.jitdump:
+            lines = line_table(elf, address_of)
+            for name, address, size in loaded:
+                # line 0 is code with no source line of its own
+                code_lines = [
+                    _ for _ in lines if address <= _[0] < address + size and _[2]
+                ]
+                self.jitdump.add(name, address, size, code_lines)
+            self.jitdump.flush()
+        return loaded
+
+    def close(self):
+        for writer in (self.perf_map, self.jitdump):
+            if writer:
+                writer.close()
@@ -1,8 +1,16 @@
 from lark.exceptions import UnexpectedCharacters
-from parsing import parser
+from parsing import get_parser, backends
 from codegen import Codegen
 from jitengine import Jit
-from errors import ReloadException, QuitException, AkiBaseException, AkiSyntaxError
+from timing import Stats, no_stats
+from host import engines
+from errors import (
+    ReloadException,
+    QuitException,
+    AkiBaseException,
+    AkiSyntaxError,
+    AkiIndexError,
+)
 import os
 import textwrap
 from itertools import zip_longest
@@ -17,14 +25,25 @@ class Repl:
                 "NOTE: terminal width less than 80 columns, errors may not format properly"
             )
         print("Aki v.0.01\n.h for help")
+        # results of the last 100 commands stay around, so
+        # long sessions don't grow without bound
+        self.jit_options = {"opt_level": 0, "keep_results": 100}
+        self.parser = get_parser()
+        # per-stage timings, recorded while `.time` is on
+        self.stats = Stats()
+        self.timing = False
         self.reset()
 
     def reset(self):
-        self.jit = Jit()
+        # a new JIT, for new options; `.` resets the one there is
+        self.jit = Jit(stats=self.stats if self.timing else None, **self.jit_options)
         self.codegen = Codegen()
 
     def run(self):
         while True:
+            # spare engines are built while waiting for input,
+            # so resets don't have to
+            engines.fill()
             self.command()
 
     def command(self, cmd_input=None):
@@ -55,7 +74,7 @@ class Repl:
             cmd = cmd[1:]
             args = cmd.split(" ", 1)
             try:
-                cmd_exec = getattr(self, cmd_map[cmd])
+                cmd_exec = getattr(self, cmd_map[args[0]])
             except KeyError:
                 print(f"ERR: command not found: '{cmd}'")
             else:
@@ -66,28 +85,136 @@ class Repl:
 
     def reset_jit(self, *a):
         print("JIT/REPL reset")
+        self.jit.reset()
+        self.codegen.reset()
+
+    def set_opt_level(self, level):
+        self.jit_options["opt_level"] = level
+        self.reset()
+
+    def set_cache_dir(self, path):
+        self.jit_options["cache_dir"] = path
+        self.reset()
+
+    def set_lazy(self, lazy):
+        self.jit_options["lazy"] = lazy
         self.reset()
 
+    def lazy(self, cmd, args):
+        if len(args) < 2:
+            if not self.jit.lazy:
+                print("Lazy compilation off")
+                return
+            stats = self.jit.lazy_stats
+            print(
+                f"Lazy compilation on: {stats['materialized']} "
+                f"of {stats['deferred']} functions compiled"
+            )
+            return
+        setting = args[1].strip()
+        if setting not in ("on", "off"):
+            print(f"ERR: lazy compilation must be on or off, got '{setting}'")
+            return
+        self.set_lazy(setting == "on")
+        print(f"Lazy compilation {setting}; JIT/REPL reset")
+
+    def time(self, cmd, args):
+        setting = args[1].split() if len(args) > 1 else []
+        # only dump takes an argument, the file to write to
+        most = 2 if setting[:1] == ["dump"] else 1
+        if setting and (
+            setting[0] not in ("on", "off", "total", "dump") or len(setting) > most
+        ):
+            print(
+                f"ERR: timing must be on, off, total or dump [file], "
+                f"got '{args[1].strip()}'"
+            )
+            return
+        if setting and setting[0] == "total":
+            print(self.stats.report(self.stats.totals()))
+            return
+        if setting and setting[0] == "dump":
+            text = self.stats.dump(setting[1] if len(setting) > 1 else None)
+            print(f"Timings written to {setting[1]}" if len(setting) > 1 else text)
+            return
+        self.timing = setting[0] == "on" if setting else not self.timing
+        self.jit.stats = self.stats if self.timing else no_stats
+        print(f"Timing {'on' if self.timing else 'off'}")
+
+    def mem(self, cmd, args):
+        setting = args[1].split() if len(args) > 1 else []
+        if setting:
+            try:
+                if setting[0] != "keep" or len(setting) != 2:
+                    raise ValueError
+                keep = None if setting[1] == "all" else int(setting[1])
+                if keep is not None and keep < 0:
+                    raise ValueError
+            except ValueError:
+                print(
+                    f"ERR: results kept must be keep <count> or keep all, "
+                    f"got '{args[1].strip()}'"
+                )
+                return
+            self.jit_options["keep_results"] = keep
+            self.jit.keep_results = keep
+            if keep is not None:
+                self.jit.trim(keep)
+        stats = self.jit.memory_stats
+        keep = self.jit.keep_results
+        print(
+            f"Keeping {'all' if keep is None else keep} results; "
+            f"{stats['modules']} modules, {stats['functions']} functions, "
+            f"{stats['results']} results in the JIT"
+        )
+        print(
+            f"{stats['evicted']} modules evicted, {stats['recycled']} engine rebuilds; "
+            f"{stats['resident'] / 1024 / 1024:.1f} MB resident"
+        )
+
+    def opt(self, cmd, args):
+        if len(args) < 2:
+            print(f"Optimization level: {self.jit_options['opt_level']}")
+            return
+        try:
+            level = int(args[1])
+            if level not in range(4):
+                raise ValueError
+        except ValueError:
+            print(f"ERR: optimization level must be 0-3, got '{args[1]}'")
+            return
+        self.set_opt_level(level)
+        print(f"Optimization level set to {level}; JIT/REPL reset")
+
     def quit(self, *a):
         raise QuitException
 
     def test(self, *a):
         import unittest
 
-        tests = unittest.TestLoader().discover(".\\test", pattern="test_*.py")
+        test_dir = os.path.join(
+            os.path.dirname(os.path.abspath(__file__)), "..", "..", "test"
+        )
+        tests = unittest.TestLoader().discover(test_dir, pattern="test_*.py")
         unittest.TextTestRunner(failfast=True).run(tests)
 
     # TODO:
 
     def execute(self, cmd):
+        stats = self.jit.stats
+        stats.begin(cmd)
         try:
-            ast = parser.parse(cmd, start="immediate")
+            with stats.stage("parse"):
+                ast = self.parser.parse(cmd, start="immediate")
         except (
             lark.exceptions.UnexpectedToken,
             lark.exceptions.UnexpectedCharacters,
         ) as e:
             print(AkiSyntaxError(cmd, e, "unexpected token"))
             return
+        except AkiSyntaxError as e:
+            print(e)
+            return
         except Exception:
             import traceback
 
@@ -95,7 +222,8 @@ class Repl:
             traceback.print_exc()
             return
         try:
-            self.codegen.gen(ast, cmd)
+            with stats.stage("codegen"):
+                entry = self.codegen.gen(ast, cmd)
         except AkiBaseException as e:
             print(e)
             return
@@ -106,10 +234,15 @@ class Repl:
             traceback.print_exc()
             return
 
-        entry = self.codegen.anon_counter()
-
         try:
+            if entry is None:
+                # only definitions, so nothing to run
+                self.jit.compile_module(self.codegen)
+                return
             result = self.jit.execute(self.codegen, entry_point=entry)
+        except AkiIndexError as e:
+            print(e)
+            return
         except RuntimeError as e:
             import traceback
 
@@ -124,6 +257,49 @@ class Repl:
             return
 
         print(result)
+        if self.timing:
+            print(self.stats.report())
+
+    def set_parser(self, cmd, args):
+        if len(args) < 2:
+            print(f"Parser: {self.parser_backend()}")
+            return
+        backend = args[1].strip()
+        if backend not in backends:
+            print(f"ERR: parser must be one of {', '.join(backends)}")
+            return
+        self.parser = get_parser(backend)
+        print(f"Parser set to {backend}")
+
+    def parser_backend(self):
+        for backend in backends:
+            if get_parser(backend) is self.parser:
+                return backend
+
+    def cache(self, *a):
+        if not self.jit.object_cache:
+            print("Object cache disabled (start with --cache to enable)")
+            return
+        print(
+            f"Object cache {self.jit.object_cache.path}: "
+            f"{self.jit.cache_hits} hits, {self.jit.cache_misses} misses"
+        )
+
+    def load(self, cmd, args):
+        if len(args) < 2:
+            print("ERR: no filename given")
+            return
+        filename = args[1].strip()
+        try:
+            if filename.endswith(".bc"):
+                mod = self.jit.load_bc(filename)
+            else:
+                mod = self.jit.load_asm(filename)
+        except (OSError, RuntimeError) as e:
+            print(f"ERR: could not load '{filename}': {e}")
+            return
+        self.codegen.register_library(mod)
+        print(f"Loaded {filename}")
 
     def demo(self, *a):
         from .demo import commands
@@ -180,16 +356,33 @@ cmd_map = {
     "?": "help",
     "~": "reload",
     ".": "reset_jit",
+    "opt": "opt",
+    "cache": "cache",
+    "lazy": "lazy",
+    "time": "time",
+    "mem": "mem",
+    "load": "load",
+    "parser": "set_parser",
 }
 
 cmd_descriptions = {
     "quit": "exit REPL",
     "test": "run test suite",
     "demo": "run demonstration",
-    "dump": "dump current module IR to console",
+    "dump": "dump IR for the last command to console",
     "help": "display this help message",
     "reset_jit": "reset JIT/REPL",
     "reload": "reload REPL entirely",
+    "opt": "show or set (0-3) optimization level; setting it resets the JIT",
+    "cache": "show object cache statistics",
+    "lazy": "show lazy compilation statistics, or turn it on or off; resets the JIT",
+    "time": (
+        "toggle per-stage timing of each command; "
+        "'total' sums them, 'dump [file]' gives JSON"
+    ),
+    "mem": "show JIT memory use; 'keep <count>|all' sets how many results are kept",
+    "load": "load a precompiled library (.bc bitcode or .ll IR)",
+    "set_parser": "show or set parser backend (lark or pratt)",
 }
 
 repl = Repl()
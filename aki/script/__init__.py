@@ -0,0 +1,41 @@
+"""
+Runs whole Aki programs non-interactively, from a file or a pipe.
+The program is parsed from the `start` rule, generated through
+`Codegen.gen_module` and compiled as one module, then `main` is
+called once.
+"""
+
+from parsing import get_parser
+from codegen import Codegen
+from jitengine import Jit
+
+
+def run_program(source, jit=None, codegen=None, parser=None, stats=None):
+    """
+    Compile the program in `source` and return the result of its `main`.
+    Stages are timed into `stats` (a `timing.Stats`), if given, or
+    else into the JIT's; the JIT times its own stages into its own.
+    """
+    parser = parser or get_parser()
+    codegen = codegen or Codegen()
+    jit = jit or Jit(stats=stats)
+    stats = stats or jit.stats
+    with stats.stage("parse"):
+        ast = parser.parse(source, start="start")
+    with stats.stage("codegen"):
+        entry_point = codegen.gen(ast, source)
+    jit.compile_module(codegen)
+    with stats.stage("resolve"):
+        main = jit.resolve(entry_point)
+    with stats.stage("run"):
+        return main()
+
+
+def exit_status(result):
+    """
+    What a program's result means to the shell: integers (and bools)
+    are the exit status; anything else is printed, for a status of 0.
+    """
+    if isinstance(result, (bool, int)):
+        return int(result) & 0xFF, None
+    return 0, result
@@ -0,0 +1,108 @@
+"""
+Timing for each stage of the compile pipeline, command by command.
+Code to be timed runs inside `stats.stage(name)`, which adds its wall
+and CPU time to the stage of that name in the current command's
+record; `stats.begin` starts a new record. `no_stats` stands in when
+timing is off, so stages cost next to nothing unless it is on.
+
+The stages `Jit` records are `emit_ir` (rendering the module's IR),
+`parse_ir`, `verify`, `optimize`, `finalize` (machine code), `resolve`
+and `run`, plus `materialize` for lazily compiled functions, which
+happens inside `run`. The REPL and `script.run_program` add `parse`
+and `codegen`, and script mode `read` and `setup` before them. Lark's
+LALR parser applies the transformer as it parses, so the parse stage
+includes building the AST.
+"""
+
+import json
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from time import perf_counter, process_time
+
+
+class Stats:
+    """
+    Stage timings of the last `history` commands, oldest first, as
+    dicts of the command's text and its `stages`, each stage a dict
+    of `wall` and `cpu` seconds.
+    """
+
+    def __init__(self, history=1000):
+        self.commands = deque(maxlen=history)
+        self.current = None
+
+    def begin(self, command=""):
+        self.current = {"command": command, "stages": {}}
+        self.commands.append(self.current)
+        return self.current
+
+    @contextmanager
+    def stage(self, name):
+        if self.current is None:
+            self.begin()
+        stages = self.current["stages"]
+        wall, cpu = perf_counter(), process_time()
+        try:
+            yield
+        finally:
+            times = stages.setdefault(name, {"wall": 0.0, "cpu": 0.0})
+            times["wall"] += perf_counter() - wall
+            times["cpu"] += process_time() - cpu
+
+    def totals(self):
+        """
+        Each stage's times summed over all the commands kept.
+        """
+        totals = {}
+        for record in self.commands:
+            for name, times in record["stages"].items():
+                total = totals.setdefault(name, {"wall": 0.0, "cpu": 0.0})
+                total["wall"] += times["wall"]
+                total["cpu"] += times["cpu"]
+        return totals
+
+    def clear(self):
+        self.commands.clear()
+        self.current = None
+
+    def report(self, stages=None):
+        """
+        A table of `stages` (by default, the last command's).
+        """
+        if stages is None:
+            stages = self.current["stages"] if self.current else {}
+        if not stages:
+            return "no timings"
+        width = max(len(_) for _ in (*stages, "stage"))
+        lines = [f"{'stage':<{width}} {'wall ms':>10} {'cpu ms':>10}"]
+        for name, times in stages.items():
+            wall, cpu = times["wall"] * 1000, times["cpu"] * 1000
+            lines.append(f"{name:<{width}} {wall:10.3f} {cpu:10.3f}")
+        return "\n".join(lines)
+
+    def dump(self, path=None):
+        """
+        The commands and totals as JSON, also written to `path` if given.
+        """
+        text = json.dumps(
+            {"commands": list(self.commands), "totals": self.totals()}, indent=2
+        )
+        if path:
+            with open(path, "w") as f:
+                f.write(text)
+        return text
+
+
+class NoStats:
+    """
+    Takes the place of `Stats` when timing is off.
+    """
+
+    def begin(self, command=""):
+        return None
+
+    def stage(self, name):
+        return nullcontext()
+
+
+no_stats = NoStats()
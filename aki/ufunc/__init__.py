@@ -0,0 +1,217 @@
+"""
+Elementwise kernels from scalar Aki functions, in the style of NumPy
+ufuncs. `vectorize` compiles a native loop driver around a function,
+which is then applied to whole buffers (NumPy arrays, `array.array`,
+memoryviews or anything else with the buffer protocol) in one call.
+Buffers are passed by pointer, without copying, and may be strided.
+
+The driver has the signature of a NumPy inner loop:
+
+    void f.ufunc(i8** data, i64* steps, i64 n)
+
+with one data pointer and byte stride per argument, plus the output
+last. When every stride equals its element size it takes a contiguous
+path that LLVM can vectorize; otherwise a strided one.
+"""
+
+import ctypes
+from ctypes import POINTER, CFUNCTYPE, c_void_p, c_int64
+from llvmlite import ir
+from akiast import Function
+from akitypes import IntegerBase, FloatBase
+from buffers import Buffer, same_format
+from codegen import Codegen
+from jitengine import Jit, check_bounds
+from parsing import get_parser
+from constfold import fold
+
+driver_prototype = CFUNCTYPE(None, POINTER(c_void_p), POINTER(c_int64), c_int64)
+
+
+class Ufunc:
+    """
+    Applies a compiled Aki function elementwise. Call it with one
+    buffer or scalar per argument, and optionally `out`, a writable
+    buffer for the results; otherwise one is allocated and returned
+    as a memoryview. Scalars are broadcast across the whole loop.
+    """
+
+    def __init__(self, name, signature, driver, jit):
+        self.name = name
+        self.signature = signature
+        self.driver = driver
+        # keeps the compiled code alive
+        self.jit = jit
+
+    def __repr__(self):
+        return f"<Ufunc {self.name}: {self.signature.typename}>"
+
+    def __call__(self, *args, out=None):
+        types = self.signature.arg_types
+        if len(args) != len(types):
+            raise TypeError(
+                f"{self.name} takes {len(types)} arguments, got {len(args)}"
+            )
+
+        buffers = []
+        scalars = []
+        try:
+            addresses, strides = [], []
+            length = None
+            for n, (arg, aki) in enumerate(zip(args, types)):
+                if isinstance(arg, (int, float, bool)):
+                    # a scalar is a buffer with a stride of 0
+                    scalar = aki.ctype(arg)
+                    scalars.append(scalar)
+                    addresses.append(ctypes.addressof(scalar))
+                    strides.append(0)
+                    continue
+                buffer = Buffer(arg)
+                buffers.append(buffer)
+                self.check(buffer, aki, f"argument {n + 1}")
+                if length is None:
+                    length = buffer.length
+                elif buffer.length != length:
+                    raise ValueError(
+                        f"buffer lengths differ: {length} and {buffer.length}"
+                    )
+                addresses.append(buffer.address)
+                strides.append(buffer.stride)
+
+            if length is None:
+                length = 1
+            result = self.signature.return_type
+            if out is None:
+                out = memoryview(bytearray(length * ctypes.sizeof(result.ctype))).cast(
+                    result.ctype._type_
+                )
+            buffer = Buffer(out, writable=True)
+            buffers.append(buffer)
+            self.check(buffer, result, "out")
+            if buffer.length != length:
+                raise ValueError(f"out has length {buffer.length}, expected {length}")
+            addresses.append(buffer.address)
+            strides.append(buffer.stride)
+
+            self.driver(
+                (c_void_p * len(addresses))(*addresses),
+                (c_int64 * len(strides))(*strides),
+                length,
+            )
+            check_bounds()
+        finally:
+            for buffer in buffers:
+                buffer.release()
+        return out
+
+    def check(self, buffer, aki, what):
+        if not same_format(buffer.format, aki.ctype._type_):
+            raise TypeError(
+                f"{what} of {self.name} should be {aki.typename}, "
+                f"got buffer of '{buffer.format}'"
+            )
+
+
+def build_driver(module, function, signature):
+    """
+    Add the loop driver for `function` to `module`, and return it.
+    """
+    i64 = ir.IntType(64)
+    byte_ptr = ir.IntType(8).as_pointer()
+    driver = ir.Function(
+        module,
+        ir.FunctionType(ir.VoidType(), [byte_ptr.as_pointer(), i64.as_pointer(), i64]),
+        f"{function.name}.ufunc",
+    )
+    data, steps, n = driver.args
+    for arg, name in zip(driver.args, ("data", "steps", "n")):
+        arg.name = name
+
+    builder = ir.IRBuilder(driver.append_basic_block("entry"))
+    types = [*signature.arg_types, signature.return_type]
+    bases, strides = [], []
+    contiguous = ir.Constant(ir.IntType(1), 1)
+    for j, aki in enumerate(types):
+        index = ir.Constant(i64, j)
+        bases.append(builder.load(builder.gep(data, [index])))
+        stride = builder.load(builder.gep(steps, [index]))
+        strides.append(stride)
+        # broadcast scalars (with a stride of 0) take the strided path
+        size = ir.Constant(i64, ctypes.sizeof(aki.ctype))
+        contiguous = builder.and_(contiguous, builder.icmp_unsigned("==", stride, size))
+
+    exit = driver.append_basic_block("exit")
+    contiguous_loop = driver.append_basic_block("contiguous")
+    strided_loop = driver.append_basic_block("strided")
+    builder.cbranch(contiguous, contiguous_loop, strided_loop)
+
+    def emit_loop(block, element):
+        # element(builder, j, i) gives a pointer to element i of argument j
+        builder.position_at_end(block)
+        header = driver.append_basic_block(f"{block.name}_header")
+        body = driver.append_basic_block(f"{block.name}_body")
+        builder.branch(header)
+        builder.position_at_end(header)
+        i = builder.phi(i64, name="i")
+        i.add_incoming(ir.Constant(i64, 0), block)
+        builder.cbranch(builder.icmp_signed("<", i, n), body, exit)
+        builder.position_at_end(body)
+        values = [builder.load(element(j, i)) for j in range(len(types) - 1)]
+        result = builder.call(function, values)
+        builder.store(result, element(len(types) - 1, i))
+        i.add_incoming(builder.add(i, ir.Constant(i64, 1)), body)
+        builder.branch(header)
+
+    def contiguous_element(j, i):
+        base = builder.bitcast(bases[j], types[j].llvm_type().as_pointer())
+        return builder.gep(base, [i])
+
+    def strided_element(j, i):
+        address = builder.gep(bases[j], [builder.mul(i, strides[j])])
+        return builder.bitcast(address, types[j].llvm_type().as_pointer())
+
+    emit_loop(contiguous_loop, contiguous_element)
+    emit_loop(strided_loop, strided_element)
+
+    builder.position_at_end(exit)
+    builder.ret_void()
+    return driver
+
+
+def vectorize(source, codegen=None, jit=None, parser=None):
+    """
+    Compile a `Ufunc` for a scalar Aki function. `source` is either
+    the Aki source of a single function definition, or the name of
+    a function `codegen` has already compiled. From source, the
+    function is generated alongside the driver, so it can be inlined
+    into the loop (with a `Jit` opt level of 1 or more); it also
+    remains callable as an ordinary function afterwards.
+    """
+    codegen = codegen or Codegen()
+    jit = jit or Jit(opt_level=3)
+
+    codegen.new_module()
+    codegen.txt = source
+    if source.isidentifier():
+        name = source
+        signature = codegen.signature(name)
+        function = codegen.declare(name)
+    else:
+        ast = (parser or get_parser()).parse(source, start="immediate").nodes
+        if len(ast) != 1 or not isinstance(ast[0], Function):
+            raise ValueError("expected a single function definition")
+        if codegen.fold_constants:
+            ast = fold(ast)
+        codegen.gen_command(ast)
+        name = ast[0].name.value
+        signature = codegen.signature(name)
+        function = codegen.module.globals[name]
+
+    for aki in (*signature.arg_types, signature.return_type):
+        if not isinstance(aki, (IntegerBase, FloatBase)):
+            raise TypeError(f"can't vectorize over {aki.typename}")
+
+    driver = build_driver(codegen.module, function, signature)
+    jit.compile_module(codegen)
+    address = jit.engine.get_function_address(driver.name)
+    return Ufunc(name, signature, driver_prototype(address), jit)
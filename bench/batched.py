@@ -0,0 +1,58 @@
+"""
+Evaluates the same set of short expressions one module at a time,
+the way the REPL and the tests do, and then as a single batch with
+`evaluate_batch`.
+
+Run with `python bench/batched.py [expressions]`.
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "aki")
+)
+
+from parsing import parser
+from codegen import Codegen
+from jitengine import Jit
+from batch import evaluate_batch
+
+
+def expressions(count):
+    for n in range(count):
+        yield f"x = {n} when x > 10 x * 2 else x - 1"
+
+
+def one_at_a_time(sources):
+    codegen = Codegen()
+    jit = Jit()
+    results = []
+    for text in sources:
+        codegen.gen(parser.parse(text, start="immediate"), text)
+        results.append(jit.execute(codegen, entry_point=codegen.anon_counter()))
+        jit.clear()
+    return results
+
+
+def batched(sources):
+    return [_.value for _ in evaluate_batch(sources)]
+
+
+def run(count=2000):
+    sources = list(expressions(count))
+    print(f"{'method':>14} {'total (ms)':>12} {'us/expr':>10}")
+    expected = None
+    for method in (one_at_a_time, batched):
+        start = time.perf_counter()
+        results = method(sources)
+        elapsed = time.perf_counter() - start
+        assert expected is None or results == expected
+        expected = results
+        per_command = 1e6 * elapsed / count
+        print(f"{method.__name__:>14} {1000 * elapsed:>12.1f} {per_command:>10.1f}")
+
+
+if __name__ == "__main__":
+    run(*(int(_) for _ in sys.argv[1:2]))
@@ -0,0 +1,51 @@
+"""
+Compares the cost of calling the same compiled function repeatedly:
+resolving its address and building a ctypes wrapper on every call,
+the way `Jit.execute` used to, against the cached wrapper behind
+`Jit.invoke` and `Jit.call_many`.
+
+Run with `python bench/calls.py [calls]`.
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "aki")
+)
+
+from parsing import parser
+from codegen import Codegen
+from jitengine import Jit
+
+
+def run(count=100000):
+    codegen = Codegen()
+    jit = Jit()
+    text = "def add(a, b) a + b 0"
+    codegen.gen(parser.parse(text, start="immediate"), text)
+    jit.execute(codegen, entry_point=codegen.anon_counter())
+    signature = codegen.signature("add")
+
+    def uncached():
+        for _ in range(count):
+            signature.ctype(jit.engine.get_function_address("add"))(1, 2)
+
+    def invoke():
+        for _ in range(count):
+            jit.invoke("add", 1, 2)
+
+    def call_many():
+        jit.call_many("add", count, 1, 2)
+
+    print(f"{'method':>10} {'ns/call':>10}")
+    for method in (uncached, invoke, call_many):
+        start = time.perf_counter()
+        method()
+        elapsed = time.perf_counter() - start
+        print(f"{method.__name__:>10} {1e9 * elapsed / count:>10.0f}")
+
+
+if __name__ == "__main__":
+    run(*(int(_) for _ in sys.argv[1:2]))
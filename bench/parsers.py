@@ -0,0 +1,48 @@
+"""
+Compares throughput of the Lark and hand-written Pratt parser
+backends on a large generated source, in tokens per second.
+
+Run with `python bench/parsers.py [functions]`.
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "aki")
+)
+
+from parsing import get_parser, backends
+from parsing.pratt import tokenize
+
+
+def source(functions):
+    lines = []
+    for n in range(functions):
+        lines.append(
+            f"def f{n}() {{ when {n} > 2 {{ {n} * (3 + {n}) - f{n}() }} "
+            f"else {{ -{n} << 2 }} }}"
+        )
+    lines.append(" + ".join(f"f{n}()" for n in range(functions)))
+    return "\n".join(lines)
+
+
+def run(functions=2000, repeat=3):
+    text = source(functions)
+    tokens = len(tokenize(text)) - 1
+    print(f"{len(text)} chars, {tokens} tokens")
+    for backend in backends:
+        parser = get_parser(backend)
+        best = min(_time(parser, text) for _ in range(repeat))
+        print(f"{backend:>6}: {best:.3f}s, {tokens / best:,.0f} tokens/s")
+
+
+def _time(parser, text):
+    start = time.perf_counter()
+    parser.parse(text, start="immediate")
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    run(*(int(_) for _ in sys.argv[1:2]))
@@ -0,0 +1,44 @@
+"""
+Simulates a long REPL session and reports per-command latency
+over successive windows of commands. With incremental modules the
+per-window average should stay flat instead of growing with the
+number of commands already executed.
+
+Run with `python bench/session.py [commands] [window]`.
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "aki")
+)
+
+from parsing import parser
+from codegen import Codegen
+from jitengine import Jit
+from benchmark import session
+
+
+def run(count=10000, window=1000):
+    codegen = Codegen()
+    jit = Jit()
+    timings = []
+    for cmd in session(count):
+        start = time.perf_counter()
+        ast = parser.parse(cmd, start="immediate")
+        codegen.gen(ast, cmd)
+        jit.execute(codegen, entry_point=codegen.anon_counter())
+        timings.append(time.perf_counter() - start)
+
+    print(f"{'commands':>12} {'avg (ms)':>10} {'max (ms)':>10}")
+    for n in range(0, count, window):
+        chunk = timings[n : n + window]
+        average, worst = 1000 * sum(chunk) / len(chunk), 1000 * max(chunk)
+        print(f"{n + 1:>5}-{n + len(chunk):<6} {average:>10.3f} {worst:>10.3f}")
+    return timings
+
+
+if __name__ == "__main__":
+    run(*(int(_) for _ in sys.argv[1:3]))
@@ -0,0 +1,73 @@
+"""
+Runs the `benchmark` suite, printing each corpus's per-stage times
+and optionally saving them as JSON, or compares two saved runs and
+exits with status 1 if any stage regressed past the threshold.
+
+Run with `python bench/suite.py run [-o results.json]`, then
+`python bench/suite.py compare base.json results.json`.
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "aki")
+)
+
+import benchmark
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(prog="suite.py")
+    commands = arg_parser.add_subparsers(dest="command", required=True)
+    run = commands.add_parser("run", help="run the suite")
+    run.add_argument("-o", dest="output", help="save the results as JSON here")
+    run.add_argument("--corpus", action="append", choices=list(benchmark.corpora))
+    run.add_argument("--max-size", type=int, help="skip corpus sizes larger than this")
+    run.add_argument(
+        "--repeat", type=int, default=3, help="best of this many runs (default 3)"
+    )
+    run.add_argument("-O", dest="opt_level", type=int, choices=range(4), default=0)
+    run.add_argument("--parser", choices=("lark", "pratt"), default="lark")
+    run.add_argument(
+        "--compare", metavar="BASE", help="also compare against saved results"
+    )
+    run.add_argument("--threshold", type=float, default=0.1)
+    compare = commands.add_parser("compare", help="compare two saved runs")
+    compare.add_argument("base")
+    compare.add_argument("new")
+    compare.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="slowdown to flag, as a fraction (default 0.1)",
+    )
+    args = arg_parser.parse_args(argv)
+
+    if args.command == "run":
+        results = benchmark.run_suite(
+            args.corpus, args.max_size, args.repeat, args.opt_level, args.parser
+        )
+        benchmark.report(results)
+        if args.output:
+            benchmark.save(results, args.output)
+        if not args.compare:
+            return 0
+        base = benchmark.load(args.compare)
+    else:
+        base, results = benchmark.load(args.base), benchmark.load(args.new)
+
+    regressions = benchmark.compare(base, results, args.threshold)
+    for _ in regressions:
+        print(
+            f"REGRESSION {_['corpus']} size {_['size']} {_['stage']}: "
+            f"{_['base'] * 1000:.3f} -> {_['new'] * 1000:.3f} ms ({_['ratio']:.2f}x)"
+        )
+    if not regressions:
+        print(f"no stage more than {args.threshold:.0%} slower")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,14 @@
 def main():
+    import os
     import sys
 
-    sys.path.insert(0, ".\\aki")
+    test_dir = os.path.dirname(os.path.abspath(__file__))
+    sys.path.insert(0, os.path.join(test_dir, "..", "aki"))
 
     import unittest
 
     print("Discovering tests.")
-    tests = unittest.TestLoader().discover(".\\test", pattern="test_*.py")
+    tests = unittest.TestLoader().discover(test_dir, pattern="test_*.py")
     print("Starting.")
     unittest.TextTestRunner(failfast=True).run(tests)
 
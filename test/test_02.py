@@ -1,5 +1,6 @@
 from utils import BaseTest
-from errors import AkiTypeError
+from errors import AkiTypeError, AkiSyntaxError
+from codegen import codegen
 
 
 class TestExpressions(BaseTest):
@@ -33,3 +34,22 @@ class TestExpressions(BaseTest):
     def test_illegal_when(self):
         self.ex("when 2==2 1 else False", AkiTypeError)
         self.ex("when 32 1 else False", AkiTypeError)
+
+
+class TestSSA(BaseTest):
+    def test_no_stack_slots(self):
+        self.eq("def t(){32} when t()==32 0 else 1", 0)
+        ir = str(codegen.module)
+        self.assertNotIn("alloca", ir)
+        self.assertIn("phi", ir)
+
+    def test_nested_when(self):
+        self.eq("def t(){32} when t()==32 {when t()>1 2 else 3} else 4", 2)
+        self.eq("def t(){32} when t()!=32 4 else {when t()>100 2 else 3}", 3)
+
+    def test_if_without_else(self):
+        self.eq("def t(){32} if t()==32 1", True)
+        self.eq("def t(){32} if t()!=32 1", False)
+
+    def test_when_without_else(self):
+        self.ex("def t(){32} when t()==32 1", AkiSyntaxError)
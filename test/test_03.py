@@ -0,0 +1,115 @@
+import os
+import shutil
+import tempfile
+from utils import SessionTest
+from codegen import Codegen
+from jitengine import Jit
+from errors import AkiNameError, AkiTypeError, AkiIndexError
+
+
+class TestSession(SessionTest):
+    def test_call_across_commands(self):
+        self.eq("def test(){32} 0", 0)
+        self.eq("test()+1", 33)
+        self.eq("def test2(){test()*2} test2()", 64)
+        self.eq("test2()+test()", 96)
+
+    def test_modules_are_incremental(self):
+        self.cmd("def test(){32} 0")
+        self.cmd("test()")
+        module = str(self.codegen.module)
+        self.assertIn('declare i64 @"test"()', module)
+        self.assertNotIn('define i64 @"test"()', module)
+        self.assertNotIn("ANONYMOUS_1", module)
+
+    def test_redefinition(self):
+        self.cmd("def test(){32} 0")
+        self.ex("def test(){64} 0", AkiNameError)
+
+    def test_definitions_only(self):
+        self.assertIsNone(self.cmd("def f(a) a"))
+        self.eq("f(3)", 3)
+        self.assertIsNone(self.cmd("def g() f(2) + 1"))
+        self.eq("g()", 3)
+
+    def test_failed_command_not_registered(self):
+        self.ex("def test(){32} test()==True", AkiTypeError)
+        self.ex("test()", AkiNameError)
+
+
+class TestOptimizedSession(TestSession):
+    def setUp(self):
+        self.codegen = Codegen()
+        self.jit = Jit(opt_level=3)
+
+    def test_optimized_ir(self):
+        self.eq("def test(){when 2==2 16 else 0} test()*2", 32)
+        # mem2reg and friends should have removed the stack slots
+        self.assertNotIn("alloca", str(self.jit.mod))
+
+    def test_optimized_loop(self):
+        self.eq("def sum(){s = 0 for i in 1000 s = s + i s} sum()", 499500)
+        # the loop passes should have reduced this to a constant
+        self.assertNotIn("loop_header", str(self.jit.mod))
+
+
+class TestObjectCache(SessionTest):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.codegen = Codegen()
+        self.jit = Jit(cache_dir=self.cache_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def test_cache_hit_after_reset(self):
+        self.eq("def test(){32} test()", 32)
+        self.assertEqual(self.jit.cache_hits, 0)
+        misses = self.jit.cache_misses
+        # same code in a fresh JIT is served from the cache
+        self.codegen = Codegen()
+        self.jit = Jit(cache_dir=self.cache_dir)
+        self.eq("def test(){32} test()", 32)
+        self.assertEqual((self.jit.cache_hits, self.jit.cache_misses), (misses, 0))
+
+    def test_eviction(self):
+        self.jit.object_cache.max_size = 1
+        self.cmd("2+2")
+        self.cmd("2+3")
+        self.assertEqual(len(os.listdir(self.cache_dir)), 0)
+
+
+class TestBitcode(SessionTest):
+    def test_save_and_load_library(self):
+        self.cmd("def lib_a(){32} def lib_b(){2.5} 0")
+        bitcode = self.jit.save_bc(self.codegen.module)
+
+        self.codegen = Codegen()
+        self.jit = Jit()
+        mod = self.jit.load_bc(bitcode)
+        self.codegen.register_library(mod)
+        self.eq("lib_a()+1", 33)
+        self.eq("lib_b()*2.0", 5.0)
+
+    def test_library_bounds_checks(self):
+        self.cmd("def g(i) {a = [1, 2] a[i]}")
+        bitcode = self.jit.save_bc(self.codegen.module)
+        self.codegen = Codegen()
+        self.jit = Jit()
+        self.codegen.register_library(self.jit.load_bc(bitcode))
+        self.eq("g(1)", 2)
+        with self.assertRaises(AkiIndexError) as e:
+            self.cmd("g(5)")
+        self.assertEqual((e.exception.index, e.exception.length), (5, 2))
+        with self.assertRaises(AkiIndexError):
+            self.jit.get_callable(self.codegen, "g")(5)
+        # nothing is left over for the next check
+        self.eq("a = [1] a[0]", 1)
+
+    def test_link_into_module(self):
+        self.cmd("def lib_a(){32} 0")
+        bitcode = self.jit.save_bc(self.codegen.module)
+        self.codegen = Codegen()
+        self.jit = Jit()
+        linked = self.jit.load_bc(bitcode, self.codegen.module)
+        self.assertIn("lib_a", [fn.name for fn in linked.functions])
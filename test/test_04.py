@@ -0,0 +1,245 @@
+import glob
+import os
+import random
+import tempfile
+import unittest
+from lark.exceptions import UnexpectedInput
+from parsing import get_parser, load_parser
+from errors import AkiSyntaxError
+from akiast import Interner, SignedInteger, Module
+
+lark_parser = get_parser("lark")
+pratt_parser = get_parser("pratt")
+
+corpus = [
+    "2",
+    "-2",
+    "2.0",
+    "2.",
+    "2.0_F",
+    "2.0_H",
+    "2.0_D",
+    "5_U",
+    ".INF",
+    ".NAN",
+    "True",
+    "False",
+    "-True",
+    "2+2",
+    "2+3*4-1",
+    "4/(2+2)",
+    "2 & 3 | 4 ^ 5",
+    "8 >> 3 << 1",
+    "2==2",
+    "2<=3 == True",
+    "2.0+.INF",
+    "x",
+    "x = 2+2",
+    "(x) = 2",
+    "2 = 3",
+    "x = {2 3}",
+    "f()",
+    "f(1)",
+    "f(1, 2, 3)",
+    "f(1 2)",
+    "f()()",
+    "f(g(1), -h())",
+    "-f()",
+    "if 32==2 0 else 1",
+    "if a b",
+    "if a b else c == d",
+    "if a if b c else d",
+    "when 32 0 else 1",
+    "when a {b; c} else {d e}",
+    "if {a} {b} else {c}",
+    "def test(){32}",
+    "def test() 32",
+    "def test 32",
+    "def test(){32} when test()==32 0 else 1",
+    "def test(x, y:int64):float64 {x}",
+    "def a(){def b(){1} b()}",
+    "def f(a, b, c:uint64) a",
+    "def f(a:float64):bool {a}",
+    "def f():int64 1",
+    "while x < 10 x = x + 1",
+    "while {a; b} {c d}",
+    "for i in 10 s = s + i",
+    "for i in n {if i == 5 break; s}",
+    "for i in n for j in m {if j continue i else break j}",
+    "while 1 {break; continue}",
+    "while 1 break 2",
+    "if {a; b} c",
+    "x = 0 while x < 3 {x = x + 1} x",
+    "a[1]",
+    "a[i + 1] = a[i] * 2",
+    "a[1:2]",
+    "a[:2]",
+    "a[1:]",
+    "a[:]",
+    "a[1:][0]",
+    "f(x)[2]",
+    "-a[0]",
+    "[1, 2, 3]",
+    "[4]",
+    "[[1], [2]]",
+    "x = [1.0, 2.0] x[0]",
+    "def f(a:float64[], b:int64):float64 a[b]",
+    "{2;3}",
+    "2 {3 4}",
+    "2\n+\n3",
+    "1 2 3",
+    "",
+]
+
+bad_corpus = [
+    "2+",
+    "--2",
+    "2 +* 3",
+    "f(1,)",
+    "(",
+    "{}",
+    "def",
+    "x = ",
+    "-x = 3",
+    "2;3",
+    "if",
+    "#",
+    "def f(a,) 1",
+    "def f(a b) 1",
+    "def f(a:) 1",
+    "a[1:2:3]",
+    "a[]",
+    "[]",
+    "[1,]",
+    "def f(a:float64[2]) 1",
+    "while",
+    "while x",
+    "for 1 in x y",
+    "for i x y",
+    "for i in x",
+]
+
+
+def dump(node):
+    """
+    Full structural dump of an AST, positions included.
+    """
+    if isinstance(node, list):
+        return [dump(_) for _ in node]
+    if not hasattr(node, "line"):
+        return node
+    return (
+        node.__class__.__name__,
+        node.line,
+        node.column,
+        {field: dump(getattr(node, field)) for field in node._fields},
+    )
+
+
+def random_expression(rng, depth=0):
+    if depth > 4 or rng.random() < 0.3:
+        return rng.choice(["1", "22", "3.5", "7_U", "True", "x", "f()", ".INF"])
+    kind = rng.random()
+    if kind < 0.5:
+        op = rng.choice(["+", "-", "*", "/", "==", "!=", "<", ">=", "&", "|", "<<"])
+        lhs, rhs = random_expression(rng, depth + 1), random_expression(rng, depth + 1)
+        return f"{lhs} {op} {rhs}"
+    if kind < 0.6:
+        return f"-{rng.choice(['1', 'x', 'f(2)'])}"
+    if kind < 0.75:
+        return f"({random_expression(rng, depth + 1)})"
+    if kind < 0.85:
+        keyword = rng.choice(["if", "when"])
+        # if/when can't be an operand without parens
+        test, then, otherwise = (random_expression(rng, depth + 1) for _ in range(3))
+        return f"({keyword} ({test}) {{{then}}} else {{{otherwise}}})"
+    args = ", ".join(
+        random_expression(rng, depth + 1) for _ in range(rng.randint(0, 3))
+    )
+    return f"g({args})"
+
+
+class TestParserBackends(unittest.TestCase):
+    def check(self, text):
+        expected = lark_parser.parse(text, start="immediate")
+        result = pratt_parser.parse(text, start="immediate")
+        self.assertEqual(dump(result), dump(expected), text)
+
+    def test_corpus(self):
+        for text in corpus:
+            with self.subTest(text=text):
+                self.check(text)
+
+    def test_programs(self):
+        for text in ("def main() 1", "def f(x) x def main() f(2)", "1 2", ""):
+            with self.subTest(text=text):
+                expected = lark_parser.parse(text, start="start")
+                self.assertIsInstance(expected, Module)
+                self.assertEqual(
+                    dump(pratt_parser.parse(text, start="start")), dump(expected)
+                )
+
+    def test_bad_corpus(self):
+        for text in bad_corpus:
+            with self.subTest(text=text):
+                with self.assertRaises(UnexpectedInput):
+                    lark_parser.parse(text, start="immediate")
+                with self.assertRaises(AkiSyntaxError):
+                    pratt_parser.parse(text, start="immediate")
+
+    def test_generated(self):
+        rng = random.Random(1234)
+        for _ in range(300):
+            text = " ".join(random_expression(rng) for _ in range(rng.randint(1, 3)))
+            with self.subTest(text=text):
+                self.check(text)
+
+
+class TestParserCache(unittest.TestCase):
+    def test_truncated(self):
+        with tempfile.TemporaryDirectory() as cache:
+            load_parser(cache)
+            (cache_file,) = glob.glob(os.path.join(cache, "*.lark-cache"))
+            with open(cache_file, "r+b") as f:
+                f.truncate(os.path.getsize(cache_file) // 2)
+            # rebuilt, and the cache written again in full
+            parsed = load_parser(cache).parse("1 + 2", start="immediate")
+            self.assertEqual(
+                dump(parsed), dump(lark_parser.parse("1 + 2", start="immediate"))
+            )
+            self.assertEqual(os.listdir(cache), [os.path.basename(cache_file)])
+            load_parser(cache).parse("1 + 2", start="immediate")
+
+
+class TestAstNodes(unittest.TestCase):
+    def parse(self, text):
+        return pratt_parser.parse(text, start="immediate").nodes
+
+    def test_structural_equality(self):
+        self.assertEqual(
+            self.parse("if 2==2 1 else 0"), self.parse("if  2 == 2  1 else 0")
+        )
+        self.assertNotEqual(
+            self.parse("if 2==2 1 else 0"), self.parse("when 2==2 1 else 0")
+        )
+        self.assertNotEqual(self.parse("2"), self.parse("2.0"))
+        self.assertNotEqual(self.parse("2"), self.parse("2_U"))
+        self.assertNotEqual(self.parse("f()"), self.parse("g()"))
+        self.assertNotEqual(self.parse("def f(){1}"), self.parse("def g(){1}"))
+
+    def test_hash(self):
+        a = self.parse("def f(){1+2} when f() 1 else 2")
+        b = self.parse("def f() {1 + 2}\nwhen f() 1 else 2")
+        self.assertEqual([hash(_) for _ in a], [hash(_) for _ in b])
+        self.assertEqual(len({*a, *b}), 2)
+
+    def test_slots(self):
+        node = self.parse("2+2")[0]
+        self.assertFalse(hasattr(node, "__dict__"))
+
+    def test_interning(self):
+        interner = Interner()
+        tree = interner.intern(self.parse("(1+2)*(1+2) - (1+2)"))[0]
+        self.assertIs(tree.lhs.lhs, tree.lhs.rhs)
+        self.assertIs(tree.lhs.lhs, tree.rhs)
+        self.assertIs(interner.make(SignedInteger, (9, 9), "1"), tree.rhs.lhs)
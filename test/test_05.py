@@ -0,0 +1,125 @@
+import math
+import unittest
+from parsing import parser
+from codegen import Codegen
+from jitengine import Jit
+from constfold import fold
+from akiast import SignedInteger, Boolean
+
+# every one of these must give the same result folded or not
+constant_exprs = [
+    "2+2",
+    "-2",
+    "-2.0",
+    "2-4",
+    "2*3+4",
+    "7/2",
+    "-7/2",
+    "7/-2",
+    "2 & 3",
+    "2 | 3",
+    "2 ^ 3",
+    "2 << 2",
+    "8 >> 3",
+    "-8 >> 1",
+    "9223372036854775807 + 1",
+    "0 - 9223372036854775807 - 1",
+    f"{2**64 - 1}_U + 1_U",
+    "1_U - 2_U",
+    "7_U / 2_U",
+    f"{2**63}_U >> 1_U",
+    f"{2**63}_U > 1_U",
+    "2 > -1",
+    "True+True",
+    "True-True",
+    "False-True",
+    "True*True",
+    "True*False",
+    "False/True",
+    "True & False",
+    "True | False",
+    "True ^ True",
+    "True > False",
+    "True < False",
+    "True == True",
+    "True != False",
+    "-True",
+    "-False",
+    "2.0+2.2",
+    "4.2-2.0",
+    "2.*2.",
+    "4./3.",
+    "2.0+.INF",
+    ".INF-.INF",
+    ".NAN == .NAN",
+    ".NAN != .NAN",
+    ".NAN < 1.0",
+    "2.0 >= 2.0",
+    "-0.0 == 0.0",
+    "if 32==2 0 else 1",
+    "if 2==2 1 else 0",
+    "when 32 0 else 1",
+    "when 0 0 else 1",
+    "when 0.0 1 else 2",
+    "when .NAN 1 else 2",
+    "when 2==2 32 else 64",
+    "when 1_U 2+2 else 3*3",
+    "if 1.0 1 else 0",
+    "when (when True 0 else 1) 5 else 6",
+]
+
+
+def run(codegen, jit, command):
+    ast = parser.parse(command, start="immediate")
+    codegen.reset()
+    codegen.gen(ast, command)
+    result = jit.execute(codegen, entry_point=codegen.anon_counter())
+    ir = str(codegen.module)
+    jit.clear()
+    return result, ir
+
+
+class TestConstantFolding(unittest.TestCase):
+    def setUp(self):
+        self.jit = Jit()
+
+    def test_same_results(self):
+        folded = Codegen()
+        unfolded = Codegen(fold_constants=False)
+        for command in constant_exprs:
+            with self.subTest(command=command):
+                expected, _ = run(unfolded, self.jit, command)
+                result, _ = run(folded, self.jit, command)
+                if isinstance(expected, float) and math.isnan(expected):
+                    self.assertTrue(math.isnan(result))
+                else:
+                    self.assertEqual(result, expected)
+                    self.assertIs(type(result), type(expected))
+
+    def test_folded_ir(self):
+        codegen = Codegen()
+        for command in ("2+2*3", "if 32==2 0 else 1", "when 32 0 else 1"):
+            with self.subTest(command=command):
+                _, ir = run(codegen, self.jit, command)
+                self.assertNotIn("then_block", ir)
+                self.assertNotIn("add", ir)
+                self.assertNotIn("icmp", ir)
+
+    def test_folded_ast(self):
+        ast = fold(parser.parse("2+2*3 == 8", start="immediate"))
+        self.assertEqual(ast.nodes, [Boolean((1, 1), "True")])
+        ast = fold(parser.parse("when 2>1 {4/2} else 0", start="immediate"))
+        self.assertEqual(ast.nodes, [SignedInteger((1, 1), "2")])
+
+    def test_not_folded(self):
+        # left for codegen to evaluate, or to reject
+        for command in (
+            "1/0",
+            "True/False",
+            "1 << 64",
+            "2 == True",
+            "when True 1 else False",
+        ):
+            with self.subTest(command=command):
+                ast = parser.parse(command, start="immediate")
+                self.assertEqual(fold(ast), ast)
@@ -0,0 +1,68 @@
+from utils import BaseTest
+from codegen import codegen
+from errors import AkiSyntaxError, AkiTypeError, AkiNameError
+
+
+class TestVariables(BaseTest):
+    def test_assignment(self):
+        self.eq("x = 2 x", 2)
+        self.eq("x = 2 x = x * 3 x + 1", 7)
+        self.eq("x = 2.5 x", 2.5)
+
+    def test_assignment_in_branch(self):
+        self.eq("x = 1 if x == 1 x = 5 x", 5)
+        self.eq("x = 1 when x == 2 {x = 5} else {x = 6} x", 6)
+
+    def test_bad_assignment(self):
+        self.ex("x = 1 x = 2.0", AkiTypeError)
+        self.ex("2 = 3", AkiSyntaxError)
+        self.ex("y + 1", AkiNameError)
+
+
+class TestLoops(BaseTest):
+    def test_while(self):
+        self.eq("x = 0 while x < 10 x = x + 1 x", 10)
+        self.eq("x = 1 while x < 100 {x = x * 2} x", 128)
+        self.eq("while False 1", 0)
+
+    def test_while_yields_iterations(self):
+        self.eq("x = 0 while x < 10 x = x + 2", 5)
+
+    def test_for(self):
+        self.eq("s = 0 for i in 10 s = s + i s", 45)
+        self.eq("s = 0.0 for i in 4 s = s + 0.5 s", 2.0)
+        self.eq("for i in 0 1", 0)
+        self.eq("for i in 7 1", 7)
+        self.eq("for i in 3_U 1", 3)
+
+    def test_nested(self):
+        self.eq("n = 0 for i in 4 for j in i n = n + 1 n", 6)
+        self.eq("s = 0 for i in 3 for i in 5 s = s + i s", 30)
+
+    def test_break(self):
+        self.eq("s = 0 for i in 100 { if i == 5 break; s = s + i } s", 10)
+        self.eq("for i in 100 { if i == 5 break }", 5)
+        self.eq("x = 0 while True { x = x + 1; if x == 7 break } x", 7)
+
+    def test_continue(self):
+        self.eq("s = 0 for i in 10 { if i & 1 continue; s = s + i } s", 20)
+
+    def test_labels(self):
+        self.eq("n = 0 for i in 10 for j in 10 { if j == 3 break i; n = n + 1 } n", 3)
+        self.eq("n = 0 for i in 3 for j in 3 { if j == 1 continue i; n = n + 1 } n", 3)
+
+    def test_loop_errors(self):
+        self.ex("break", AkiSyntaxError)
+        self.ex("def f() {continue} 0", AkiSyntaxError)
+        self.ex("for i in 3 break j", AkiNameError)
+        self.ex("for i in 3 i = 2", AkiSyntaxError)
+        self.ex("for i in 2.0 1", AkiTypeError)
+        self.ex("for i in 3 1 i", AkiNameError)
+
+    def test_canonical_form(self):
+        self.cmd("s = 0 for i in 10 s = s + i s")
+        ir = str(codegen.module)
+        for block in ("loop_header", "loop_body", "loop_latch", "loop_exit"):
+            self.assertIn(f"{block}:", ir)
+        # the only back edge is the latch's
+        self.assertEqual(ir.count('br label %"loop_header"'), 2)
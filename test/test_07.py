@@ -0,0 +1,111 @@
+import os
+import tempfile
+from ctypes import c_double, c_int64
+from utils import BaseTest, SessionTest
+from errors import AkiBaseException, AkiTypeError, AkiNameError
+
+
+class TestArguments(BaseTest):
+    def test_arguments(self):
+        self.eq("def add(a, b) a + b add(2, 3)", 5)
+        self.eq("def add3(a, b, c) a + b + c add3(1, 2, 3)", 6)
+        self.eq(
+            "def scale(x:float64, n:int64):float64 {s = 0.0 for i in n s = s + x; s} "
+            "scale(1.5, 4)",
+            6.0,
+        )
+        self.eq(
+            "def pick(a:uint64, b:bool):uint64 when b a else 0_U pick(5_U, True)", 5
+        )
+
+    def test_narrow_arguments(self):
+        # literals adapt to the declared width, as for the builtins
+        self.eq("def add(a:int32, b:int32):int32 a + b add(1, 2)", 3)
+        self.eq("def twice(x:float32):float32 x + x twice(1.5)", 3.0)
+        self.ex("def add(a:int32, b:int32):int32 a + b add(1.5, 2)", AkiTypeError)
+        self.ex("def add(a:int32, b:int32):int32 a + b x = 1 add(x, 2)", AkiTypeError)
+
+    def test_reassigned_argument(self):
+        self.eq(
+            "def count(n) {c = 0 while n > 0 {n = n - 1; c = c + 2} c} count(5)", 10
+        )
+
+    def test_recursion(self):
+        self.eq("def fact(n):int64 when n < 2 1 else n * fact(n - 1) fact(10)", 3628800)
+        self.eq("def fib(n) when n < 2 n else fib(n - 1) + fib(n - 2) fib(20)", 6765)
+
+    def test_argument_errors(self):
+        self.ex("def add(a, b) a + b add(1.0, 2)", AkiTypeError)
+        self.ex("def add(a, b) a + b add(1)", AkiBaseException)
+        self.ex("def f(x:foo) 1 0", AkiNameError)
+        self.ex("def f(a, a) 1 0", AkiNameError)
+
+    def test_return_type(self):
+        self.eq("def f():float64 1.0 f()", 1.0)
+        self.ex("def f():float64 1 0", AkiTypeError)
+
+
+class TestCallable(SessionTest):
+    def test_get_callable(self):
+        self.cmd("def scale(x:float64, n:int64):float64 x * 2.0 0")
+        scale = self.jit.get_callable(self.codegen, "scale")
+        self.assertEqual(scale.argtypes, (c_double, c_int64))
+        self.assertEqual(scale.restype, c_double)
+        self.assertEqual([scale(x, 0) for x in (1.0, 2.5)], [2.0, 5.0])
+
+    def test_callable_outlives_session(self):
+        self.cmd("def fib(n) when n < 2 n else fib(n - 1) + fib(n - 2) 0")
+        fib = self.jit.get_callable(self.codegen, "fib")
+        del self.jit
+        self.assertEqual(fib(25), 75025)
+
+    def test_unknown_callable(self):
+        self.cmd("0")
+        with self.assertRaises(AkiNameError):
+            self.jit.get_callable(self.codegen, "nope")
+
+
+class TestSymbolCache(SessionTest):
+    def test_wrappers_are_cached(self):
+        self.cmd("def add(a, b) a + b 0")
+        add = self.jit.resolve("add")
+        self.assertIs(self.jit.resolve("add"), add)
+        self.assertIs(self.jit.get_callable(self.codegen, "add"), add)
+        self.assertEqual(self.jit.invoke("add", 2, 3), 5)
+
+    def test_call_many(self):
+        self.cmd("def sq(x:float64):float64 x * x 0")
+        self.assertEqual(self.jit.call_many("sq", 3, 1.5), [2.25] * 3)
+
+    def test_cleared_symbols_are_dropped(self):
+        self.cmd("def one() 1 one()")
+        self.jit.clear()
+        with self.assertRaises(KeyError):
+            self.jit.invoke("one")
+
+    def test_library_functions(self):
+        self.cmd("def lib_a(){32} 0")
+        bitcode = self.jit.save_bc(self.codegen.module)
+        self.setUp()
+        self.codegen.register_library(self.jit.load_bc(bitcode))
+        with self.assertRaises(KeyError):
+            self.jit.invoke("lib_a")
+        self.assertEqual(self.jit.get_callable(self.codegen, "lib_a")(), 32)
+        self.assertEqual(self.jit.invoke("lib_a"), 32)
+
+    def test_library_integer_widths(self):
+        ir = """define i32 @lib_b(i8 %x, i16 %y) {
+  %a = sext i8 %x to i32
+  %b = sext i16 %y to i32
+  %c = add i32 %a, %b
+  ret i32 %c
+}"""
+        with tempfile.TemporaryDirectory() as temp:
+            path = os.path.join(temp, "lib.ll")
+            with open(path, "w") as f:
+                f.write(ir)
+            self.codegen.register_library(self.jit.load_asm(path))
+        signature = self.codegen.signature("lib_b")
+        self.assertEqual([_.typename for _ in signature.arg_types], ["int8", "int16"])
+        self.assertEqual(signature.return_type.typename, "int32")
+        self.assertEqual(self.jit.get_callable(self.codegen, "lib_b")(-1, 300), 299)
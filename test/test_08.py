@@ -0,0 +1,58 @@
+from utils import SessionTest
+from batch import evaluate_batch
+from unittest import mock
+from errors import AkiTypeError, AkiNameError, AkiSyntaxError
+
+
+class TestBatch(SessionTest):
+    def test_results_in_order(self):
+        sources = [f"{n} * 2" for n in range(100)]
+        results = evaluate_batch(sources, self.codegen, self.jit)
+        self.assertEqual([_.value for _ in results], [n * 2 for n in range(100)])
+        self.assertEqual([_.source for _ in results], sources)
+        # the whole batch is a single module
+        self.assertEqual(str(self.codegen.module).count("define"), 100)
+
+    def test_error_isolation(self):
+        results = evaluate_batch(
+            ["1 + 1", "1 + 1.0", "2 +", "nope()", "def f() 3 f()", "f() + 1"],
+            self.codegen,
+            self.jit,
+        )
+        self.assertEqual([_.value for _ in results], [2, None, None, None, 3, 4])
+        self.assertIsInstance(results[1].error, AkiTypeError)
+        self.assertIsInstance(results[2].error, AkiSyntaxError)
+        self.assertIsInstance(results[3].error, AkiNameError)
+        self.assertEqual([_.error for _ in results[4:]], [None, None])
+
+    def test_failed_definition_is_rolled_back(self):
+        results = evaluate_batch(
+            ["def f() {1 + 1.0} 0", "f()", "def f() 5 f()"], self.codegen, self.jit
+        )
+        self.assertIsInstance(results[0].error, AkiTypeError)
+        self.assertIsInstance(results[1].error, AkiNameError)
+        self.assertEqual(results[2].value, 5)
+
+    def test_keep(self):
+        evaluate_batch(["def g() 7 0"], self.codegen, self.jit, keep=True)
+        self.eq("g() * 2", 14)
+        evaluate_batch(["def h() 7 0"], self.codegen, self.jit)
+        self.ex("h()", AkiNameError)
+
+    def test_python_errors_propagate(self):
+        with mock.patch.object(
+            self.codegen, "gen_command", side_effect=ZeroDivisionError
+        ):
+            with self.assertRaises(ZeroDivisionError):
+                evaluate_batch(["1"], self.codegen, self.jit)
+
+    def test_failing_cleared(self):
+        evaluate_batch(["def at(i) {a = [1, 2] a[i]} at(5)"], self.codegen, self.jit)
+        self.assertNotIn("at", self.codegen.failing)
+        evaluate_batch(
+            ["def at2(i) {a = [1, 2] a[i]} 0"], self.codegen, self.jit, keep=True
+        )
+        self.assertIn("at2", self.codegen.failing)
+
+    def test_defaults(self):
+        self.assertEqual(evaluate_batch(["2 + 2"])[0].value, 4)
@@ -0,0 +1,63 @@
+import unittest
+from array import array
+from codegen import Codegen
+from jitengine import Jit
+from ufunc import vectorize
+
+
+class TestUfunc(unittest.TestCase):
+    def setUp(self):
+        self.codegen = Codegen()
+        self.jit = Jit(opt_level=3)
+        self.f = vectorize(
+            "def f(x:float64, y:float64):float64 x * y + 1.0", self.codegen, self.jit
+        )
+
+    def test_contiguous(self):
+        a = array("d", range(10))
+        b = array("d", [2.0] * 10)
+        self.assertEqual(list(self.f(a, b)), [x * 2.0 + 1.0 for x in a])
+        # the contiguous loop should have been vectorized
+        self.assertIn(" x double>", str(self.jit.mod))
+
+    def test_strided_and_out(self):
+        a = array("d", range(10))
+        out = array("d", [0.0] * 5)
+        result = self.f(memoryview(a)[::2], memoryview(a)[1::2], out=out)
+        self.assertIs(result, out)
+        self.assertEqual(list(out), [x * (x + 1) + 1.0 for x in a[::2]])
+        strided_out = array("d", [0.0] * 10)
+        self.f(a[:5], 1.0, out=memoryview(strided_out)[::2])
+        self.assertEqual(list(strided_out[::2]), [x + 1.0 for x in a[:5]])
+        self.assertEqual(list(strided_out[1::2]), [0.0] * 5)
+
+    def test_read_only_input(self):
+        data = bytes(array("d", [1.5, 2.5]))
+        self.assertEqual(list(self.f(memoryview(data).cast("d"), 2.0)), [4.0, 6.0])
+
+    def test_scalars(self):
+        self.assertEqual(list(self.f(2.0, 3.0)), [7.0])
+
+    def test_integer_kernel(self):
+        g = vectorize(
+            "def g(n:int64) {s = 0 for i in n s = s + i; s}", self.codegen, self.jit
+        )
+        self.assertEqual(list(g(array("q", range(6)))), [0, 0, 1, 3, 6, 10])
+        # still callable as a scalar function
+        self.assertEqual(self.jit.invoke("g", 4), 6)
+
+    def test_compiled_function(self):
+        f = vectorize("f", self.codegen, self.jit)
+        self.assertEqual(list(f(array("d", [1.0, 2.0]), 3.0)), [4.0, 7.0])
+
+    def test_errors(self):
+        with self.assertRaises(TypeError):
+            self.f(array("f", [1.0]), 1.0)
+        with self.assertRaises(TypeError):
+            self.f(array("d", [1.0]))
+        with self.assertRaises(ValueError):
+            self.f(array("d", [1.0]), array("d", [1.0, 2.0]))
+        with self.assertRaises(ValueError):
+            self.f(1.0, 1.0, out=array("d", [0.0] * 2))
+        with self.assertRaises(ValueError):
+            vectorize("1 + 1", self.codegen, self.jit)
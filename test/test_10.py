@@ -0,0 +1,80 @@
+from utils import BaseTest, SessionTest
+from codegen import Codegen
+from jitengine import Jit
+from akitypes import Vector, vector_type, aki_type, SignedInteger, Float64
+from errors import AkiBaseException, AkiTypeError, AkiNameError
+
+
+class TestVectorTypes(BaseTest):
+    def test_names(self):
+        self.assertIs(vector_type("f64x4"), Vector(Float64(64), 4))
+        self.assertIs(aki_type("i32x8"), Vector(SignedInteger(32), 8))
+        self.assertEqual(aki_type("b1x2").typename, "b1x2")
+        for name in ("f64x3", "f16x4", "i7x4", "x4", "f64x128"):
+            self.assertIsNone(aki_type(name))
+
+    def test_arithmetic(self):
+        self.eq("reduce_add(f64x4(1.0, 2.0, 3.0, 4.0))", 10.0)
+        self.eq("v = f64x4(1.0, 2.0, 3.0, 4.0) reduce_add(v * v + f64x4(1.0))", 34.0)
+        self.eq("reduce_add(-i64x2(3, 4))", -7)
+        self.eq("reduce_add(i64x4(7) / i64x4(1, 2, 3, 7))", 13)
+        self.eq("x = i64x4(1) for i in 3 x = x + i64x4(i) reduce_add(x)", 16)
+
+    def test_narrow_elements(self):
+        self.eq("reduce_max(i32x8(3, 9, 1, 4, 2, 8, 7, 0))", 9)
+        self.eq("reduce_min(f32x4(3.5_F, 1.25_F, 2.0_F, 9.0_F))", 1.25)
+        self.eq("extract(insert(u8x16(1), 3, 200), 3)", 200)
+        self.eq("reduce_add(u8x4(200, 100, 0, 0))", 44)
+
+    def test_reductions(self):
+        self.eq("reduce_mul(i64x4(1, 2, 3, 4))", 24)
+        self.eq("reduce_min(f64x2(2.5, -1.0))", -1.0)
+        self.eq("reduce_xor(u64x4(1_U, 2_U, 4_U, 1_U))", 6)
+
+    def test_masks(self):
+        self.eq("reduce_or(f64x4(1.0, 5.0, 2.0, 8.0) > f64x4(3.0))", True)
+        self.eq("reduce_and(f64x4(1.0, 5.0, 2.0, 8.0) > f64x4(3.0))", False)
+        self.eq(
+            "reduce_add(select(i64x4(1, 2, 3, 4) > i64x4(2), i64x4(10), i64x4(1)))", 22
+        )
+
+    def test_shuffles(self):
+        self.eq("extract(shuffle(i64x4(1, 2, 3, 4), 3, 2, 1, 0), 0)", 4)
+        self.eq("extract(shuffle(i64x4(1, 2, 3, 4), i64x4(5, 6, 7, 8), 4, 7), 1)", 8)
+
+    def test_arguments(self):
+        self.eq(
+            "def dot(a:f64x4, b:f64x4):float64 reduce_add(a * b) "
+            "dot(f64x4(1.0, 2.0, 3.0, 4.0), f64x4(2.0))",
+            20.0,
+        )
+
+    def test_errors(self):
+        self.ex("f64x4(1.0)", AkiTypeError)
+        self.ex("reduce_add(f64x4(1, 2))", AkiBaseException)
+        self.ex("reduce_add(f64x4(1.0) + 1.0)", AkiTypeError)
+        self.ex("reduce_add(i32x4(1) & 3)", AkiTypeError)
+        self.ex("extract(i64x4(1), 4)", AkiTypeError)
+        self.ex("n = 1 extract(i64x4(1), n)", AkiTypeError)
+        self.ex("shuffle(i64x4(1), 0, 1, 2)", AkiTypeError)
+        self.ex("when f64x4(1.0) 1 else 2", AkiTypeError)
+        self.ex("reduce_add(b1x4(True))", AkiTypeError)
+        self.ex("reduce_add(1.0)", AkiTypeError)
+        self.ex("nope(1)", AkiNameError)
+
+
+class TestVectorCodegen(SessionTest):
+    def setUp(self):
+        self.codegen = Codegen()
+        self.jit = Jit(opt_level=3)
+
+    def test_vector_instructions(self):
+        self.eq(
+            "def axpy(a:f64x4, x:f64x4, y:f64x4):float64 reduce_add(a * x + y) 0", 0
+        )
+        ir = str(self.jit.mod)
+        self.assertIn("fmul <4 x double>", ir)
+        self.assertIn("fadd <4 x double>", ir)
+
+    def test_functions_shadow_builtins(self):
+        self.eq("def extract(a, b) a - b extract(5, 3)", 2)
@@ -0,0 +1,188 @@
+import array
+from utils import BaseTest, SessionTest
+from parsing import parser
+from codegen import Codegen
+from jitengine import Jit
+from akitypes import Array, aki_type, Float64
+from errors import AkiBaseException, AkiTypeError, AkiIndexError
+
+
+class TestArrayTypes(BaseTest):
+    def test_names(self):
+        self.assertIs(aki_type("float64[]"), Array(Float64(64)))
+        self.assertEqual(aki_type("int32[]").typename, "int32[]")
+        for name in ("float64[][]", "nope[]", "[]"):
+            self.assertIsNone(aki_type(name))
+
+    def test_literals(self):
+        self.assertEqual(self.cmd("[1, 2, 3]").tolist(), [1, 2, 3])
+        self.eq("a = [1.0, 2.5] a[1]", 2.5)
+        self.eq("len([True, False, True])", 3)
+        self.eq("len(array(float32, 4)) + len(array(int64, -2))", 4)
+
+    def test_indexing(self):
+        self.eq("a = array(int64, 4) for i in len(a) a[i] = i * i a[3]", 9)
+        self.eq("a = [1, 2, 3] a[0] = a[1] + a[2] a[0]", 5)
+        self.eq("a = [10_U, 20_U] i = 1_U a[i]", 20)
+
+    def test_slices(self):
+        self.assertEqual(
+            self.cmd("a = [1, 2, 3, 4, 5] a[1:4][0] = 9 a").tolist(), [1, 9, 3, 4, 5]
+        )
+        self.assertEqual(self.cmd("[1, 2, 3, 4][2:]").tolist(), [3, 4])
+        self.eq("a = [1, 2, 3] len(a[:2]) + len(a[:]) + len(a[1:1])", 5)
+
+    def test_errors(self):
+        self.ex("[1, 2.0]", AkiTypeError)
+        self.ex("a = [1, 2] a[0] = 1.0", AkiTypeError)
+        self.ex("a = [1, 2] a[1.0]", AkiTypeError)
+        self.ex("x = 1 x[0]", AkiTypeError)
+        self.ex("array(x, 2)", AkiTypeError)
+        self.ex("[[1], [2]]", AkiTypeError)
+        self.ex("len(1)", AkiTypeError)
+        self.ex("len([1], [2])", AkiBaseException)
+
+
+class ArrayTest(SessionTest):
+    def define(self, command):
+        # definitions alone have no entry point to run
+        self.codegen.gen(parser.parse(command, start="immediate"), command)
+        self.jit.compile_module(self.codegen)
+
+
+class TestOwnership(ArrayTest):
+    def test_free(self):
+        self.eq("a = [1, 2, 3] b = a[1] free(a) b", 2)
+        self.define(
+            "def churn(n) {s = 0 for i in n "
+            "{a = array(int64, 1000) s = s + len(a) free(a)} s}"
+        )
+        self.eq("churn(100)", 100000)
+
+    def test_returned_arrays_outlive_their_module(self):
+        self.jit = Jit(keep_results=0)
+        result = self.cmd("[1.5, 2.5]")
+        for n in range(3):
+            self.eq(f"{n}", n)
+        self.assertEqual(self.jit.memory_stats["evicted"], 3)
+        self.assertEqual(result.tolist(), [1.5, 2.5])
+        result.free()
+        self.assertEqual((len(result), result.tolist()), (0, []))
+
+    def test_buffers_not_freed(self):
+        self.define("def same(a:int64[]):int64[] a")
+        same = self.jit.get_callable(self.codegen, "same")
+        argument = same.argtypes[0].from_param(array.array("q", [1, 2]))
+        with self.assertRaises(ValueError):
+            argument.free()
+
+
+class TestBoundsChecks(ArrayTest):
+    def test_out_of_range(self):
+        for command, index in (
+            ("a = [1, 2, 3] a[3]", 3),
+            ("a = [1, 2, 3] a[-1]", -1),
+            ("a = [1, 2, 3] a[5] = 0", 5),
+            ("a = [1, 2, 3] a[1:4]", 4),
+            ("a = array(int64, 5) for i in 6 a[i] = i", 5),
+        ):
+            with self.subTest(command=command):
+                with self.assertRaises(AkiIndexError) as e:
+                    self.cmd(command)
+                self.assertEqual(e.exception.index, index)
+
+    def test_reversed_slice(self):
+        with self.assertRaises(AkiIndexError) as e:
+            self.cmd("x = [1, 2, 3] x[2:1]")
+        self.assertEqual((e.exception.index, e.exception.stop), (2, 1))
+        self.assertIn("slice start 2 is past its stop 1", str(e.exception))
+        with self.assertRaises(AkiIndexError) as e:
+            self.cmd("x = [1, 2, 3] x[4:]")
+        self.assertIn("index 4 out of range for array of length 3", str(e.exception))
+        self.eq("x = [1, 2, 3] len(x[3:3])", 0)
+
+    def test_callers_return_early(self):
+        self.define("def get(a:int64[], i) a[i]")
+        self.define("def twice(a:int64[], i) get(a, i) * 2")
+        self.eq("twice([4, 5], 1)", 10)
+        with self.assertRaises(AkiIndexError) as e:
+            self.cmd("twice([4, 5], 2)")
+        self.assertEqual((e.exception.index, e.exception.length), (2, 2))
+        # the error is cleared once raised
+        self.eq("twice([4, 5], 0)", 8)
+
+    def test_conditional_access(self):
+        # an access that might not happen isn't checked ahead of time
+        self.eq("a = [1, 2, 3] s = 0 for i in 10 {if i < 3 s = s + a[i]} s", 6)
+        self.eq("a = [1, 2, 3] s = 0 for i in 10 {if i == 3 break; s = s + a[i]} s", 6)
+
+    def test_shadowed_loop_variable(self):
+        self.ex("a = [1, 2] for i in len(a) for i in 3 a[i]", AkiIndexError)
+
+
+class TestBoundsModes(ArrayTest):
+    source = (
+        "def shift(a:float64[], b:float64[]):float64 "
+        "{for i in len(a) - 1 b[i] = a[i + 1]; for i in len(b) b[i] = b[i] * 2.0; 0.0}"
+    )
+
+    def compile(self, bounds_checks):
+        self.codegen = Codegen(bounds_checks=bounds_checks)
+        self.jit = Jit(opt_level=3)
+        self.define(self.source)
+        return self.jit.get_callable(self.codegen, "shift")
+
+    def test_modes(self):
+        for mode in ("on", "hoist", "off"):
+            with self.subTest(mode=mode):
+                shift = self.compile(mode)
+                a = array.array("d", range(8))
+                b = array.array("d", [0.0] * 8)
+                shift(a, b)
+                self.assertEqual(list(b), [2.0, 4.0, 6.0, 8.0, 10.0, 12.0, 14.0, 0.0])
+                ir = str(self.jit.mod)
+                self.assertEqual("bounds_error" in ir, mode != "off")
+                if mode != "on":
+                    # with the checks out of the loops, they can be vectorized
+                    self.assertTrue("<2 x double>" in ir or "<4 x double>" in ir)
+
+    def test_hoisted_check_fails(self):
+        shift = self.compile("hoist")
+        with self.assertRaises(AkiIndexError) as e:
+            shift(array.array("d", range(8)), array.array("d", [0.0] * 4))
+        self.assertEqual((e.exception.index, e.exception.length), (4, 4))
+
+    def test_bad_mode(self):
+        with self.assertRaises(ValueError):
+            Codegen(bounds_checks="sometimes")
+
+
+class TestBuffers(ArrayTest):
+    def test_zero_copy(self):
+        self.define("def fill(a:int64[], x) for i in len(a) a[i] = x + i")
+        fill = self.jit.get_callable(self.codegen, "fill")
+        data = array.array("q", [0] * 4)
+        fill(data, 10)
+        self.assertEqual(list(data), [10, 11, 12, 13])
+        fill(memoryview(data)[1:3], 0)
+        self.assertEqual(list(data), [10, 0, 1, 13])
+
+    def test_bad_buffers(self):
+        self.define(
+            "def total(a:float64[]):float64 {s = 0.0 for i in len(a) s = s + a[i] s}"
+        )
+        total = self.jit.get_callable(self.codegen, "total")
+        self.assertEqual(total(array.array("d", [1.5, 2.5])), 4.0)
+        for bad in (
+            array.array("q", [1]),
+            memoryview(array.array("d", [1.0] * 4))[::2],
+            b"12345678",
+        ):
+            with self.subTest(bad=bad):
+                with self.assertRaises(Exception):
+                    total(bad)
+
+    def test_returned_arrays(self):
+        result = self.cmd("[1.0, 2.0]")
+        self.assertEqual((len(result), result[1]), (2, 2.0))
+        self.assertEqual(repr(result), "<float64[] [1.0, 2.0]>")
@@ -0,0 +1,113 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from aot import build, c_header, compile_library, exports
+from errors import AkiSyntaxError
+
+source = """
+def scale(a:float64[], k:float64):float64 {
+    s = 0.0
+    for i in len(a) {a[i] = a[i] * k; s = s + a[i]}
+    s
+}
+def get(a:int32[], i) a[i]
+def fib(n:uint64):uint64 when n < 2_U n else fib(n - 1_U) + fib(n - 2_U)
+def lanes(v:f64x4):float64 reduce_add(v)
+"""
+
+aki_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "aki")
+
+
+class TestLibraries(unittest.TestCase):
+    def test_exports(self):
+        signatures = exports(compile_library(source))
+        # vectors have no C equivalent
+        self.assertEqual(
+            signatures,
+            {
+                "scale": (["float64[]", "float64"], "float64"),
+                "get": (["int32[]", "int64"], "int32"),
+                "fib": (["uint64"], "uint64"),
+            },
+        )
+
+    def test_header(self):
+        header = c_header(exports(compile_library(source)), "LIB_H")
+        self.assertIn(
+            "typedef struct { int32_t *data; int64_t length; } aki_int32_array;", header
+        )
+        self.assertIn("double scale(aki_float64_array arg0, double arg1);", header)
+        self.assertIn("uint64_t fib(uint64_t arg0);", header)
+        self.assertIn("extern int64_t aki_bounds_error[3];", header)
+        self.assertNotIn("lanes", header)
+
+    def test_definitions_only(self):
+        with self.assertRaises(AkiSyntaxError):
+            compile_library("def f() 1 f()")
+
+
+@unittest.skipUnless(shutil.which(os.environ.get("CC", "cc")), "needs a C compiler")
+class TestBuild(unittest.TestCase):
+    def setUp(self):
+        self.temp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp.name, "lib.so")
+        build(source, self.path, header=os.path.join(self.temp.name, "lib.h"))
+
+    def tearDown(self):
+        self.temp.cleanup()
+
+    def test_object(self):
+        path = os.path.join(self.temp.name, "lib.o")
+        build(source, path, shared=False)
+        with open(path, "rb") as f:
+            self.assertEqual(f.read(4), b"\x7fELF")
+
+    def test_load_without_llvm(self):
+        # the library is loaded and called with llvmlite made unimportable
+        script = (
+            "import sys, array\n"
+            "sys.modules['llvmlite'] = None\n"
+            "import native\n"
+            f"lib = native.load({self.path!r})\n"
+            "a = array.array('d', [1.0, 2.0, 3.0])\n"
+            "print(lib.scale(a, 2.0), list(a), lib.fib(20), "
+            "lib.get(array.array('i', [7, 8]), 1))\n"
+            "try:\n"
+            "    lib.get(array.array('i', [7, 8]), 2)\n"
+            "except IndexError as e:\n"
+            "    print(e.index, e.length)\n"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", script],
+            env={**os.environ, "PYTHONPATH": aki_dir},
+            capture_output=True,
+            text=True,
+        )
+        self.assertEqual(result.stderr, "")
+        self.assertEqual(
+            result.stdout.splitlines(), ["12.0 [2.0, 4.0, 6.0] 6765 8", "2 2"]
+        )
+
+    def test_c_caller(self):
+        main = os.path.join(self.temp.name, "main.c")
+        with open(main, "w") as f:
+            f.write(
+                '#include <stdio.h>\n#include "lib.h"\n'
+                "int main(void) {\n"
+                "    double d[] = {1, 2, 3};\n"
+                "    aki_float64_array a = {d, 3};\n"
+                "    double s = scale(a, 2.0);\n"
+                '    printf("%g %g\\n", s, d[1]);\n'
+                "}\n"
+            )
+        program = os.path.join(self.temp.name, "main")
+        cc = os.environ.get("CC", "cc")
+        subprocess.run(
+            [cc, main, self.path, "-o", program, f"-Wl,-rpath,{self.temp.name}"],
+            check=True,
+        )
+        result = subprocess.run([program], capture_output=True, text=True)
+        self.assertEqual(result.stdout, "12 4\n")
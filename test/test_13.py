@@ -0,0 +1,101 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+import json
+from script import run_program, exit_status
+from jitengine import Jit
+from timing import Stats
+from errors import AkiSyntaxError, AkiNameError, AkiTypeError
+
+aki_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "aki")
+
+
+class TestPrograms(unittest.TestCase):
+    def test_main(self):
+        self.assertEqual(run_program("def f(x) x * 2\ndef main() f(21)"), 42)
+        self.assertEqual(run_program("def main():float64 {x = 1.5; x * 2.0}"), 3.0)
+
+    def test_top_level_code(self):
+        # top-level code becomes main
+        self.assertEqual(run_program("def f(x) x + 1\nf(1) f(2)"), 3)
+        self.assertEqual(run_program("s = 0 for i in 5 s = s + i s"), 10)
+
+    def test_errors(self):
+        for source, exception in (
+            ("def main() 1\n2", AkiSyntaxError),
+            ("def f() 1", AkiNameError),
+            ("def main(x) x", AkiTypeError),
+            ("f64x4(1.0)", AkiTypeError),
+        ):
+            with self.subTest(source=source):
+                with self.assertRaises(exception):
+                    run_program(source)
+
+    def test_timings(self):
+        stats = Stats()
+        run_program("def main() 1", stats=stats)
+        self.assertEqual(
+            list(stats.current["stages"]),
+            [
+                "parse",
+                "codegen",
+                "emit_ir",
+                "parse_ir",
+                "verify",
+                "finalize",
+                "resolve",
+                "run",
+            ],
+        )
+        self.assertIn("codegen", stats.report())
+        # a given JIT's stats are used by default
+        stats = Stats()
+        run_program("def main() 1", jit=Jit(stats=stats))
+        self.assertIn("parse", stats.current["stages"])
+
+    def test_exit_status(self):
+        self.assertEqual(exit_status(3), (3, None))
+        self.assertEqual(exit_status(True), (1, None))
+        self.assertEqual(exit_status(-1), (255, None))
+        self.assertEqual(exit_status(2.5), (0, 2.5))
+
+
+class TestCommandLine(unittest.TestCase):
+    def aki(self, *args, stdin=""):
+        return subprocess.run(
+            [sys.executable, aki_dir, *args],
+            input=stdin,
+            capture_output=True,
+            text=True,
+        )
+
+    def test_file(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".aki", delete=False) as f:
+            f.write(
+                "def fib(n) when n < 2 n else fib(n - 1) + fib(n - 2)\n"
+                "def main() fib(10)\n"
+            )
+        try:
+            dump = f.name + ".json"
+            result = self.aki(f.name, "--time", "--time-dump", dump)
+            with open(dump) as timings:
+                stages = json.load(timings)["totals"]
+            os.remove(dump)
+        finally:
+            os.remove(f.name)
+        self.assertEqual(result.returncode, 55)
+        self.assertIn("wall ms", result.stderr)
+        self.assertIn("finalize", result.stderr)
+        self.assertEqual(list(stages)[:3], ["read", "setup", "parse"])
+
+    def test_stdin(self):
+        result = self.aki(stdin="1.5 + 2.0")
+        self.assertEqual((result.returncode, result.stdout), (0, "3.5\n"))
+        result = self.aki("-", stdin="a = [1, 2] a[2]")
+        self.assertEqual(result.returncode, 1)
+        self.assertIn("index 2 out of range", result.stderr)
+        result = self.aki(stdin="1 +")
+        self.assertEqual(result.returncode, 1)
+        self.assertIn("SyntaxError", result.stderr)
@@ -0,0 +1,81 @@
+import os
+import shutil
+import tempfile
+import unittest
+from parsing import parser
+from codegen import Codegen
+from jitengine import Jit
+from driver import Driver, partition, partition_ir
+from aot import build
+from errors import AkiIndexError
+import native
+
+# a chain of functions, each calling the one before
+source = " ".join(
+    f"def f{i}(x) {{s = 0 for j in x s = s + j * {i} "
+    f"s + {f'f{i - 1}(x - 1)' if i else 0}}}"
+    for i in range(12)
+)
+
+
+def generate(text=source):
+    codegen = Codegen()
+    codegen.gen(parser.parse(text, start="immediate"), text)
+    return codegen
+
+
+class TestPartitions(unittest.TestCase):
+    def test_balanced(self):
+        module = generate().module
+        partitions = partition(module, 3)
+        self.assertEqual(len(partitions), 3)
+        self.assertEqual(
+            sorted(sum(partitions, [])), sorted(f"f{i}" for i in range(12))
+        )
+        self.assertEqual([len(_) for _ in partitions], [4, 4, 4])
+        # never more partitions than functions
+        self.assertEqual(len(partition(generate("def f() 1").module, 8)), 1)
+
+    def test_declarations(self):
+        module = generate().module
+        texts = partition_ir(module, [["f1"], ["f0", "f2"]])
+        self.assertIn('define i64 @"f1"', texts[0])
+        self.assertIn('declare i64 @"f0"', texts[0])
+        self.assertIn('declare i64 @"f1"', texts[1])
+        self.assertIn('define i64 @"f2"', texts[1])
+        # the module itself is left as it was
+        self.assertIn('define i64 @"f0"', str(module))
+
+
+class TestParallelCompile(unittest.TestCase):
+    def test_jit(self):
+        expected = Jit(opt_level=2)
+        expected.compile_module(generate())
+        jit = Jit(opt_level=2)
+        with Driver(jobs=2, opt_level=2) as driver:
+            jit.compile_parallel(generate(), driver)
+        for i in (0, 5, 11):
+            self.assertEqual(jit.invoke(f"f{i}", 7), expected.invoke(f"f{i}", 7))
+
+    def test_bounds_checks(self):
+        jit = Jit()
+        codegen = generate("def get(a:int64[], i) a[i] def first(a:int64[]) get(a, 0)")
+        with Driver(jobs=2, opt_level=0) as driver:
+            jit.compile_parallel(codegen, driver)
+        first = jit.get_callable(codegen, "first")
+        # the check in one partition is seen by the caller in the other
+        with self.assertRaises(AkiIndexError):
+            first(first.argtypes[0]())
+
+    @unittest.skipUnless(shutil.which(os.environ.get("CC", "cc")), "needs a C compiler")
+    def test_build(self):
+        with tempfile.TemporaryDirectory() as temp:
+            path = os.path.join(temp, "lib.so")
+            build(source, path, jobs=3)
+            jit = Jit(opt_level=2)
+            jit.compile_module(generate())
+            self.assertEqual(native.load(path).f11(7), jit.invoke("f11", 7))
+            obj = os.path.join(temp, "lib.o")
+            build(source, obj, shared=False, jobs=3)
+            with open(obj, "rb") as f:
+                self.assertEqual(f.read(4), b"\x7fELF")
@@ -0,0 +1,115 @@
+import unittest
+import gc
+from unittest import mock
+from utils import SessionTest
+from parsing import parser
+from codegen import Codegen
+from jitengine import Jit
+from batch import evaluate_batch
+from script import run_program
+from errors import AkiIndexError
+import lazy
+
+
+class LazyTest(SessionTest):
+    def setUp(self):
+        self.codegen = Codegen()
+        self.jit = Jit(opt_level=2, lazy=True)
+
+    def define(self, command):
+        # definitions alone have no entry point to run
+        self.codegen.gen(parser.parse(command, start="immediate"), command)
+        self.jit.compile_module(self.codegen)
+
+
+class TestLazy(LazyTest):
+    def test_only_called_functions(self):
+        self.define("def f(x) x * 2 def g(x) x + 1 def h(x) f(x) + 1")
+        self.assertEqual(
+            self.jit.lazy_stats, {"deferred": 3, "materialized": 0, "pending": 3}
+        )
+        self.eq("h(4)", 9)
+        self.assertEqual(self.jit.materialized, ["h", "f"])
+        # compiled once, then called directly
+        self.eq("h(5) + f(1)", 13)
+        self.assertEqual(
+            self.jit.lazy_stats, {"deferred": 3, "materialized": 2, "pending": 1}
+        )
+
+    def test_same_results(self):
+        source = "def fib(n) when n < 2 n else fib(n - 1) + fib(n - 2)"
+        self.define(source)
+        eager = Jit(opt_level=2)
+        codegen = Codegen()
+        codegen.gen(parser.parse(source, start="immediate"), source)
+        eager.compile_module(codegen)
+        self.assertEqual(self.jit.invoke("fib", 20), eager.invoke("fib", 20))
+        self.assertEqual(self.jit.materialized, ["fib"])
+
+    def test_types(self):
+        self.define(
+            "def half(x:float64) x / 2.0 "
+            "def pick(a:uint64, b:bool):uint64 when b a else 0_U"
+        )
+        self.eq("half(5.0)", 2.5)
+        self.eq("pick(5_U, False)", 0)
+
+    def test_bounds_checks(self):
+        self.define("def get(a:int64[], i) a[i]")
+        self.define("def first(a:int64[]) get(a, 2) + 1")
+        with self.assertRaises(AkiIndexError):
+            self.cmd("first([1, 2])")
+        self.eq("first([1, 2, 3])", 4)
+
+    def test_batch(self):
+        results = evaluate_batch(["def f(x) x * 3", "f(2)", "def g() 1"], jit=self.jit)
+        self.assertEqual(results[1].value, 6)
+        # anything not called when the batch's module goes is dropped
+        self.assertEqual(
+            self.jit.lazy_stats, {"deferred": 2, "materialized": 1, "pending": 0}
+        )
+
+    def test_program(self):
+        jit = Jit(lazy=True)
+        self.assertEqual(
+            run_program("def f(x) x + 1\ndef g() 0\ndef main() f(41)", jit=jit), 42
+        )
+        self.assertEqual(jit.materialized, ["main", "f"])
+
+
+class TestFailures(LazyTest):
+    def test_materialize_raises(self):
+        self.define("def f(x) x * 2")
+        with mock.patch.object(self.jit, "materialize", side_effect=MemoryError):
+            with self.assertRaises(RuntimeError) as e:
+                self.jit.invoke("f", 1)
+        self.assertIsInstance(e.exception.__cause__, MemoryError)
+        # the slot was left empty, so the next call compiles
+        self.assertEqual(self.jit.invoke("f", 2), 4)
+
+    def test_stub_outlives_its_jit(self):
+        self.define("def f(x) x * 2")
+        f = self.jit.resolve("f")
+        self.jit.reset()
+        with self.assertRaises(RuntimeError):
+            f(1)
+
+    def test_unregistered(self):
+        self.define("def f(x) x * 2 def g(x) x + 1")
+        ids = list(self.jit.stub_ids.values())
+        self.assertTrue(all(_ in lazy.stubs for _ in ids))
+        self.jit.clear()
+        self.assertFalse(any(_ in lazy.stubs for _ in ids))
+        self.define("def h(x) x * 3")
+        ids = list(self.jit.stub_ids.values())
+        self.jit.reset()
+        self.assertFalse(any(_ in lazy.stubs for _ in ids))
+        self.define("def k(x) x * 4")
+        ids = list(self.jit.stub_ids.values())
+        del self.jit
+        gc.collect()
+        self.assertFalse(any(_ in lazy.stubs for _ in ids))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+import json
+import os
+import tempfile
+import unittest
+from parsing import parser
+from codegen import Codegen
+from jitengine import Jit
+from timing import Stats, no_stats
+
+
+class TestStats(unittest.TestCase):
+    def test_stages(self):
+        stats = Stats()
+        stats.begin("first")
+        with stats.stage("a"):
+            pass
+        with stats.stage("b"):
+            sum(range(10000))
+        with stats.stage("a"):
+            pass
+        record = stats.commands[-1]
+        self.assertEqual(record["command"], "first")
+        self.assertEqual(list(record["stages"]), ["a", "b"])
+        for times in record["stages"].values():
+            self.assertGreaterEqual(times["wall"], 0.0)
+            self.assertGreaterEqual(times["cpu"], 0.0)
+        self.assertIn("b", stats.report())
+
+    def test_totals_and_history(self):
+        stats = Stats(history=2)
+        for command in ("1", "2", "3"):
+            stats.begin(command)
+            with stats.stage("x"):
+                pass
+        self.assertEqual([_["command"] for _ in stats.commands], ["2", "3"])
+        self.assertEqual(
+            stats.totals()["x"]["wall"],
+            sum(_["stages"]["x"]["wall"] for _ in stats.commands),
+        )
+
+    def test_dump(self):
+        stats = Stats()
+        with stats.stage("x"):
+            pass
+        with tempfile.TemporaryDirectory() as temp:
+            path = os.path.join(temp, "stats.json")
+            text = stats.dump(path)
+            with open(path) as f:
+                self.assertEqual(json.load(f), json.loads(text))
+        self.assertEqual(list(json.loads(text)["totals"]), ["x"])
+
+    def test_exceptions_still_timed(self):
+        stats = Stats()
+        with self.assertRaises(ZeroDivisionError):
+            with stats.stage("x"):
+                1 / 0
+        self.assertIn("x", stats.current["stages"])
+
+    def test_off(self):
+        self.assertIsNone(no_stats.begin("x"))
+        with no_stats.stage("x"):
+            pass
+        self.assertIs(Jit().stats, no_stats)
+
+
+class TestJitStages(unittest.TestCase):
+    def run_command(self, jit, command):
+        codegen = Codegen()
+        codegen.gen(parser.parse(command, start="immediate"), command)
+        jit.stats.begin(command)
+        return jit.execute(codegen, codegen.anon_counter())
+
+    def test_stages(self):
+        stats = Stats()
+        self.assertEqual(self.run_command(Jit(opt_level=1, stats=stats), "2 + 3"), 5)
+        self.assertEqual(
+            list(stats.current["stages"]),
+            ["emit_ir", "parse_ir", "verify", "optimize", "finalize", "resolve", "run"],
+        )
+
+    def test_lazy(self):
+        stats = Stats()
+        jit = Jit(lazy=True, stats=stats)
+        self.assertEqual(self.run_command(jit, "def f() 4 f()"), 4)
+        self.assertIn("materialize", stats.current["stages"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,163 @@
+import os
+import struct
+import tempfile
+import unittest
+from ctypes import string_at
+import llvmlite.binding as llvm
+from parsing import parser
+from codegen import Codegen
+from jitengine import Jit
+from driver import partition_ir
+from perf import (
+    Profiler,
+    Elf,
+    functions,
+    line_table,
+    JIT_CODE_LOAD,
+    JIT_CODE_DEBUG_INFO,
+)
+
+source = """def f(x) {
+  s = 0
+  for i in x
+    s = s + i * 2
+  s
+}
+def g() f(4) + 1
+g()"""
+
+
+def read_jitdump(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    header = struct.unpack_from("<IIIIIIQQ", data)
+    records = []
+    at = header[2]
+    while at < len(data):
+        kind, size, _ = struct.unpack_from("<IIQ", data, at)
+        records.append((kind, data[at + 16 : at + size]))
+        at += size
+    return header, records
+
+
+class ProfileTest(unittest.TestCase):
+    def setUp(self):
+        self.temp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp.cleanup)
+        self.map_path = os.path.join(self.temp.name, "perf.map")
+        self.dump_path = os.path.join(self.temp.name, "jit.dump")
+        self.profiler = Profiler(self.map_path, self.dump_path)
+        self.addCleanup(self.profiler.close)
+
+    def run_source(self, jit, text=source, **options):
+        self.codegen = Codegen(filename="/src/demo.aki", **options)
+        self.codegen.gen(parser.parse(text, start="immediate"), text)
+        return jit.execute(self.codegen, self.codegen.anon_counter())
+
+
+class TestPerfMap(ProfileTest):
+    def test_entries(self):
+        jit = Jit(perf=self.profiler)
+        self.assertEqual(self.run_source(jit), 13)
+        with open(self.map_path) as f:
+            entries = [line.split() for line in f]
+        self.assertEqual([_[2] for _ in entries], ["f", "g", "ANONYMOUS_1"])
+        for address, size, name in entries:
+            self.assertEqual(int(address, 16), jit.engine.get_function_address(name))
+            self.assertGreater(int(size, 16), 0)
+        # consecutive, not overlapping
+        ends = [int(a, 16) + int(s, 16) for a, s, _ in entries]
+        self.assertTrue(
+            all(end <= int(a, 16) for end, (a, _, _) in zip(ends, entries[1:]))
+        )
+
+    def test_lazy_and_cached(self):
+        with tempfile.TemporaryDirectory() as cache:
+            for _ in range(2):
+                jit = Jit(perf=self.profiler, lazy=True, cache_dir=cache)
+                self.run_source(jit)
+        with open(self.map_path) as f:
+            names = [line.split()[2] for line in f]
+        # objects loaded from the cache are recorded too
+        self.assertEqual(names.count("g.body"), 2)
+        self.assertEqual(names.count("f.body"), 2)
+
+    def test_local_functions(self):
+        mod = llvm.parse_assembly("""
+            define internal i64 @h(i64 %x) noinline { %y = mul i64 %x, 3 ret i64 %y }
+            define i64 @f(i64 %x) { %y = call i64 @h(i64 %x) ret i64 %y }
+            """)
+        machine = llvm.Target.from_default_triple().create_target_machine()
+        elf = Elf(machine.emit_object(mod))
+        values = {name: value for name, _, _, value, _ in elf.symbols}
+        # engines only find global functions
+        loaded = {
+            name: address for name, address, _ in functions(elf, {"f": 0x1000}.get)
+        }
+        self.assertEqual(loaded["h"], 0x1000 - values["f"] + values["h"])
+        # with nothing to place them by, none are given address 0
+        self.assertEqual(functions(elf, lambda name: 0), [])
+
+    def test_not_elf(self):
+        self.assertEqual(functions(Elf(b"\xcf\xfa\xed\xfe" + bytes(60)), None), [])
+
+
+class TestDebugInfo(ProfileTest):
+    def test_jitdump(self):
+        jit = Jit(perf=self.profiler)
+        self.assertEqual(self.run_source(jit, debug_info=True), 13)
+        self.profiler.jitdump.flush()
+        header, records = read_jitdump(self.dump_path)
+        self.assertEqual(header[:3], (0x4A695444, 1, 40))
+        self.assertEqual(header[5], os.getpid())
+        loads = {}
+        lines = {}
+        for kind, body in records:
+            if kind == JIT_CODE_DEBUG_INFO:
+                address, count = struct.unpack_from("<QQ", body)
+                # debug info comes before the code it describes
+                self.assertNotIn(address, loads.values())
+                at, entries = 16, []
+                for _ in range(count):
+                    _, line, _ = struct.unpack_from("<Qii", body, at)
+                    end = body.index(b"\0", at + 16)
+                    entries.append((line, body[at + 16 : end].decode()))
+                    at = end + 1
+                lines[address] = entries
+            elif kind == JIT_CODE_LOAD:
+                _, _, _, address, size, _ = struct.unpack_from("<IIQQQQ", body)
+                end = body.index(b"\0", 40)
+                loads[body[40:end].decode()] = address
+                self.assertEqual(body[end + 1 :], string_at(address, size))
+        self.assertEqual(set(loads), {"f", "g", "ANONYMOUS_1"})
+        self.assertEqual(set(lines), set(loads.values()))
+        f_lines = {line for line, _ in lines[loads["f"]]}
+        self.assertTrue(f_lines <= {1, 2, 3, 4, 5})
+        self.assertIn(4, f_lines)
+        self.assertEqual({name for _, name in lines[loads["f"]]}, {"/src/demo.aki"})
+
+    def test_line_table(self):
+        jit = Jit()
+        self.run_source(jit, debug_info=True)
+        obj = (
+            llvm.Target.from_default_triple()
+            .create_target_machine(reloc="pic")
+            .emit_object(llvm.parse_assembly(str(self.codegen.module)))
+        )
+        rows = line_table(Elf(obj), lambda name: 0x1000 if name == "f" else 0x2000)
+        self.assertTrue(rows)
+        self.assertEqual({line for _, _, line, _ in rows} - {0}, {1, 2, 3, 4, 5, 7, 8})
+
+    def test_no_debug_info(self):
+        self.run_source(Jit())
+        self.assertNotIn("!dbg", str(self.codegen.module))
+
+    def test_partitions(self):
+        # declarations drop the definition's debug info
+        self.run_source(Jit(), debug_info=True)
+        for text in partition_ir(self.codegen.module, [["f"], ["g", "ANONYMOUS_1"]]):
+            llvm.parse_assembly(text).verify()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import os
+import tempfile
+import unittest
+from parsing import parser
+from codegen import Codegen
+from jitengine import Jit
+import benchmark
+
+
+def run(command):
+    codegen = Codegen()
+    codegen.gen(parser.parse(command, start="immediate"), command)
+    return Jit().execute(codegen, codegen.anon_counter())
+
+
+def results(**times):
+    return {
+        "results": [
+            {
+                "corpus": "c",
+                "size": 1,
+                "stages": {**dict.fromkeys(benchmark.stages, 0.01), **times},
+            }
+        ]
+    }
+
+
+class TestCorpora(unittest.TestCase):
+    def test_valid(self):
+        [command] = benchmark.nesting(25)
+        self.assertEqual(run(command), eval(command[9:-5], {"x": 2}))
+        self.assertEqual(run(benchmark.when_chain(20)[0]), 57)
+        self.assertEqual(
+            run(benchmark.functions(10)[0]), sum(n * n + n % 5 for n in range(10))
+        )
+        self.assertEqual(len(benchmark.session(30)), 30)
+
+    def test_measure(self):
+        times = benchmark.measure(benchmark.session(20))
+        self.assertEqual(tuple(times), benchmark.stages)
+        self.assertTrue(all(_ > 0 for _ in times.values()))
+
+    def test_suite(self):
+        suite = benchmark.run_suite(["when_chain", "nesting"], max_size=25, repeat=1)
+        self.assertEqual(
+            [(_["corpus"], _["size"]) for _ in suite["results"]],
+            [("when_chain", 10), ("nesting", 25)],
+        )
+        self.assertEqual(suite["meta"]["repeat"], 1)
+        with tempfile.TemporaryDirectory() as temp:
+            path = os.path.join(temp, "results.json")
+            benchmark.save(suite, path)
+            self.assertEqual(benchmark.load(path), suite)
+
+
+class TestCompare(unittest.TestCase):
+    def test_regressions(self):
+        [regression] = benchmark.compare(
+            results(), results(codegen=0.02), threshold=0.5
+        )
+        self.assertEqual((regression["stage"], regression["ratio"]), ("codegen", 2.0))
+        self.assertEqual(
+            benchmark.compare(results(), results(codegen=0.014), threshold=0.5), []
+        )
+        # faster is never a regression
+        self.assertEqual(benchmark.compare(results(codegen=0.02), results()), [])
+
+    def test_noise(self):
+        # too small a difference to count, however large the ratio
+        self.assertEqual(benchmark.compare(results(run=1e-6), results(run=1e-5)), [])
+
+    def test_unmatched(self):
+        new = results(codegen=1.0)
+        new["results"][0]["size"] = 2
+        self.assertEqual(benchmark.compare(results(), new), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
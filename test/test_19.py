@@ -0,0 +1,106 @@
+import unittest
+from utils import SessionTest
+from parsing import parser
+from codegen import Codegen
+from jitengine import Jit
+from driver import Driver
+
+
+class RetentionTest(SessionTest):
+    def setUp(self):
+        self.codegen = Codegen()
+        self.jit = Jit(keep_results=2, recycle_after=1000)
+
+    def define(self, command):
+        self.codegen.gen(parser.parse(command, start="immediate"), command)
+        self.jit.compile_module(self.codegen)
+
+
+class TestEviction(RetentionTest):
+    def test_old_results(self):
+        for n in range(10):
+            self.eq(f"{n} + 1", n + 1)
+        stats = self.jit.memory_stats
+        # the last two plus the current one
+        self.assertEqual(stats["modules"], 3)
+        self.assertEqual(stats["results"], 3)
+        self.assertEqual(stats["evicted"], 7)
+        self.assertEqual(self.jit.invoke("ANONYMOUS_10"), 10)
+        with self.assertRaises(KeyError):
+            self.jit.resolve("ANONYMOUS_1")
+
+    def test_definitions_kept(self):
+        self.eq("def f(x) x * 3 f(1)", 3)
+        self.define("def g(x) f(x) + 1")
+        for n in range(10):
+            self.eq(f"g({n})", n * 3 + 1)
+        # f's module also had an entry point, which is gone
+        with self.assertRaises(KeyError):
+            self.jit.resolve("ANONYMOUS_1")
+        self.assertEqual(self.jit.memory_stats["modules"], 5)
+        self.assertEqual(self.jit.invoke("f", 2), 6)
+
+    def test_steady_state(self):
+        counts = []
+        for n in range(40):
+            self.eq(f"when {n} > 3 {n} else 0", n if n > 3 else 0)
+            counts.append(self.jit.memory_stats["functions"])
+        self.assertEqual(set(counts[3:]), {3})
+        self.assertEqual(len(self.jit.signatures), 3)
+        self.assertEqual(len(self.jit.symbols), 3)
+        # the codegen only keeps the current entry point
+        self.assertEqual(
+            [_ for _ in self.codegen.functions if _.startswith("ANONYMOUS_")],
+            ["ANONYMOUS_40"],
+        )
+
+    def test_unbounded(self):
+        jit = Jit()
+        codegen = Codegen()
+        for n in range(5):
+            codegen.gen(parser.parse(f"{n}", start="immediate"), f"{n}")
+            jit.execute(codegen, codegen.anon_counter())
+        self.assertEqual(jit.memory_stats["modules"], 5)
+        self.assertEqual(jit.memory_stats["evicted"], 0)
+
+
+class TestRecycle(RetentionTest):
+    def setUp(self):
+        self.codegen = Codegen()
+        self.jit = Jit(keep_results=1, recycle_after=4)
+
+    def test_recycle(self):
+        self.define("def f(x) x + 10")
+        f = self.jit.resolve("f")
+        engine = self.jit.engine
+        for n in range(12):
+            self.eq(f"f({n})", n + 10)
+        self.assertEqual(self.jit.memory_stats["recycled"], 2)
+        self.assertIsNot(self.jit.engine, engine)
+        # callables from before keep the old engine's code alive
+        self.assertEqual(f(1), 11)
+        self.assertEqual(self.jit.invoke("f", 2), 12)
+
+    def test_lazy(self):
+        self.jit = Jit(opt_level=1, lazy=True, keep_results=0, recycle_after=2)
+        self.define("def f(x) x * 2 def g(x) f(x) + 1")
+        for n in range(6):
+            self.eq(f"g({n})", n * 2 + 1)
+        self.assertEqual(self.jit.memory_stats["recycled"], 2)
+        # each body is compiled once, however often its stub loses track of it
+        self.assertEqual(self.jit.materialized, ["g", "f"])
+
+    def test_parallel(self):
+        self.jit = Jit(opt_level=1, keep_results=0, recycle_after=1)
+        source = "def f(x) x - 1 def g(x) f(x) * 2"
+        self.codegen.gen(parser.parse(source, start="immediate"), source)
+        with Driver(jobs=2, opt_level=1) as driver:
+            self.jit.compile_parallel(self.codegen, driver)
+        for n in range(3):
+            self.eq(f"g({n})", (n - 1) * 2)
+        # object code is loaded into each new engine again
+        self.assertEqual(self.jit.memory_stats["recycled"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
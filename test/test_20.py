@@ -0,0 +1,81 @@
+import unittest
+import llvmlite.binding as llvm
+from utils import SessionTest
+from codegen import Codegen
+from jitengine import Jit
+import host
+from host import EnginePool
+from driver import Driver, shared_machine, optimize
+
+
+class TestHost(unittest.TestCase):
+    def test_shared(self):
+        host.initialize()
+        first, second = Jit(opt_level=2), Jit(opt_level=2)
+        self.assertIs(first.target_machine, second.target_machine)
+        self.assertIs(first.module_pm, second.module_pm)
+        self.assertIsNot(first.engine, second.engine)
+        self.assertIsNot(
+            Jit(opt_level=2, slp_vectorize=False).module_pm, first.module_pm
+        )
+        self.assertEqual(first.cpu, llvm.get_host_cpu_name())
+        self.assertEqual(first.target_machine.triple, host.host()[0])
+
+    def test_one_pipeline(self):
+        jit = Jit(opt_level=3, loop_vectorize=False)
+        self.assertIs(
+            host.pass_managers(*host.settings(3, None, False), host.machine(3))[1],
+            jit.module_pm,
+        )
+        # the driver's workers and aot build the same pipeline
+        driver = Driver(opt_level=3, loop_vectorize=False)
+        self.assertEqual(
+            driver.options,
+            (jit.inline_threshold, jit.loop_vectorize, jit.slp_vectorize),
+        )
+        machine = shared_machine(3)
+        self.assertIs(shared_machine(3), machine)
+        before = host.pass_managers.cache_info().misses
+        for _ in range(2):
+            mod = llvm.parse_assembly("define i64 @f() { ret i64 1 }")
+            optimize(mod, machine, 3, *driver.options)
+        self.assertLessEqual(host.pass_managers.cache_info().misses, before + 1)
+
+    def test_pool(self):
+        pool = EnginePool(size=2)
+        pool.take(1)
+        self.assertEqual(pool.built, 1)
+        # only levels asked for are filled
+        pool.fill()
+        self.assertEqual(pool.built, 3)
+        self.assertEqual(list(pool.spares), [1])
+        engine = pool.take(1)
+        self.assertEqual(pool.built, 3)
+        self.assertIsInstance(engine, llvm.ExecutionEngine)
+
+
+class TestReset(SessionTest):
+    def test_reset(self):
+        self.eq("def f(x) x + 1 f(1)", 2)
+        f = self.jit.resolve("f")
+        engine = self.jit.engine
+        self.jit.reset()
+        self.assertIsNot(self.jit.engine, engine)
+        self.assertEqual(self.jit.modules, [])
+        with self.assertRaises(KeyError):
+            self.jit.resolve("f")
+        # callables from before still work
+        self.assertEqual(f(2), 3)
+        self.codegen = Codegen()
+        self.eq("def f(x) x * 10 f(2)", 20)
+
+    def test_optimized(self):
+        self.jit = Jit(opt_level=2)
+        self.eq("def f(x) {s = 0 for i in x s = s + i s} f(10)", 45)
+        self.jit.reset()
+        self.codegen = Codegen()
+        self.eq("def f(x) {s = 0 for i in x s = s + i * 2 s} f(10)", 90)
+
+
+if __name__ == "__main__":
+    unittest.main()
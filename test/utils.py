@@ -1,7 +1,7 @@
 from math import e
 from parsing import parser
-from codegen import codegen
-from jitengine import jit
+from codegen import codegen, Codegen
+from jitengine import jit, Jit
 import unittest
 
 main_func_name = "main"
@@ -30,3 +30,30 @@ class BaseTest(unittest.TestCase):
     def ex(self, command, exception):
         with self.assertRaises(exception):
             self.cmd(command)
+
+
+class SessionTest(unittest.TestCase):
+    """
+    Runs several commands against the same codegen and JIT,
+    the way the REPL does.
+    """
+
+    def setUp(self):
+        self.codegen = Codegen()
+        self.jit = Jit()
+
+    def cmd(self, command):
+        ast = parser.parse(command, start="immediate")
+        entry = self.codegen.gen(ast, command)
+        if entry is None:
+            # only definitions, so nothing to run
+            self.jit.compile_module(self.codegen)
+            return None
+        return self.jit.execute(self.codegen, entry_point=entry)
+
+    def eq(self, command, assertion):
+        self.assertEqual(self.cmd(command), assertion)
+
+    def ex(self, command, exception):
+        with self.assertRaises(exception):
+            self.cmd(command)